@@ -2,18 +2,18 @@ import requests
 import time
 import hmac
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from config import EXCHANGE_API_KEYS, EXCHANGE_URLS, TIMING_SETTINGS
+from rate_limiter import get_rate_limiter
+from json_codec import loads, DecodeError
+from market_data import PriceSnapshot, MAX_CONCURRENT_REQUESTS, supports_bulk_ticker, parse_bulk_ticker
 
 # Utility function to handle rate limits
-def handle_rate_limit(response):
-    retry_after = response.headers.get('Retry-After')
-    if retry_after:
-        retry_seconds = int(retry_after)
-        print(f"Rate limit exceeded. Retrying after {retry_seconds} seconds.")
-        time.sleep(retry_seconds)
-    elif response.status_code == 429:
-        print("Too many requests. Applying default wait time.")
-        time.sleep(1)  # Default wait time, can be adjusted as per exchange's documentation
+def handle_rate_limit(response, limiter):
+    # The shared limiter pauses every client of the exchange, so the next request waits for us
+    limiter.update_from_headers(response.headers, response.status_code)
+    if response.status_code == 429:
+        print(f"Too many requests to {limiter.exchange_name}. Backing off via the shared rate limiter.")
 
 # Helper function to generate signatures
 def generate_signature(api_secret, query_string):
@@ -35,13 +35,15 @@ class ExchangeAuth(requests.auth.AuthBase):
         return r
 
 # Generalized function for making requests to the exchange
-def make_request(method, exchange, endpoint, params=None, data=None, auth=None):
+def make_request(method, exchange, endpoint, params=None, data=None, auth=None, weight=None):
     url = f"{EXCHANGE_URLS[exchange]}{endpoint}"
     headers = {
         'X-Api-Key': EXCHANGE_API_KEYS[exchange]['api_key'],
         'Content-Type': 'application/json',
     }
+    limiter = get_rate_limiter(exchange)
     try:
+        limiter.acquire_sync(endpoint, weight)
         if method == "GET":
             response = requests.get(url, headers=headers, params=params, auth=auth)
         elif method == "POST":
@@ -49,11 +51,11 @@ def make_request(method, exchange, endpoint, params=None, data=None, auth=None):
         elif method == "DELETE":
             response = requests.delete(url, headers=headers, params=params, auth=auth)
 
-        handle_rate_limit(response)  # Handle rate limits
+        handle_rate_limit(response, limiter)  # Handle rate limits
 
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        return loads(response.content)
+    except (requests.RequestException, *DecodeError) as e:
         print(f"Error during {method} request to {url}: {e}")
         return None
 
@@ -62,6 +64,20 @@ def get_price(exchange, pair):
     params = {'symbol': pair.replace('/', '')}
     return make_request("GET", exchange, endpoint, params)
 
+# Snapshot of many pairs: one all-symbols request where supported, bounded parallel requests otherwise
+def get_prices(exchange, pairs):
+    endpoint = "/api/v3/ticker/price"
+    if supports_bulk_ticker(exchange):
+        data = make_request("GET", exchange, endpoint, weight=get_rate_limiter(exchange).weight_for(f"{endpoint}:all"))
+        if isinstance(data, list):
+            return PriceSnapshot(exchange, parse_bulk_ticker(data, pairs))
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        results = list(executor.map(lambda pair: get_price(exchange, pair), pairs))
+    return PriceSnapshot(exchange, {
+        pair: float(result['price']) for pair, result in zip(pairs, results) if result is not None
+    })
+
 def place_order(exchange, pair, side, quantity, price):
     endpoint = "/api/v3/order"
     data = {
@@ -1,97 +1,177 @@
+import asyncio
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from api import get_price, place_order, get_order_status, cancel_order
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from api import get_prices, place_order, get_order_status, cancel_order
 from config import TRADING_PAIRS, ARBITRAGE_PARAMS, LOGGING_SETTINGS, EXCHANGE_API_KEYS, EXCHANGE_URLS, TIMING_SETTINGS
+from execution import EXECUTION_MODE, EXECUTION_DEADLINE, TwoLegExecutor, leg_delays, unwind_price
+from exchange_connector import ExchangeConnector
+from order_manager import OrderManager
+from circuit_breaker import is_available
+from latency_tracker import get_latency_tracker
+from sizing import size_trade, size_trade_async
 
 # Setup logging
 logging.basicConfig(filename=LOGGING_SETTINGS['log_file'],
                     level=LOGGING_SETTINGS['log_level'].upper(),
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Detect arbitrage opportunities across exchanges
-def detect_arbitrage_opportunity(pair):
-    opportunities = []
-    exchanges = list(EXCHANGE_API_KEYS.keys())
+ORDER_POLL_MIN_INTERVAL = TIMING_SETTINGS.get('order_poll_min_interval', 0.5)
+ORDER_POLL_MAX_INTERVAL = TIMING_SETTINGS.get('order_poll_max_interval', 10)
 
-    for i in range(len(exchanges)):
-        for j in range(i + 1, len(exchanges)):
-            exchange1 = exchanges[i]
-            exchange2 = exchanges[j]
+# Pipeline sizing for ArbitrageEngine
+EXECUTION_WORKERS = ARBITRAGE_PARAMS.get('execution_workers', 2)
+SETTLEMENT_WORKERS = ARBITRAGE_PARAMS.get('settlement_workers', 4)
+PIPELINE_QUEUE_SIZE = ARBITRAGE_PARAMS.get('pipeline_queue_size', 16)
+MAX_OPPORTUNITY_AGE = ARBITRAGE_PARAMS.get('max_opportunity_age', 1.0)  # Seconds an opportunity may wait to execute
 
-            price1 = get_price(exchange1, pair)
-            price2 = get_price(exchange2, pair)
+# Take one price snapshot per exchange, concurrently, as a pairs x exchanges array (NaN where unquoted)
+def fetch_price_matrix(pairs, exchanges=None):
+    exchanges = list(EXCHANGE_API_KEYS.keys()) if exchanges is None else list(exchanges)
+    prices = np.full((len(pairs), len(exchanges)), np.nan)
+    if not exchanges:
+        return prices, exchanges
+    with ThreadPoolExecutor(max_workers=len(exchanges)) as executor:
+        snapshots = list(executor.map(lambda exchange: get_prices(exchange, pairs), exchanges))
+    return snapshots_to_matrix(snapshots, pairs), exchanges
 
-            if price1 is None or price2 is None:
-                logging.error("Error fetching prices for pair: %s", pair)
-                continue
+# Lay out price snapshots (one per exchange, in column order) as a pairs x exchanges array
+def snapshots_to_matrix(snapshots, pairs):
+    prices = np.full((len(pairs), len(snapshots)), np.nan)
+    for column, snapshot in enumerate(snapshots):
+        for row, pair in enumerate(pairs):
+            price = snapshot.get(pair)
+            if price is not None:
+                prices[row, column] = price
+    return prices
 
-            price1 = float(price1['price'])
-            price2 = float(price2['price'])
-
-            # Detect opportunities
-            if price1 > price2 * (1 + ARBITRAGE_PARAMS['price_difference_threshold']):
-                profit = price1 - price2
-                opportunities.append({
-                    'buy_exchange': exchange2,
-                    'sell_exchange': exchange1,
-                    'buy_price': price2,
-                    'sell_price': price1,
-                    'profit': profit,
-                    'pair': pair
-                })
-            elif price2 > price1 * (1 + ARBITRAGE_PARAMS['price_difference_threshold']):
-                profit = price2 - price1
-                opportunities.append({
-                    'buy_exchange': exchange1,
-                    'sell_exchange': exchange2,
-                    'buy_price': price1,
-                    'sell_price': price2,
-                    'profit': profit,
-                    'pair': pair
-                })
+# Every profitable (pair, buy exchange, sell exchange) combination in one vectorized pass, best spread first
+def find_opportunities(prices, pairs, exchanges, threshold=None):
+    threshold = ARBITRAGE_PARAMS['price_difference_threshold'] if threshold is None else threshold
+    # spread[p, b, s]: relative gain of buying pair p on exchange b and selling it on exchange s
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = prices[:, None, :] / prices[:, :, None] - 1
+    rows, buys, sells = np.nonzero(spread > threshold)  # NaN compares False, so unquoted prices drop out
+    ranking = np.argsort(-spread[rows, buys, sells], kind='stable')
 
+    opportunities = []
+    for index in ranking:
+        row, buy, sell = rows[index], buys[index], sells[index]
+        buy_price = float(prices[row, buy])
+        sell_price = float(prices[row, sell])
+        opportunities.append({
+            'buy_exchange': exchanges[buy],
+            'sell_exchange': exchanges[sell],
+            'buy_price': buy_price,
+            'sell_price': sell_price,
+            'profit': sell_price - buy_price,
+            'spread': float(spread[row, buy, sell]),
+            'pair': pairs[row]
+        })
     return opportunities
 
+# Detect arbitrage opportunities for many pairs across exchanges, ranked by spread
+def detect_arbitrage_opportunities(pairs):
+    prices, exchanges = fetch_price_matrix(pairs)
+    for row in np.nonzero(np.isnan(prices).all(axis=1))[0]:
+        logging.error("Error fetching prices for pair: %s", pairs[row])
+    return find_opportunities(prices, pairs, exchanges)
+
+# Detect arbitrage opportunities across exchanges
+def detect_arbitrage_opportunity(pair):
+    return detect_arbitrage_opportunities([pair])
+
+# Place one leg after an optional delay, recording the venue's acknowledgement latency
+def place_leg(delay, exchange, pair, side, quantity, price):
+    if delay > 0:
+        time.sleep(delay)
+    started = time.monotonic()
+    order = place_order(exchange, pair, side, quantity, price)
+    if order and order.get('orderId'):
+        get_latency_tracker(exchange, 'orders').record(time.monotonic() - started)
+    return order
+
+# Cancel an order if it is still working and return how much of it was executed
+def cancel_and_get_executed(exchange, order_id):
+    if not order_id:
+        return 0.0
+    response = cancel_order(exchange, order_id)
+    if not response or 'executedQty' not in response:
+        response = get_order_status(exchange, order_id)
+    return float(response.get('executedQty', 0)) if response else 0.0
+
 # Execute arbitrage trade
 def execute_trade(opportunity):
     try:
         buy_exchange = opportunity['buy_exchange']
         sell_exchange = opportunity['sell_exchange']
         pair = opportunity['pair']
-        buy_price = opportunity['buy_price']
-        sell_price = opportunity['sell_price']
-        quantity = min(ARBITRAGE_PARAMS['trade_volume_limit'], 1)  # Can be improved to be dynamic
 
-        # Place buy order
-        buy_order = place_order(buy_exchange, pair, 'BUY', quantity, buy_price)
-        if buy_order is None:
-            logging.error("Failed to place buy order for %s on %s.", pair, buy_exchange)
-            return False
-        
-        buy_order_id = buy_order.get('orderId')
-        if not wait_for_order_filled(buy_exchange, buy_order_id):
-            logging.error("Buy order not filled. Cancelling order %s.", buy_order_id)
-            cancel_order(buy_exchange, buy_order_id)
+        # Size from both order books: the largest quantity whose last unit is still profitable after fees
+        sizing = size_trade(buy_exchange, sell_exchange, pair)
+        if not sizing:
+            logging.info("No profitable depth for %s between %s and %s.", pair, buy_exchange, sell_exchange)
             return False
+        quantity = sizing.quantity
+        buy_price = sizing.buy_limit
+        sell_price = sizing.sell_limit
 
-        # Place sell order
-        sell_order = place_order(sell_exchange, pair, 'SELL', quantity, sell_price)
-        if sell_order is None:
+        # Send both legs together; in 'slow_first' mode the slower venue's leg leaves first
+        if EXECUTION_MODE == 'sequential':
+            delays = None
+        elif EXECUTION_MODE == 'slow_first':
+            delays = leg_delays(buy_exchange, sell_exchange)
+        else:
+            delays = (0.0, 0.0)
+
+        if delays is None:
+            buy_order = place_leg(0.0, buy_exchange, pair, 'BUY', quantity, buy_price)
+            sell_order = place_leg(0.0, sell_exchange, pair, 'SELL', quantity, sell_price) if buy_order else None
+        else:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                buy_future = executor.submit(place_leg, delays[0], buy_exchange, pair, 'BUY', quantity, buy_price)
+                sell_future = executor.submit(place_leg, delays[1], sell_exchange, pair, 'SELL', quantity, sell_price)
+                buy_order, sell_order = buy_future.result(), sell_future.result()
+
+        buy_order_id = buy_order.get('orderId') if buy_order else None
+        sell_order_id = sell_order.get('orderId') if sell_order else None
+        if buy_order_id is None:
+            logging.error("Failed to place buy order for %s on %s.", pair, buy_exchange)
+        if sell_order_id is None:
             logging.error("Failed to place sell order for %s on %s.", pair, sell_exchange)
-            return False
 
-        logging.info(f"Trade executed successfully: Buy on {buy_exchange} at {buy_price}, Sell on {sell_exchange} at {sell_price}.")
-        return True
+        if buy_order_id and sell_order_id:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                buy_filled = executor.submit(wait_for_order_filled, buy_exchange, buy_order_id, EXECUTION_DEADLINE)
+                sell_filled = executor.submit(wait_for_order_filled, sell_exchange, sell_order_id, EXECUTION_DEADLINE)
+                if buy_filled.result() and sell_filled.result():
+                    logging.info(f"Trade executed successfully: Buy on {buy_exchange} at {buy_price}, Sell on {sell_exchange} at {sell_price}.")
+                    return True
+
+        # One leg failed or missed the deadline: cancel what is still working and flatten the position
+        imbalance = cancel_and_get_executed(buy_exchange, buy_order_id) - cancel_and_get_executed(sell_exchange, sell_order_id)
+        if imbalance > 0:
+            logging.error("Unwinding %s %s bought on %s.", imbalance, pair, buy_exchange)
+            place_order(buy_exchange, pair, 'SELL', imbalance, unwind_price('SELL', buy_price))
+        elif imbalance < 0:
+            logging.error("Unwinding %s %s sold on %s.", -imbalance, pair, sell_exchange)
+            place_order(sell_exchange, pair, 'BUY', -imbalance, unwind_price('BUY', sell_price))
+        return False
 
     except Exception as e:
         logging.error("Error executing trade: %s", e)
         return False
 
 # Check if the order is filled
-def wait_for_order_filled(exchange, order_id):
-    retries = TIMING_SETTINGS['order_retry_limit']
-    while retries > 0:
+def wait_for_order_filled(exchange, order_id, timeout=None):
+    # Most fills land within moments, so poll quickly first and back off towards the old 10 s cadence,
+    # giving up after the same total wait as before unless a timeout is given
+    if timeout is None:
+        timeout = TIMING_SETTINGS['order_retry_limit'] * ORDER_POLL_MAX_INTERVAL
+    deadline = time.monotonic() + timeout
+    interval = ORDER_POLL_MIN_INTERVAL
+    while True:
         status = get_order_status(exchange, order_id)
         if status and status.get('status') == 'FILLED':
             logging.info(f"Order {order_id} filled successfully.")
@@ -99,31 +179,131 @@ def wait_for_order_filled(exchange, order_id):
         elif status and status.get('status') == 'CANCELED':
             logging.info(f"Order {order_id} was canceled.")
             return False
-        else:
-            retries -= 1
-            time.sleep(10)  # Wait before retrying
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, ORDER_POLL_MAX_INTERVAL)
     logging.error("Order %s not filled after retries.", order_id)
     return False
 
+class ArbitrageEngine:
+    """Long-lived scan -> execute -> settle pipeline; the stages run concurrently, joined by bounded queues."""
+
+    def __init__(self, pairs=None, exchanges=None, execution_workers=EXECUTION_WORKERS,
+                 settlement_workers=SETTLEMENT_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+        self.pairs = pairs or [pair_info['pair'] for pair_info in TRADING_PAIRS]
+        self.exchanges = list(exchanges or EXCHANGE_API_KEYS.keys())
+        self.connectors = {name: ExchangeConnector(name) for name in self.exchanges}
+        self.order_manager = OrderManager()
+        self.executor = TwoLegExecutor(self.order_manager)
+        self.execution_workers = execution_workers
+        self.settlement_workers = settlement_workers
+        self.opportunities = asyncio.Queue(queue_size)  # Scanner -> execution workers
+        self.placed_trades = asyncio.Queue(queue_size)  # Execution workers -> settlement workers
+        # Pairs being executed or settled: every route of a pair draws on the same books and balances
+        self.in_flight = set()
+        self.stats = {'scans': 0, 'opportunities': 0, 'dropped': 0, 'stale': 0,
+                      'unsized': 0, 'placed': 0, 'filled': 0, 'unwound': 0, 'cancelled': 0}
+        self._tasks = []
+
+    async def run(self) -> None:
+        """Run every stage until cancelled."""
+        self._tasks = [asyncio.create_task(self._scanner())]
+        self._tasks += [asyncio.create_task(self._execution_worker()) for _ in range(self.execution_workers)]
+        self._tasks += [asyncio.create_task(self._settlement_worker()) for _ in range(self.settlement_workers)]
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    async def scan_once(self):
+        """Snapshot every available exchange concurrently and return ranked opportunities."""
+        exchanges = [name for name in self.exchanges if is_available(name)]
+        snapshots = await asyncio.gather(*(self.connectors[name].fetch_prices(self.pairs) for name in exchanges))
+        opportunities = find_opportunities(snapshots_to_matrix(snapshots, self.pairs), self.pairs, exchanges)
+        detected_at = time.monotonic()
+        for opportunity in opportunities:
+            opportunity['detected_at'] = detected_at
+        return opportunities
+
+    async def _scanner(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                opportunities = await self.scan_once()
+                self.stats['scans'] += 1
+                offered = set()
+                for opportunity in opportunities:
+                    # Ranked best first, so only each pair's widest route is offered
+                    pair = opportunity['pair']
+                    if pair in self.in_flight or pair in offered:
+                        continue
+                    offered.add(pair)
+                    try:
+                        self.opportunities.put_nowait(opportunity)
+                    except asyncio.QueueFull:
+                        # Executors are saturated; a newer scan will offer fresher prices anyway
+                        self.stats['dropped'] += 1
+                        continue
+                    self.in_flight.add(pair)
+                    self.stats['opportunities'] += 1
+            except Exception as e:
+                logging.error("Error scanning for arbitrage opportunities: %s", e)
+            await asyncio.sleep(max(0.0, TIMING_SETTINGS['update_interval'] - (time.monotonic() - started)))
+
+    async def _execution_worker(self) -> None:
+        while True:
+            opportunity = await self.opportunities.get()
+            if time.monotonic() - opportunity['detected_at'] > MAX_OPPORTUNITY_AGE:
+                self.stats['stale'] += 1
+                self.in_flight.discard(opportunity['pair'])
+                continue
+            try:
+                sizing = await size_trade_async(opportunity['buy_exchange'], opportunity['sell_exchange'],
+                                                opportunity['pair'])
+                if not sizing:
+                    self.stats['unsized'] += 1
+                    self.in_flight.discard(opportunity['pair'])
+                    continue
+                trade = await self.executor.place_legs(
+                    opportunity['pair'], opportunity['buy_exchange'], opportunity['sell_exchange'], sizing.quantity,
+                    sizing.buy_limit, sizing.sell_limit
+                )
+                self.stats['placed'] += 1
+                # Blocks only this worker when settlement falls behind; the scanner keeps running
+                await self.placed_trades.put(trade)
+            except Exception as e:
+                logging.error("Error executing arbitrage for %s: %s", opportunity['pair'], e)
+                self.in_flight.discard(opportunity['pair'])
+
+    async def _settlement_worker(self) -> None:
+        while True:
+            trade = await self.placed_trades.get()
+            try:
+                result = await self.executor.settle(trade)
+                self.stats[result['status']] += 1
+                if result['status'] == 'filled':
+                    logging.info("Arbitrage trade completed for pair: %s", trade['pair'])
+                else:
+                    logging.error("Arbitrage trade %s for pair: %s", result['status'], trade['pair'])
+            except Exception as e:
+                logging.error("Error settling arbitrage for %s: %s", trade['pair'], e)
+            finally:
+                self.in_flight.discard(trade['pair'])
+
+    async def close(self) -> None:
+        """Stop the pipeline and release connections."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(connector.close() for connector in self.connectors.values()))
+        await self.order_manager.close()
+
 # Monitor arbitrage opportunities
 def monitor_arbitrage():
-    while True:
-        with ThreadPoolExecutor(max_workers=ARBITRAGE_PARAMS['max_threads']) as executor:
-            futures = []
-            for pair_info in TRADING_PAIRS:
-                pair = pair_info['pair']
-                futures.append(executor.submit(detect_arbitrage_opportunity, pair))
-            
-            for future in as_completed(futures):
-                opportunities = future.result()
-                for opportunity in opportunities:
-                    success = execute_trade(opportunity)
-                    if success:
-                        logging.info(f"Arbitrage trade completed for pair: {opportunity['pair']}")
-                    else:
-                        logging.error(f"Arbitrage trade failed for pair: {opportunity['pair']}")
-        
-        time.sleep(TIMING_SETTINGS['update_interval'])  # Wait before checking again
+    asyncio.run(ArbitrageEngine().run())
 
 # Start monitoring for arbitrage opportunities
 if __name__ == "__main__":
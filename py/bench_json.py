@@ -0,0 +1,59 @@
+"""Micro-benchmark of the JSON decoders used on the WebSocket and REST hot paths.
+
+Usage:
+    python bench_json.py [frames.jsonl] [--iterations N]
+
+frames.jsonl holds one recorded WebSocket frame per line. Without it a built-in
+sample of trade frames, combined-stream envelopes and subscription acks is used.
+"""
+
+import argparse
+import time
+from typing import Callable, List
+import json_codec
+
+SAMPLE_FRAMES = [
+    '{"e":"trade","E":1700000000123,"s":"ETHUSDT","t":123456789,"p":"2034.51000000","q":"0.41230000",'
+    '"b":88,"a":50,"T":1700000000121,"m":true,"M":true}',
+    '{"stream":"btcusdt@trade","data":{"e":"trade","E":1700000000456,"s":"BTCUSDT","t":987654321,'
+    '"p":"37012.10000000","q":"0.00120000","b":12,"a":34,"T":1700000000455,"m":false,"M":true}}',
+    '{"pair":"ETH/USD","price":"2034.49","volume":"12.5","timestamp":1700000000789}',
+    '{"result":null,"id":1}',
+]
+
+
+def load_frames(path: str) -> List[str]:
+    """Read recorded frames, one per line."""
+    with open(path, 'r') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def bench(decode: Callable[[str], object], frames: List[str], iterations: int) -> float:
+    """Return decoded frames per second."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for frame in frames:
+            decode(frame)
+    elapsed = time.perf_counter() - start
+    return iterations * len(frames) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('frames', nargs='?', help='File with one recorded frame per line')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames) if args.frames else SAMPLE_FRAMES
+    backends = [name for name, module in (('json', True), ('orjson', json_codec.orjson), ('msgspec', json_codec.msgspec)) if module]
+
+    print(f"{len(frames)} frames x {args.iterations} iterations (active backends: {json_codec.BACKEND} / {json_codec.TRADE_BACKEND})")
+    print(f"{'backend':<10}{'full decode/s':>18}{'trade fields/s':>18}")
+    for backend in backends:
+        full = bench(lambda frame: json_codec.loads(frame, backend), frames, args.iterations)
+        fields = bench(lambda frame: json_codec.decode_trade(frame, backend), frames, args.iterations)
+        print(f"{backend:<10}{full:>18,.0f}{fields:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
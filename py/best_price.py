@@ -0,0 +1,74 @@
+import heapq
+from itertools import count
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rebuild a heap once stale entries outnumber live ones by this factor
+COMPACT_RATIO = 4
+
+Quote = Tuple[float, str]  # (price, exchange)
+
+
+class BestPrice:
+    """Lowest and highest latest price of one pair across exchanges, maintained in O(log E) per update.
+
+    Every update pushes onto a min-heap and a max-heap; superseded entries are dropped lazily when they
+    surface at the top, and both heaps are rebuilt once they grow well past the number of exchanges.
+    """
+
+    def __init__(self):
+        self.prices: Dict[str, float] = {}
+        self._versions: Dict[str, int] = {}
+        self._low: List[Tuple[float, int, str]] = []
+        self._high: List[Tuple[float, int, str]] = []  # Prices negated
+        self._sequence = count()
+
+    def update(self, exchange: str, price: float) -> None:
+        """Record the latest price quoted by an exchange."""
+        version = next(self._sequence)
+        self.prices[exchange] = price
+        self._versions[exchange] = version
+        heapq.heappush(self._low, (price, version, exchange))
+        heapq.heappush(self._high, (-price, version, exchange))
+        if len(self._low) > COMPACT_RATIO * len(self.prices) + 16:
+            self._compact()
+
+    def remove(self, exchange: str) -> None:
+        """Forget an exchange's price; its heap entries become stale."""
+        self.prices.pop(exchange, None)
+        self._versions.pop(exchange, None)
+
+    def lowest(self, usable: Optional[Callable[[str], bool]] = None) -> Optional[Quote]:
+        """Cheapest (price, exchange), skipping exchanges for which usable() is false."""
+        entry = self._top(self._low, usable)
+        return (entry[0], entry[2]) if entry else None
+
+    def highest(self, usable: Optional[Callable[[str], bool]] = None) -> Optional[Quote]:
+        """Most expensive (price, exchange), skipping exchanges for which usable() is false."""
+        entry = self._top(self._high, usable)
+        return (-entry[0], entry[2]) if entry else None
+
+    def _top(self, heap: list, usable: Optional[Callable[[str], bool]]):
+        skipped = []
+        entry = None
+        while heap:
+            top = heap[0]
+            if self._versions.get(top[2]) != top[1]:
+                heapq.heappop(heap)  # Superseded by a newer price
+                continue
+            if usable is None or usable(top[2]):
+                entry = top
+                break
+            # Current but unusable right now (e.g. circuit open): set aside and restore afterwards
+            skipped.append(heapq.heappop(heap))
+        for item in skipped:
+            heapq.heappush(heap, item)
+        return entry
+
+    def _compact(self) -> None:
+        self._low = [(price, self._versions[exchange], exchange) for exchange, price in self.prices.items()]
+        self._high = [(-price, version, exchange) for price, version, exchange in self._low]
+        heapq.heapify(self._low)
+        heapq.heapify(self._high)
+
+    def __len__(self) -> int:
+        return len(self.prices)
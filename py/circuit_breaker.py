@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+from config import CIRCUIT_BREAKER_SETTINGS
+
+# Setup logging
+logging.basicConfig(
+    filename='circuit_breaker.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+DEFAULT_BREAKER_SETTINGS = {
+    'window': 20,                  # Number of recent calls used to compute the error rate
+    'min_calls': 5,                # Calls needed before the breaker may open
+    'error_rate_threshold': 0.5,   # Fraction of failed (or slow) calls that opens the breaker
+    'slow_call_threshold': 2.0,    # Seconds after which a successful call still counts as a failure
+    'open_timeout': 15.0,          # Seconds an open breaker waits before letting a probe through
+}
+
+# Venues scoring below this are left out of opportunity detection
+MIN_HEALTH_SCORE = CIRCUIT_BREAKER_SETTINGS.get('min_health_score', 0.3)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one exchange and endpoint class, driven by error rate and latency."""
+
+    def __init__(self, exchange_name: str, endpoint_class: str, settings: Optional[Dict[str, Any]] = None):
+        self.exchange_name = exchange_name
+        self.endpoint_class = endpoint_class
+        settings = {**DEFAULT_BREAKER_SETTINGS, **(settings or {})}
+        self.min_calls = settings['min_calls']
+        self.error_rate_threshold = settings['error_rate_threshold']
+        self.slow_call_threshold = settings['slow_call_threshold']
+        self.open_timeout = settings['open_timeout']
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._calls = deque(maxlen=settings['window'])  # (failed, latency) per call
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now; an expired open breaker lets exactly one probe through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_timeout:
+                self._transition(HALF_OPEN)
+            # A probe that never reported back (e.g. cancelled) must not wedge the breaker
+            probe_lost = time.monotonic() - self._probe_started >= self.open_timeout
+            if self.state == HALF_OPEN and (not self._probe_in_flight or probe_lost):
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """True while calls are being rejected without a probe being due."""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.open_timeout
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker will admit a probe."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_timeout - time.monotonic())
+
+    def record_success(self, latency: float) -> None:
+        """Record a completed call; slow calls count against the venue like errors."""
+        self._record(latency > self.slow_call_threshold, latency)
+
+    def record_failure(self, latency: Optional[float] = None) -> None:
+        """Record a failed call."""
+        self._record(True, latency if latency is not None else self.slow_call_threshold)
+
+    def _record(self, failed: bool, latency: float) -> None:
+        with self._lock:
+            self._calls.append((failed, latency))
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._transition(OPEN if failed else CLOSED)
+            elif self.state == CLOSED and len(self._calls) >= self.min_calls and self._error_rate() >= self.error_rate_threshold:
+                self._transition(OPEN)
+
+    def _error_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(1 for failed, _ in self._calls if failed) / len(self._calls)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            if state == OPEN:
+                self.opened_at = time.monotonic()
+            return
+        logging.warning(f"Circuit for {self.exchange_name}/{self.endpoint_class}: {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._calls.clear()
+
+    def health_score(self) -> float:
+        """Score from 0 (unusable) to 1 (fast and error-free) combining error rate and mean latency."""
+        with self._lock:
+            if self.state == OPEN:
+                return 0.0
+            if not self._calls:
+                return 1.0 if self.state == CLOSED else 0.5
+            mean_latency = sum(latency for _, latency in self._calls) / len(self._calls)
+            # A venue answering instantly scores 1; one at the slow-call threshold scores 0.5
+            score = (1 - self._error_rate()) / (1 + mean_latency / self.slow_call_threshold)
+            return score * 0.5 if self.state == HALF_OPEN else score
+
+
+_breakers: Dict[tuple, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(exchange_name: str, endpoint_class: str = 'market_data') -> CircuitBreaker:
+    """Return the process-wide breaker for an exchange and endpoint class ('market_data' or 'orders')."""
+    key = (exchange_name, endpoint_class)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            settings = {**CIRCUIT_BREAKER_SETTINGS.get('default', {}), **CIRCUIT_BREAKER_SETTINGS.get(exchange_name, {})}
+            breaker = CircuitBreaker(exchange_name, endpoint_class, settings)
+            _breakers[key] = breaker
+        return breaker
+
+
+def is_available(exchange_name: str, endpoint_class: str = 'market_data') -> bool:
+    """False while the exchange's breaker is open, so scans can skip it without waiting."""
+    return not get_circuit_breaker(exchange_name, endpoint_class).is_open()
+
+
+def health_score(exchange_name: str) -> float:
+    """Health of an exchange for opportunity detection, taken from its market-data breaker."""
+    return get_circuit_breaker(exchange_name, 'market_data').health_score()
+
+
+def is_healthy(exchange_name: str) -> bool:
+    """Whether the exchange is healthy enough to be considered for new opportunities."""
+    return health_score(exchange_name) >= MIN_HEALTH_SCORE
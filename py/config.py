@@ -59,6 +59,7 @@ def load_config_from_env() -> Dict[str, Any]:
             "TIMING_SETTINGS": {
                 "update_interval": int(os.getenv('UPDATE_INTERVAL', 60)),
                 "order_retry_limit": int(os.getenv('ORDER_RETRY_LIMIT', 3)),
+                "request_timeout": float(os.getenv('REQUEST_TIMEOUT', 10)),
             },
             "NOTIFICATION_SETTINGS": {
                 "enable_email_notifications": os.getenv('ENABLE_EMAIL_NOTIFICATIONS', 'false').lower() == 'true',
@@ -67,7 +68,11 @@ def load_config_from_env() -> Dict[str, Any]:
                 "smtp_port": int(os.getenv('SMTP_PORT', 587)),
                 "smtp_user": os.getenv('SMTP_USER', ''),
                 "smtp_password": os.getenv('SMTP_PASSWORD', ''),
-            }
+            },
+            "RATE_LIMIT_SETTINGS": json.loads(os.getenv('RATE_LIMIT_SETTINGS', '{}')),
+            "MARKET_DATA_SETTINGS": json.loads(os.getenv('MARKET_DATA_SETTINGS', '{}')),
+            "CIRCUIT_BREAKER_SETTINGS": json.loads(os.getenv('CIRCUIT_BREAKER_SETTINGS', '{}')),
+            "ORDER_SETTINGS": json.loads(os.getenv('ORDER_SETTINGS', '{}')),
         }
         validate_config(config)
         return config
@@ -98,6 +103,10 @@ GAS_PRICE = CONFIG['GAS_PRICE']
 LOGGING_SETTINGS = CONFIG['LOGGING_SETTINGS']
 TIMING_SETTINGS = CONFIG['TIMING_SETTINGS']
 NOTIFICATION_SETTINGS = CONFIG['NOTIFICATION_SETTINGS']
+RATE_LIMIT_SETTINGS = CONFIG.get('RATE_LIMIT_SETTINGS', {})
+MARKET_DATA_SETTINGS = CONFIG.get('MARKET_DATA_SETTINGS', {})
+CIRCUIT_BREAKER_SETTINGS = CONFIG.get('CIRCUIT_BREAKER_SETTINGS', {})
+ORDER_SETTINGS = CONFIG.get('ORDER_SETTINGS', {})
 
 # Setup logging configuration
 logging.basicConfig(
@@ -115,4 +124,8 @@ if __name__ == "__main__":
     print("Gas Price Settings:", GAS_PRICE)
     print("Logging Settings:", LOGGING_SETTINGS)
     print("Timing Settings:", TIMING_SETTINGS)
-    print("Notification Settings:", NOTIFICATION_SETTINGS)
\ No newline at end of file
+    print("Notification Settings:", NOTIFICATION_SETTINGS)
+    print("Rate Limit Settings:", RATE_LIMIT_SETTINGS)
+    print("Market Data Settings:", MARKET_DATA_SETTINGS)
+    print("Circuit Breaker Settings:", CIRCUIT_BREAKER_SETTINGS)
+    print("Order Settings:", ORDER_SETTINGS)
\ No newline at end of file
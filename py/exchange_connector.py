@@ -1,12 +1,18 @@
 import aiohttp
 import asyncio
-import json
 import logging
 import hmac
 import hashlib
 import time
-from typing import Dict, Any, Optional
-from config import EXCHANGE_API_KEYS, EXCHANGE_URLS
+from typing import Dict, Any, List, Optional
+from config import EXCHANGE_API_KEYS, EXCHANGE_URLS, MARKET_DATA_SETTINGS
+from rate_limiter import get_rate_limiter, get_hedge_budget
+from market_data import Tick, PriceSnapshot, MAX_CONCURRENT_REQUESTS, supports_bulk_ticker, parse_bulk_ticker, websocket_url
+from market_data_hub import get_market_data_hub
+from json_codec import loads
+from price_cache import get_price_cache
+from circuit_breaker import get_circuit_breaker
+from latency_tracker import get_latency_tracker
 
 # Setup logging
 logging.basicConfig(
@@ -15,6 +21,14 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Hedged reads: duplicate a slow request once it exceeds the exchange's rolling latency percentile
+HEDGE_SETTINGS = MARKET_DATA_SETTINGS.get('hedging', {})
+HEDGING_ENABLED = HEDGE_SETTINGS.get('enabled', False)
+HEDGE_PERCENTILE = HEDGE_SETTINGS.get('percentile', 0.9)
+HEDGE_BUDGET_RATIO = HEDGE_SETTINGS.get('budget_ratio', 0.05)  # At most one hedge per 20 requests
+HEDGE_MAX_TOKENS = HEDGE_SETTINGS.get('max_tokens', 10)
+HEDGE_MIRROR_URLS = HEDGE_SETTINGS.get('mirror_urls', {})
+
 class ExchangeConnector:
     """Handles advanced connection and operations with cryptocurrency exchanges."""
 
@@ -23,40 +37,186 @@ class ExchangeConnector:
         self.api_key = EXCHANGE_API_KEYS[exchange_name]['api_key']
         self.api_secret = EXCHANGE_API_KEYS[exchange_name]['api_secret']
         self.base_url = EXCHANGE_URLS[exchange_name]
-        self.rate_limit = 1  # Rate limit per second (can be configured per exchange)
-        self._last_request_time = 0
-        self._rate_limit_interval = 1  # Interval in seconds for rate limiting
+        self.rate_limiter = get_rate_limiter(exchange_name)  # Shared by every client of this exchange
+        self.price_cache = get_price_cache()  # Single-flight price lookups shared by every connector
+        self.market_breaker = get_circuit_breaker(exchange_name, 'market_data')
+        self.order_breaker = get_circuit_breaker(exchange_name, 'orders')
+        self._probe_task = None
+        self.latency = get_latency_tracker(exchange_name, 'market_data')
+        self.hedge_budget = get_hedge_budget(exchange_name, HEDGE_BUDGET_RATIO, HEDGE_MAX_TOKENS)
+        self.hedge_base_url = HEDGE_MIRROR_URLS.get(exchange_name, self.base_url)
+        self.hedges_sent = 0
+        self.hedges_won = 0
         self.session = None
+        self._hedge_session = None  # Separate connection pool so a hedge never queues behind the primary
 
     async def start(self) -> None:
         """Initialize the aiohttp session."""
         if self.session is None:
             self.session = aiohttp.ClientSession()
+        if HEDGING_ENABLED and self._hedge_session is None:
+            self._hedge_session = aiohttp.ClientSession()
+
+    async def fetch_price(self, pair: str, max_age_ms: Optional[float] = None) -> Optional[float]:
+        """Fetch the current price of a trading pair, merging identical concurrent lookups.
 
-    async def fetch_price(self, pair: str) -> Optional[float]:
+        Prices fetched within max_age_ms (default: the configured freshness window) come from memory.
+        """
+        return await self.price_cache.get(
+            (self.exchange_name, pair),
+            lambda: self._fetch_price_uncached(pair),
+            max_age_ms
+        )
+
+    async def _fetch_price_uncached(self, pair: str) -> Optional[float]:
         """Fetch the current price of a trading pair with advanced retry mechanism."""
         await self.start()
-        url = f"{self.base_url}/api/v3/ticker/price?symbol={self._pair_to_symbol(pair)}"
+        endpoint = "/api/v3/ticker/price"
+        query = f"?symbol={self._pair_to_symbol(pair)}"
         retries = 5
         for attempt in range(retries):
+            if not self.market_breaker.allow_request():
+                # Fail fast while the venue is degraded and let a background probe decide when it is back
+                self._schedule_probe(pair)
+                return None
+            await self._ensure_rate_limit(endpoint)
+            started = time.monotonic()
             try:
-                await self._ensure_rate_limit()
-                async with self.session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return float(data['price'])
-                    else:
-                        logging.warning(f"Failed to fetch price. Status: {response.status}")
-                        await asyncio.sleep(self._get_backoff_delay(attempt))
+                status, headers, data = await self._hedged_get(endpoint, query)
+                self.rate_limiter.update_from_headers(headers, status)
+                if status == 200:
+                    price = float(data['price'])
+                    self._record_response(self.market_breaker, status, started)
+                    return price
+                else:
+                    self._record_response(self.market_breaker, status, started)
+                    logging.warning(f"Failed to fetch price. Status: {status}")
+                    await asyncio.sleep(self._get_backoff_delay(attempt))
             except Exception as e:
+                self.market_breaker.record_failure(time.monotonic() - started)
                 logging.error(f"Error fetching price for {pair} from {self.exchange_name}: {e}")
                 await asyncio.sleep(self._get_backoff_delay(attempt))
         return None
 
+    async def fetch_prices(self, pairs: List[str]) -> PriceSnapshot:
+        """Fetch a timestamped snapshot of many pairs, in one request where the exchange allows it."""
+        if self.market_breaker.is_open():
+            # Skip degraded venues immediately instead of stalling the whole scan
+            if pairs:
+                self._schedule_probe(pairs[0])
+            return PriceSnapshot(self.exchange_name, {})
+
+        if supports_bulk_ticker(self.exchange_name):
+            prices = await self._fetch_bulk_prices(pairs)
+            if prices is not None:
+                for pair, price in prices.items():
+                    self.price_cache.put((self.exchange_name, pair), price)
+                return PriceSnapshot(self.exchange_name, prices)
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def fetch_one(pair: str):
+            async with semaphore:
+                return pair, await self.fetch_price(pair)
+
+        results = await asyncio.gather(*(fetch_one(pair) for pair in pairs))
+        return PriceSnapshot(self.exchange_name, {pair: price for pair, price in results if price is not None})
+
+    async def _fetch_bulk_prices(self, pairs: List[str]) -> Optional[Dict[str, float]]:
+        """Fetch every symbol's price at once; returns None so callers can fall back to per-symbol requests."""
+        await self.start()
+        endpoint = "/api/v3/ticker/price"
+        if not self.market_breaker.allow_request():
+            return None
+        weight = self.rate_limiter.weight_for(f"{endpoint}:all")
+        await self._ensure_rate_limit(endpoint, weight)
+        started = time.monotonic()
+        try:
+            status, headers, data = await self._hedged_get(endpoint, weight=weight)
+            self.rate_limiter.update_from_headers(headers, status)
+            if status == 200:
+                prices = parse_bulk_ticker(data, pairs)
+                self._record_response(self.market_breaker, status, started)
+                return prices
+            self._record_response(self.market_breaker, status, started)
+            logging.warning(f"Bulk ticker unavailable on {self.exchange_name}. Status: {status}")
+        except Exception as e:
+            self.market_breaker.record_failure(time.monotonic() - started)
+            logging.error(f"Error fetching bulk ticker from {self.exchange_name}: {e}")
+        return None
+
+    async def _get(self, session: aiohttp.ClientSession, url: str):
+        """GET a URL and return (status, headers, decoded body or None)."""
+        started = time.monotonic()
+        try:
+            async with session.get(url) as response:
+                data = await response.json(loads=loads) if response.status == 200 else None
+                if response.status == 200:
+                    self.latency.record(time.monotonic() - started)
+                return response.status, response.headers, data
+        except asyncio.CancelledError:
+            # A request that lost a hedged race took at least this long; leaving it out would bias the percentile low
+            self.latency.record(time.monotonic() - started)
+            raise
+
+    async def _hedged_get(self, endpoint: str, query: str = '', weight: Optional[float] = None):
+        """GET a read endpoint; if it is slower than the rolling p90, race a duplicate on a second connection.
+
+        The caller has already paid the rate limit for the primary request. A hedge is only sent when
+        the per-exchange hedge budget and the rate limiter both have spare capacity right now.
+        """
+        await self.start()
+        primary = asyncio.create_task(self._get(self.session, f"{self.base_url}{endpoint}{query}"))
+        self.hedge_budget.deposit()
+        delay = self.latency.percentile(HEDGE_PERCENTILE) if HEDGING_ENABLED else None
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            if not self.hedge_budget.try_spend() or not self.rate_limiter.try_acquire(endpoint, weight):
+                return await primary
+
+            self.hedges_sent += 1
+            hedge = asyncio.create_task(self._get(self._hedge_session, f"{self.hedge_base_url}{endpoint}{query}"))
+            tasks.add(hedge)
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # An error status loses the race too while the other request may still succeed
+                    if task.exception() is None and task.result()[0] == 200:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+            # Neither got a 200: prefer a response over an error, and the primary's over the hedge's
+            for task in (primary, hedge):
+                if task.exception() is None:
+                    return task.result()
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _schedule_probe(self, pair: str) -> None:
+        """Probe an open market-data circuit in the background once its timeout has expired."""
+        if self._probe_task is not None and not self._probe_task.done():
+            return
+
+        async def probe():
+            await asyncio.sleep(self.market_breaker.retry_in())
+            await self.fetch_price(pair)
+            logging.info(f"Probed {self.exchange_name}: circuit is {self.market_breaker.state}")
+
+        self._probe_task = asyncio.create_task(probe())
+
     async def place_order(self, pair: str, amount: float, price: float, side: str) -> Dict[str, Any]:
         """Place a buy or sell order with authentication and advanced retry mechanism."""
         await self.start()
-        url = f"{self.base_url}/api/v3/order"
+        endpoint = "/api/v3/order"
+        url = f"{self.base_url}{endpoint}"
         payload = {
             'symbol': self._pair_to_symbol(pair),
             'side': side,
@@ -73,67 +233,53 @@ class ExchangeConnector:
         }
         retries = 5
         for attempt in range(retries):
+            if not self.order_breaker.allow_request():
+                logging.warning(f"Order circuit for {self.exchange_name} is open. Not placing {side} order for {pair}.")
+                return {}
+            await self._ensure_rate_limit(endpoint)
+            started = time.monotonic()
             try:
-                await self._ensure_rate_limit()
                 async with self.session.post(url, data=payload, headers=headers) as response:
+                    self.rate_limiter.update_from_headers(response.headers, response.status)
                     if response.status == 200:
-                        result = await response.json()
+                        result = await response.json(loads=loads)
+                        self._record_response(self.order_breaker, response.status, started)
                         return result
                     else:
+                        self._record_response(self.order_breaker, response.status, started)
                         logging.warning(f"Failed to place order. Status: {response.status}")
                         await asyncio.sleep(self._get_backoff_delay(attempt))
             except Exception as e:
+                self.order_breaker.record_failure(time.monotonic() - started)
                 logging.error(f"Error placing {side} order for {pair} on {self.exchange_name}: {e}")
                 await asyncio.sleep(self._get_backoff_delay(attempt))
         return {}
 
-    async def listen_to_websocket(self) -> None:
-        """Listen to WebSocket updates with advanced management."""
-        websocket_url = await self.get_websocket_url()
-        retries = 5  # Add limit to number of retries for WebSocket reconnections
-        attempt = 0
-        async with aiohttp.ClientSession() as session:
-            while attempt < retries:
-                try:
-                    async with session.ws_connect(websocket_url) as ws:
-                        attempt = 0  # Reset retries after a successful connection
-                        while True:
-                            msg = await ws.receive()
-                            if msg.type == aiohttp.WSMsgType.TEXT:
-                                await self._process_websocket_message(msg.data)
-                            elif msg.type == aiohttp.WSMsgType.ERROR:
-                                logging.error(f"WebSocket error: {ws.exception()}")
-                                break
-                except Exception as e:
-                    attempt += 1
-                    logging.error(f"WebSocket communication error: {e}")
-                    await asyncio.sleep(5 * attempt)  # Exponential backoff before reconnecting
+    async def listen_to_websocket(self, pairs: Optional[List[str]] = None) -> None:
+        """Listen to trade updates through the shared multiplexed market-data hub."""
+        hub = get_market_data_hub()
+        async for tick in hub.stream(self.exchange_name, pairs or ['BTC/USD']):
+            self._process_tick(tick)
 
     async def get_websocket_url(self) -> str:
         """Get the WebSocket URL for real-time data."""
-        return f"wss://{self.exchange_name}.com/ws/{self._pair_to_symbol('BTC/USD')}@trade"
+        return websocket_url(self.exchange_name)
 
-    async def _process_websocket_message(self, message: str) -> None:
-        """Process and parse a WebSocket message with enhanced parsing."""
-        try:
-            data = json.loads(message)
-            pair = data.get('s')
-            price = data.get('p')
-
-            if pair and price:
-                pair = self._symbol_to_pair(pair)
-                if pair:
-                    logging.info(f"Updated price for {pair}: {price}")
-        except json.JSONDecodeError as e:
-            logging.error(f"Error decoding WebSocket message: {e}")
-
-    async def _ensure_rate_limit(self) -> None:
-        """Ensure rate limit compliance with adaptive sleep."""
-        now = time.time()
-        elapsed = now - self._last_request_time
-        if elapsed < self._rate_limit_interval:
-            await asyncio.sleep(self._rate_limit_interval - elapsed)
-        self._last_request_time = time.time()
+    def _process_tick(self, tick: Tick) -> None:
+        """Process a trade update already decoded by the market-data hub."""
+        logging.info(f"Updated price for {tick.pair}: {tick.price}")
+
+    async def _ensure_rate_limit(self, endpoint: str, weight: Optional[float] = None) -> None:
+        """Wait for capacity in the exchange-wide token bucket shared by all connectors."""
+        await self.rate_limiter.acquire(endpoint, weight)
+
+    def _record_response(self, breaker, status: int, started: float) -> None:
+        """Feed a response into a circuit breaker; client errors are our fault, not the venue's."""
+        latency = time.monotonic() - started
+        if status >= 500 or status in (418, 429):
+            breaker.record_failure(latency)
+        else:
+            breaker.record_success(latency)
 
     def _get_backoff_delay(self, attempt: int) -> float:
         """Calculate exponential backoff delay with jitter."""
@@ -156,6 +302,8 @@ class ExchangeConnector:
 
     async def close(self) -> None:
         """Close the aiohttp session."""
+        if self._hedge_session:
+            await self._hedge_session.close()
         if self.session:
             await self.session.close()
             logging.info("Session closed successfully")
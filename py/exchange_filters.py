@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import ORDER_SETTINGS
+from api import get_exchange_info
+from market_data import pair_to_symbol
+from price_cache import SingleFlightCache
+
+# Setup logging
+logging.basicConfig(
+    filename='exchange_filters.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# exchangeInfo is large and changes rarely: keep the parsed table in memory and on disk for this long
+FILTERS_TTL = ORDER_SETTINGS.get('filters_ttl', 3600)
+FILTERS_CACHE_DIR = ORDER_SETTINGS.get('filters_cache_dir', '.')
+FILTERS_RETRY_INTERVAL = 60  # Wait before asking again an exchange whose exchangeInfo could not be loaded
+
+ZERO = Decimal(0)
+
+
+class SymbolFilters:
+    """Trading rules of one symbol (PRICE_FILTER, LOT_SIZE and MIN_NOTIONAL/NOTIONAL)."""
+
+    __slots__ = ('symbol', 'tick_size', 'min_price', 'max_price', 'step_size', 'min_qty', 'max_qty', 'min_notional')
+
+    def __init__(self, symbol: str, tick_size: str = '0', min_price: str = '0', max_price: str = '0',
+                 step_size: str = '0', min_qty: str = '0', max_qty: str = '0', min_notional: str = '0'):
+        self.symbol = symbol
+        self.tick_size = Decimal(tick_size)
+        self.min_price = Decimal(min_price)
+        self.max_price = Decimal(max_price)
+        self.step_size = Decimal(step_size)
+        self.min_qty = Decimal(min_qty)
+        self.max_qty = Decimal(max_qty)
+        self.min_notional = Decimal(min_notional)
+
+    def round_price(self, price: Decimal, side: str) -> Decimal:
+        """Round to the tick size in the trader's favour: buys down, sells up."""
+        return _round_to_step(price, self.tick_size, ROUND_FLOOR if side.upper() == 'BUY' else ROUND_CEILING)
+
+    def round_quantity(self, quantity: Decimal) -> Decimal:
+        """Round down to the lot step size."""
+        return _round_to_step(quantity, self.step_size, ROUND_FLOOR)
+
+    def check(self, side: str, price, quantity) -> 'OrderCheck':
+        """Round an order to this symbol's grid and check it against every filter."""
+        try:
+            price = self.round_price(Decimal(str(price)), side)
+            quantity = self.round_quantity(Decimal(str(quantity)))
+        except InvalidOperation:
+            return OrderCheck(False, None, None, f"unparseable price {price} or quantity {quantity}")
+        if price <= ZERO or price < self.min_price or (self.max_price > ZERO and price > self.max_price):
+            return OrderCheck(False, price, quantity, f"price {price} outside [{self.min_price}, {self.max_price}]")
+        if quantity <= ZERO or quantity < self.min_qty or (self.max_qty > ZERO and quantity > self.max_qty):
+            return OrderCheck(False, price, quantity, f"quantity {quantity} outside [{self.min_qty}, {self.max_qty}]")
+        if price * quantity < self.min_notional:
+            return OrderCheck(False, price, quantity, f"notional {price * quantity} below {self.min_notional}")
+        return OrderCheck(True, price, quantity)
+
+    def as_dict(self) -> Dict[str, str]:
+        return {field: str(getattr(self, field)) for field in self.__slots__}
+
+
+class OrderCheck:
+    """Outcome of validating one order: the rounded price and quantity, or why it would be rejected."""
+
+    __slots__ = ('ok', 'price', 'quantity', 'reason')
+
+    def __init__(self, ok: bool, price: Optional[Decimal], quantity: Optional[Decimal], reason: Optional[str] = None):
+        self.ok = ok
+        self.price = price
+        self.quantity = quantity
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"OrderCheck(ok={self.ok}, price={self.price}, quantity={self.quantity}, reason={self.reason})"
+
+
+def _round_to_step(value: Decimal, step: Decimal, rounding: str) -> Decimal:
+    if step <= ZERO:
+        return value
+    return ((value / step).to_integral_value(rounding) * step).quantize(step)
+
+
+def parse_exchange_info(info: Dict[str, Any]) -> Dict[str, SymbolFilters]:
+    """Build the per-symbol filter table from an exchangeInfo response."""
+    table = {}
+    for symbol_info in info.get('symbols', []):
+        fields = {}
+        for rule in symbol_info.get('filters', []):
+            kind = rule.get('filterType')
+            if kind == 'PRICE_FILTER':
+                fields.update(tick_size=rule.get('tickSize', '0'), min_price=rule.get('minPrice', '0'),
+                              max_price=rule.get('maxPrice', '0'))
+            elif kind == 'LOT_SIZE':
+                fields.update(step_size=rule.get('stepSize', '0'), min_qty=rule.get('minQty', '0'),
+                              max_qty=rule.get('maxQty', '0'))
+            elif kind in ('MIN_NOTIONAL', 'NOTIONAL'):
+                fields['min_notional'] = rule.get('minNotional', '0')
+        table[symbol_info['symbol']] = SymbolFilters(symbol_info['symbol'], **fields)
+    return table
+
+
+_tables: Dict[str, Tuple[float, Dict[str, SymbolFilters]]] = {}
+_loader = SingleFlightCache(freshness_ms=0)  # Only merges concurrent loads; the TTL lives in _tables
+
+
+def _cache_path(exchange_name: str) -> str:
+    return os.path.join(FILTERS_CACHE_DIR, f"{exchange_name}_filters.json")
+
+
+def _load_from_disk(exchange_name: str) -> Optional[Tuple[float, Dict[str, SymbolFilters]]]:
+    try:
+        with open(_cache_path(exchange_name)) as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get('fetched_at', 0) >= FILTERS_TTL:
+        return None
+    try:
+        table = {symbol: SymbolFilters(**fields) for symbol, fields in cached['symbols'].items()}
+    except (KeyError, TypeError, InvalidOperation) as e:
+        logging.error(f"Ignoring corrupt filter cache for {exchange_name}: {e}")
+        return None
+    return cached['fetched_at'], table
+
+
+def _save_to_disk(exchange_name: str, fetched_at: float, table: Dict[str, SymbolFilters]) -> None:
+    path = _cache_path(exchange_name)
+    try:
+        with open(f"{path}.tmp", 'w') as file:
+            json.dump({'fetched_at': fetched_at, 'symbols': {s: f.as_dict() for s, f in table.items()}}, file)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logging.error(f"Error writing filter cache for {exchange_name}: {e}")
+
+
+def get_filters(exchange_name: str, refresh: bool = False) -> Dict[str, SymbolFilters]:
+    """Return the filter table of an exchange from memory, the disk cache or exchangeInfo, in that order."""
+    entry = _tables.get(exchange_name)
+    if entry is not None and not refresh and time.time() - entry[0] < FILTERS_TTL:
+        return entry[1]
+
+    loaded = None if refresh else _load_from_disk(exchange_name)
+    if loaded is None:
+        info = get_exchange_info(exchange_name)
+        if not info or 'symbols' not in info:
+            logging.error(f"Could not load exchangeInfo for {exchange_name}; orders go unvalidated for now")
+            table = entry[1] if entry is not None else {}
+            _tables[exchange_name] = (time.time() - FILTERS_TTL + FILTERS_RETRY_INTERVAL, table)
+            return table
+        loaded = (time.time(), parse_exchange_info(info))
+        _save_to_disk(exchange_name, *loaded)
+        logging.info(f"Loaded filters for {len(loaded[1])} symbols on {exchange_name}")
+    _tables[exchange_name] = loaded
+    return loaded[1]
+
+
+async def get_filters_async(exchange_name: str) -> Dict[str, SymbolFilters]:
+    """get_filters for coroutines: answers from memory, otherwise loads once in a worker thread."""
+    entry = _tables.get(exchange_name)
+    if entry is not None and time.time() - entry[0] < FILTERS_TTL:
+        return entry[1]
+    return await _loader.get(exchange_name, lambda: asyncio.to_thread(get_filters, exchange_name))
+
+
+def _check(filters: Dict[str, SymbolFilters], pair: str, side: str, price, quantity) -> OrderCheck:
+    symbol_filters = filters.get(pair_to_symbol(pair))
+    if symbol_filters is None:
+        if filters:
+            return OrderCheck(False, None, None, f"unknown symbol {pair}")
+        # No filter table for this exchange: let the order through unchanged
+        return OrderCheck(True, Decimal(str(price)), Decimal(str(quantity)))
+    return symbol_filters.check(side, price, quantity)
+
+
+def check_order(exchange_name: str, pair: str, side: str, price, quantity) -> OrderCheck:
+    """Round an order to the exchange's tick and lot sizes and validate it locally."""
+    return _check(get_filters(exchange_name), pair, side, price, quantity)
+
+
+async def check_order_async(exchange_name: str, pair: str, side: str, price, quantity) -> OrderCheck:
+    """check_order for coroutines."""
+    return _check(await get_filters_async(exchange_name), pair, side, price, quantity)
+
+
+def check_orders(orders: Iterable[Dict[str, Any]]) -> List[OrderCheck]:
+    """Validate many orders (dicts with exchange, pair, side, price and quantity) in one call."""
+    tables: Dict[str, Dict[str, SymbolFilters]] = {}
+    results = []
+    for order in orders:
+        exchange_name = order['exchange']
+        if exchange_name not in tables:
+            tables[exchange_name] = get_filters(exchange_name)
+        results.append(_check(tables[exchange_name], order['pair'], order['side'], order['price'], order['quantity']))
+    return results
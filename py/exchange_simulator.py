@@ -0,0 +1,442 @@
+"""Local exchange simulator for load testing and offline benchmarks.
+
+Implements the REST endpoints, the trade WebSocket stream and the user-data (execution report)
+stream used by this project with
+configurable latency, error injection, order fill behaviour and message rates.
+
+Usage:
+    python exchange_simulator.py --exchanges binance,kraken --base-port 8801 --latency lognormal:20:0.5
+
+and point the bots at it, e.g.
+    EXCHANGE_URLS='{"binance": "http://127.0.0.1:8801", "kraken": "http://127.0.0.1:8802"}'
+    MARKET_DATA_SETTINGS='{"websocket_urls": {"binance": "ws://127.0.0.1:8801/ws", ...}}'
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from aiohttp import web, WSMsgType
+
+# Setup logging
+logging.basicConfig(
+    filename='exchange_simulator.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+DEFAULT_PRICES = {
+    'BTCUSD': 37000.0, 'ETHUSD': 2000.0, 'ETHBTC': 0.054, 'LTCUSD': 70.0, 'XRPUSD': 0.6,
+    'BTCUSDT': 37000.0, 'ETHUSDT': 2000.0, 'LTCUSDT': 70.0, 'LTCBTC': 0.0019, 'XRPBTC': 0.000016,
+}
+
+ENDPOINT_WEIGHTS = {
+    '/api/v3/ticker/price': 2,
+    '/api/v3/depth': 5,
+    '/api/v3/exchangeInfo': 10,
+}
+
+
+class LatencyModel:
+    """Samples artificial response latency from a named distribution (milliseconds)."""
+
+    def __init__(self, spec: str = 'fixed:0'):
+        parts = spec.split(':')
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+
+    def sample(self) -> float:
+        """Return a latency in seconds."""
+        if self.kind == 'fixed':
+            ms = self.params[0] if self.params else 0.0
+        elif self.kind == 'uniform':
+            ms = random.uniform(self.params[0], self.params[1])
+        elif self.kind == 'normal':
+            ms = random.gauss(self.params[0], self.params[1])
+        elif self.kind == 'lognormal':
+            # Median in ms and sigma: gives the long right tail real venues show
+            ms = random.lognormvariate(0, self.params[1]) * self.params[0]
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.kind}")
+        return max(ms, 0.0) / 1000
+
+
+class SimulatedExchange:
+    """In-memory exchange state served over HTTP and WebSocket."""
+
+    def __init__(self, name: str, latency: str = 'fixed:0', error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, fill_probability: float = 1.0, fill_delay_ms: float = 0.0,
+                 partial_fill_ratio: float = 0.0, message_rate: float = 10.0, price_skew: float = 0.0,
+                 volatility: float = 0.0005, weight_limit: int = 1200, user_data_stream: bool = True,
+                 seed: Optional[int] = None):
+        self.name = name
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate              # Probability of an injected HTTP 500
+        self.throttle_rate = throttle_rate        # Probability of an injected HTTP 429
+        self.fill_probability = fill_probability  # Probability that a resting order eventually fills
+        self.fill_delay = fill_delay_ms / 1000
+        self.partial_fill_ratio = partial_fill_ratio  # Fraction filled first when partially filling
+        self.message_rate = message_rate          # Trade messages per second per subscribed stream
+        self.volatility = volatility
+        self.weight_limit = weight_limit
+        self.user_data_stream = user_data_stream  # Whether execution reports are pushed over WebSocket
+        self.random = random.Random(seed)
+        self.prices = {symbol: price * (1 + price_skew) for symbol, price in DEFAULT_PRICES.items()}
+        self.orders: Dict[int, Dict[str, Any]] = {}
+        self.book_version = 1
+        self.requests = 0
+        self.listen_keys = set()
+        self.client_order_ids: Dict[str, int] = {}
+        self.user_streams: Dict[web.WebSocketResponse, asyncio.Queue] = {}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._window_start = time.time()
+        self._used_weight = 0
+
+    # Market model
+
+    def tick(self, symbol: str) -> float:
+        """Move a symbol's price one random-walk step and return it."""
+        price = self.prices[symbol] * (1 + self.random.gauss(0, self.volatility))
+        self.prices[symbol] = price
+        self.book_version += 1
+        return price
+
+    def depth(self, symbol: str, limit: int) -> Dict[str, Any]:
+        """Synthesise an order book around the current price."""
+        price = self.prices[symbol]
+        step = price * 0.0001
+        bids = [[f"{price - step * (i + 1):.8f}", f"{self.random.uniform(0.1, 5):.8f}"] for i in range(limit)]
+        asks = [[f"{price + step * (i + 1):.8f}", f"{self.random.uniform(0.1, 5):.8f}"] for i in range(limit)]
+        return {'lastUpdateId': self.book_version, 'bids': bids, 'asks': asks}
+
+    def exchange_info(self) -> Dict[str, Any]:
+        """Symbol list with Binance-style trading filters."""
+        symbols = []
+        for symbol, price in self.prices.items():
+            quote = next(q for q in ('USDT', 'USD', 'BTC') if symbol.endswith(q))
+            tick_size = 10 ** (len(str(int(price))) - 7)
+            symbols.append({
+                'symbol': symbol,
+                'status': 'TRADING',
+                'baseAsset': symbol[:-len(quote)],
+                'quoteAsset': quote,
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': f"{tick_size:.8f}", 'maxPrice': '1000000.00000000', 'tickSize': f"{tick_size:.8f}"},
+                    {'filterType': 'LOT_SIZE', 'minQty': '0.00010000', 'maxQty': '9000.00000000', 'stepSize': '0.00010000'},
+                    {'filterType': 'MIN_NOTIONAL', 'minNotional': '0.00010000' if quote == 'BTC' else '10.00000000'},
+                ],
+            })
+        return {'timezone': 'UTC', 'serverTime': int(time.time() * 1000), 'symbols': symbols}
+
+    # Orders
+
+    def new_order(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Accept a limit order and schedule its fill according to the fill model."""
+        order_id = next(self._order_ids)
+        order = {
+            'symbol': params.get('symbol', ''),
+            'orderId': order_id,
+            'clientOrderId': params.get('newClientOrderId') or uuid.uuid4().hex,
+            'side': params.get('side', 'BUY'),
+            'type': params.get('type', 'LIMIT'),
+            'price': str(params.get('price', '0')),
+            'origQty': str(params.get('quantity', '0')),
+            'executedQty': '0',
+            'status': 'NEW',
+            'timeInForce': params.get('timeInForce', 'GTC'),
+            'transactTime': int(time.time() * 1000),
+        }
+        self.orders[order_id] = order
+        self.client_order_ids[order['clientOrderId']] = order_id
+        self._publish(order)
+        if self.random.random() < self.fill_probability:
+            asyncio.get_running_loop().call_later(self.fill_delay, self._fill, order_id)
+        return order
+
+    def _fill(self, order_id: int) -> None:
+        order = self.orders.get(order_id)
+        if order is None or order['status'] not in ('NEW', 'PARTIALLY_FILLED'):
+            return
+        if order['status'] == 'NEW' and self.partial_fill_ratio > 0:
+            order['executedQty'] = str(float(order['origQty']) * self.partial_fill_ratio)
+            order['status'] = 'PARTIALLY_FILLED'
+            asyncio.get_running_loop().call_later(self.fill_delay, self._fill, order_id)
+        else:
+            order['executedQty'] = order['origQty']
+            order['status'] = 'FILLED'
+        self._publish(order)
+
+    def cancel(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """Cancel an open order; returns None for unknown ids."""
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        if order['status'] in ('NEW', 'PARTIALLY_FILLED'):
+            order['status'] = 'CANCELED'
+            self._publish(order)
+        return order
+
+    def _publish(self, order: Dict[str, Any]) -> None:
+        """Queue an executionReport for every connected user-data stream."""
+        if not self.user_streams:
+            return
+        event = json.dumps({
+            'e': 'executionReport', 'E': int(time.time() * 1000), 's': order['symbol'], 'i': order['orderId'],
+            'S': order['side'], 'o': order['type'], 'p': order['price'], 'q': order['origQty'],
+            'X': order['status'], 'z': order['executedQty'],
+        })
+        for queue in self.user_streams.values():
+            queue.put_nowait(event)
+
+    # HTTP plumbing
+
+    def _consume_weight(self, path: str) -> int:
+        now = time.time()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._used_weight = 0
+        self._used_weight += ENDPOINT_WEIGHTS.get(path, 1)
+        return self._used_weight
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        """Apply latency, weight accounting and error injection to every REST call."""
+        if request.path.startswith('/ws'):
+            return await handler(request)
+        self.requests += 1
+        await asyncio.sleep(self.latency.sample())
+        used_weight = self._consume_weight(request.path)
+        headers = {'X-MBX-USED-WEIGHT-1M': str(used_weight)}
+        if used_weight > self.weight_limit or self.random.random() < self.throttle_rate:
+            return web.json_response({'code': -1003, 'msg': 'Too many requests.'}, status=429,
+                                     headers={**headers, 'Retry-After': '1'})
+        if self.random.random() < self.error_rate:
+            return web.json_response({'code': -1000, 'msg': 'Injected failure.'}, status=500, headers=headers)
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    async def _params(self, request: web.Request) -> Dict[str, str]:
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == 'application/json':
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        return params
+
+    async def handle_ticker(self, request: web.Request) -> web.Response:
+        symbol = request.query.get('symbol')
+        if symbol is None:
+            return web.json_response([{'symbol': s, 'price': f"{p:.8f}"} for s, p in self.prices.items()])
+        if symbol not in self.prices:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        return web.json_response({'symbol': symbol, 'price': f"{self.prices[symbol]:.8f}"})
+
+    async def handle_new_order(self, request: web.Request) -> web.Response:
+        return web.json_response(self.new_order(await self._params(request)))
+
+    async def handle_get_order(self, request: web.Request) -> web.Response:
+        order_id = request.query.get('orderId') or self.client_order_ids.get(request.query.get('origClientOrderId'), 0)
+        order = self.orders.get(int(order_id))
+        if order is None:
+            return web.json_response({'code': -2013, 'msg': 'Order does not exist.'}, status=400)
+        return web.json_response(order)
+
+    async def handle_cancel_order(self, request: web.Request) -> web.Response:
+        params = await self._params(request)
+        order = self.cancel(int(params.get('orderId', 0)))
+        if order is None:
+            return web.json_response({'code': -2011, 'msg': 'Unknown order sent.'}, status=400)
+        return web.json_response(order)
+
+    async def handle_open_orders(self, request: web.Request) -> web.Response:
+        symbol = request.query.get('symbol', '')
+        if symbol not in self.prices:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        return web.json_response([order for order in self.orders.values()
+                                  if order['symbol'] == symbol and order['status'] in ('NEW', 'PARTIALLY_FILLED')])
+
+    async def handle_cancel_open_orders(self, request: web.Request) -> web.Response:
+        params = await self._params(request)
+        symbol = params.get('symbol', '')
+        if symbol not in self.prices:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        open_ids = [order_id for order_id, order in self.orders.items()
+                    if order['symbol'] == symbol and order['status'] in ('NEW', 'PARTIALLY_FILLED')]
+        return web.json_response([self.cancel(order_id) for order_id in open_ids])
+
+    async def handle_depth(self, request: web.Request) -> web.Response:
+        symbol = request.query.get('symbol', '')
+        if symbol not in self.prices:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        return web.json_response(self.depth(symbol, int(request.query.get('limit', 100))))
+
+    async def handle_trades(self, request: web.Request) -> web.Response:
+        symbol = request.query.get('symbol', '')
+        if symbol not in self.prices:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        now = int(time.time() * 1000)
+        trades = [{
+            'id': next(self._trade_ids), 'price': f"{self.prices[symbol]:.8f}",
+            'qty': f"{self.random.uniform(0.01, 2):.8f}", 'time': now, 'isBuyerMaker': self.random.random() < 0.5,
+        } for _ in range(int(request.query.get('limit', 50)))]
+        return web.json_response(trades)
+
+    async def handle_exchange_info(self, request: web.Request) -> web.Response:
+        return web.json_response(self.exchange_info())
+
+    async def handle_new_listen_key(self, request: web.Request) -> web.Response:
+        listen_key = uuid.uuid4().hex
+        self.listen_keys.add(listen_key)
+        return web.json_response({'listenKey': listen_key})
+
+    async def handle_keepalive_listen_key(self, request: web.Request) -> web.Response:
+        params = await self._params(request)
+        if params.get('listenKey') not in self.listen_keys:
+            return web.json_response({'code': -1125, 'msg': 'This listenKey does not exist.'}, status=400)
+        return web.json_response({})
+
+    async def handle_user_stream(self, request: web.Request) -> web.WebSocketResponse:
+        """User-data stream pushing an executionReport whenever an order changes state."""
+        if request.match_info['listen_key'] not in self.listen_keys:
+            raise web.HTTPNotFound()
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        queue: asyncio.Queue = asyncio.Queue()
+        self.user_streams[ws] = queue
+
+        async def forward():
+            while not ws.closed:
+                await ws.send_str(await queue.get())
+
+        sender = asyncio.create_task(forward())
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            sender.cancel()
+            del self.user_streams[ws]
+        return ws
+
+    async def handle_ping(self, request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    async def handle_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """Trade stream accepting SUBSCRIBE/UNSUBSCRIBE requests for <symbol>@trade streams."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        streams: Dict[str, str] = {}
+        feeder = asyncio.create_task(self._feed_trades(ws, streams))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                request_data = json.loads(msg.data)
+                for stream in request_data.get('params', []):
+                    symbol = stream.split('@')[0].upper()
+                    if request_data.get('method') == 'SUBSCRIBE' and symbol in self.prices:
+                        streams[stream] = symbol
+                    elif request_data.get('method') == 'UNSUBSCRIBE':
+                        streams.pop(stream, None)
+                await ws.send_str(json.dumps({'result': None, 'id': request_data.get('id')}))
+        finally:
+            feeder.cancel()
+        return ws
+
+    async def _feed_trades(self, ws: web.WebSocketResponse, streams: Dict[str, str]) -> None:
+        interval = 1 / self.message_rate if self.message_rate > 0 else None
+        while interval is not None and not ws.closed:
+            for stream, symbol in list(streams.items()):
+                now = int(time.time() * 1000)
+                await ws.send_str(json.dumps({'stream': stream, 'data': {
+                    'e': 'trade', 'E': now, 's': symbol, 't': next(self._trade_ids),
+                    'p': f"{self.tick(symbol):.8f}", 'q': f"{self.random.uniform(0.01, 2):.8f}", 'T': now,
+                }}))
+            await asyncio.sleep(interval)
+
+    def make_app(self) -> web.Application:
+        """Build the aiohttp application serving this exchange."""
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get('/api/v3/ping', self.handle_ping)
+        app.router.add_get('/api/v3/ticker/price', self.handle_ticker)
+        app.router.add_post('/api/v3/order', self.handle_new_order)
+        app.router.add_get('/api/v3/order', self.handle_get_order)
+        app.router.add_delete('/api/v3/order', self.handle_cancel_order)
+        app.router.add_get('/api/v3/openOrders', self.handle_open_orders)
+        app.router.add_delete('/api/v3/openOrders', self.handle_cancel_open_orders)
+        app.router.add_get('/api/v3/depth', self.handle_depth)
+        app.router.add_get('/api/v3/trades', self.handle_trades)
+        app.router.add_get('/api/v3/exchangeInfo', self.handle_exchange_info)
+        app.router.add_get('/ws', self.handle_websocket)
+        if self.user_data_stream:
+            app.router.add_post('/api/v3/userDataStream', self.handle_new_listen_key)
+            app.router.add_put('/api/v3/userDataStream', self.handle_keepalive_listen_key)
+            app.router.add_get('/ws/{listen_key}', self.handle_user_stream)
+        return app
+
+
+async def start_simulators(exchanges: List[str], host: str = '127.0.0.1', base_port: int = 8801,
+                           **options) -> List[web.AppRunner]:
+    """Start one simulated exchange per name on consecutive ports; prices are skewed slightly per venue."""
+    skew = options.pop('price_skew', 0.001)
+    runners = []
+    for index, name in enumerate(exchanges):
+        exchange = SimulatedExchange(name, price_skew=skew * index, **options)
+        runner = web.AppRunner(exchange.make_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, base_port + index).start()
+        runners.append(runner)
+        logging.info(f"Simulated {name} listening on http://{host}:{base_port + index}")
+    return runners
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local exchange simulator')
+    parser.add_argument('--exchanges', default='binance', help='Comma-separated exchange names')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=8801)
+    parser.add_argument('--latency', default='fixed:0', help='fixed:MS, uniform:LO:HI, normal:MEAN:SD or lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--fill-probability', type=float, default=1.0)
+    parser.add_argument('--fill-delay-ms', type=float, default=0.0)
+    parser.add_argument('--partial-fill-ratio', type=float, default=0.0)
+    parser.add_argument('--message-rate', type=float, default=10.0, help='Trade messages per second per stream')
+    parser.add_argument('--price-skew', type=float, default=0.001, help='Relative price offset between venues')
+    parser.add_argument('--weight-limit', type=int, default=1200, help='Request weight allowed per minute')
+    parser.add_argument('--no-user-stream', action='store_true', help='Do not offer user-data streams (clients must poll)')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    exchanges = [name.strip() for name in args.exchanges.split(',') if name.strip()]
+    options = {
+        'latency': args.latency, 'error_rate': args.error_rate, 'throttle_rate': args.throttle_rate,
+        'fill_probability': args.fill_probability, 'fill_delay_ms': args.fill_delay_ms,
+        'partial_fill_ratio': args.partial_fill_ratio, 'message_rate': args.message_rate,
+        'price_skew': args.price_skew, 'weight_limit': args.weight_limit,
+        'user_data_stream': not args.no_user_stream, 'seed': args.seed,
+    }
+
+    async def run():
+        await start_simulators(exchanges, args.host, args.base_port, **options)
+        urls = {name: f"http://{args.host}:{args.base_port + i}" for i, name in enumerate(exchanges)}
+        ws_urls = {name: f"ws://{args.host}:{args.base_port + i}/ws" for i, name in enumerate(exchanges)}
+        print(f"EXCHANGE_URLS='{json.dumps(urls)}'")
+        print(f"MARKET_DATA_SETTINGS='{json.dumps({'websocket_urls': ws_urls})}'")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
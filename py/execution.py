@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+from config import ARBITRAGE_PARAMS
+from latency_tracker import get_latency_tracker
+
+# Setup logging
+logging.basicConfig(
+    filename='execution.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# 'concurrent' sends both legs at once, 'slow_first' staggers them so they reach their venues together,
+# 'sequential' waits for the buy acknowledgement before sending the sell
+EXECUTION_MODE = ARBITRAGE_PARAMS.get('execution_mode', 'concurrent')
+EXECUTION_DEADLINE = ARBITRAGE_PARAMS.get('execution_deadline', 5.0)  # Seconds for both legs to be acked and filled
+UNWIND_SLIPPAGE = ARBITRAGE_PARAMS.get('unwind_slippage', 0.005)      # Price concession accepted to flatten a leg
+# Taker fee per exchange as a fraction of notional, e.g. {"binance": 0.001}
+TRADING_FEES = ARBITRAGE_PARAMS.get('trading_fees', {})
+DEFAULT_TRADING_FEE = ARBITRAGE_PARAMS.get('default_trading_fee', 0.001)
+
+
+def trading_fee(exchange_name: str) -> float:
+    """Taker fee charged by an exchange on each fill."""
+    return TRADING_FEES.get(exchange_name, DEFAULT_TRADING_FEE)
+
+
+def ack_latency(exchange_name: str) -> Optional[float]:
+    """Median order acknowledgement latency of an exchange, or None before any order was measured."""
+    tracker = get_latency_tracker(exchange_name, 'orders')
+    latency = tracker.percentile(0.5)
+    return latency if latency is not None else tracker.mean()
+
+
+def leg_delays(first_exchange: str, second_exchange: str) -> Tuple[float, float]:
+    """Send delays for two legs so they arrive together: the slower venue's leg goes out first."""
+    first, second = ack_latency(first_exchange), ack_latency(second_exchange)
+    if first is None or second is None:
+        return 0.0, 0.0
+    # An order reaches the venue after roughly half of its round trip
+    gap = abs(first - second) / 2
+    return (0.0, gap) if first >= second else (gap, 0.0)
+
+
+def unwind_price(side: str, reference_price: float) -> float:
+    """Aggressive limit price for flattening a position, conceding UNWIND_SLIPPAGE against the reference."""
+    return reference_price * (1 - UNWIND_SLIPPAGE) if side == 'SELL' else reference_price * (1 + UNWIND_SLIPPAGE)
+
+
+class TwoLegExecutor:
+    """Executes both legs of an arbitrage trade under one deadline, unwinding any one-sided fill."""
+
+    def __init__(self, order_manager, mode: str = EXECUTION_MODE, deadline: float = EXECUTION_DEADLINE):
+        self.order_manager = order_manager
+        self.mode = mode
+        self.deadline = deadline
+
+    async def execute(self, pair: str, buy_exchange: str, sell_exchange: str, amount: float,
+                      buy_price: float, sell_price: float, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Place, fill or unwind both legs; the result's 'status' is 'filled', 'unwound' or 'cancelled'."""
+        trade = await self.place_legs(pair, buy_exchange, sell_exchange, amount, buy_price, sell_price, deadline)
+        return await self.settle(trade)
+
+    async def place_legs(self, pair: str, buy_exchange: str, sell_exchange: str, amount: float,
+                         buy_price: float, sell_price: float, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Send both legs according to the execution mode; returns the trade to pass to settle."""
+        started = time.monotonic()
+        deadline_at = started + (self.deadline if deadline is None else deadline)
+
+        if self.mode == 'sequential':
+            buy_order = await self._place(0.0, buy_exchange, pair, amount, buy_price, 'BUY', deadline_at)
+            sell_order = {}
+            if buy_order.get('orderId'):
+                sell_order = await self._place(0.0, sell_exchange, pair, amount, sell_price, 'SELL', deadline_at)
+        else:
+            delays = leg_delays(buy_exchange, sell_exchange) if self.mode == 'slow_first' else (0.0, 0.0)
+            buy_order, sell_order = await asyncio.gather(
+                self._place(delays[0], buy_exchange, pair, amount, buy_price, 'BUY', deadline_at),
+                self._place(delays[1], sell_exchange, pair, amount, sell_price, 'SELL', deadline_at)
+            )
+
+        return {
+            'pair': pair, 'buy_exchange': buy_exchange, 'sell_exchange': sell_exchange,
+            'buy_price': buy_price, 'sell_price': sell_price, 'buy_order': buy_order, 'sell_order': sell_order,
+            'unwind_orders': [], 'started': started, 'deadline_at': deadline_at,
+        }
+
+    async def settle(self, trade: Dict[str, Any]) -> Dict[str, Any]:
+        """Wait for both legs to fill before the deadline, otherwise cancel and flatten the position."""
+        pair, buy_exchange, sell_exchange = trade['pair'], trade['buy_exchange'], trade['sell_exchange']
+        legs = [(buy_exchange, trade['buy_order'].get('orderId')), (sell_exchange, trade['sell_order'].get('orderId'))]
+
+        if all(order_id for _, order_id in legs):
+            remaining = max(0.0, trade['deadline_at'] - time.monotonic())
+            filled = await asyncio.gather(*(
+                self.order_manager.wait_for_fill(exchange_name, order_id, remaining) for exchange_name, order_id in legs
+            ))
+            if all(filled):
+                trade.update(status='filled', elapsed=time.monotonic() - trade['started'])
+                logging.info(f"Both legs of {pair} filled in {trade['elapsed'] * 1000:.1f} ms")
+                return trade
+
+        # A leg failed or missed the deadline: stop whatever is still working, then flatten the net position
+        await asyncio.gather(*(
+            self.order_manager.cancel_order(exchange_name, order_id)
+            for exchange_name, order_id in legs
+            if order_id and self.order_manager.tracker.is_open(exchange_name, order_id)
+        ))
+        imbalance = self._executed(*legs[0]) - self._executed(*legs[1])
+        if imbalance > 0:
+            trade['unwind_orders'].append(await self.order_manager.place_order(
+                buy_exchange, pair, imbalance, unwind_price('SELL', trade['buy_price']), 'SELL'))
+        elif imbalance < 0:
+            trade['unwind_orders'].append(await self.order_manager.place_order(
+                sell_exchange, pair, -imbalance, unwind_price('BUY', trade['sell_price']), 'BUY'))
+
+        trade.update(status='unwound' if imbalance else 'cancelled', elapsed=time.monotonic() - trade['started'])
+        logging.warning(f"Arbitrage on {pair} ({buy_exchange} -> {sell_exchange}) {trade['status']}, "
+                        f"imbalance {imbalance}")
+        return trade
+
+    async def _place(self, delay: float, exchange_name: str, pair: str, amount: float, price: float,
+                     side: str, deadline_at: float) -> Dict[str, Any]:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            logging.error(f"Deadline passed before the {side} leg of {pair} was sent to {exchange_name}")
+            return {}
+        return await self.order_manager.place_order(exchange_name, pair, amount, price, side, timeout=remaining)
+
+    def _executed(self, exchange_name: str, order_id) -> float:
+        if not order_id:
+            return 0.0
+        record = self.order_manager.orders.get(exchange_name, order_id)
+        return record.executed_qty if record is not None else 0.0
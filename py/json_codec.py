@@ -0,0 +1,99 @@
+import json
+import logging
+from typing import Any, List, Optional, Union
+from config import MARKET_DATA_SETTINGS
+
+# Optional fast decoders; the stdlib json module is always available as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Force a backend ('msgspec', 'orjson' or 'json'); by default the fastest installed one is used
+JSON_BACKEND = MARKET_DATA_SETTINGS.get('json_backend')
+
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec else (ValueError,)
+
+
+class TradeFrame:
+    """Fields of a trade message that the bots actually use; everything else is skipped."""
+
+    __slots__ = ('s', 'p', 'pair', 'price', 'E')
+
+    def __init__(self, s=None, p=None, pair=None, price=None, E=None):
+        self.s = s          # Exchange symbol, e.g. ETHUSDT
+        self.p = p          # Trade price as sent by the exchange
+        self.pair = pair    # Trading pair for feeds that already use our naming
+        self.price = price
+        self.E = E          # Event time in milliseconds
+
+    @classmethod
+    def from_dict(cls, data: Any) -> Optional['TradeFrame']:
+        """Build a frame from a fully decoded message, unwrapping combined-stream envelopes."""
+        if isinstance(data, dict) and 'stream' in data:
+            data = data.get('data')
+        if not isinstance(data, dict):
+            return None
+        return cls(data.get('s'), data.get('p'), data.get('pair'), data.get('price'), data.get('E'))
+
+
+if msgspec is not None:
+    class _TradeFields(msgspec.Struct):
+        s: Optional[str] = None
+        p: Union[str, float, None] = None
+        pair: Optional[str] = None
+        price: Union[str, float, None] = None
+        E: Optional[int] = None
+
+    class _TradeEnvelope(_TradeFields):
+        stream: Optional[str] = None
+        data: Optional[_TradeFields] = None
+
+    _trade_decoder = msgspec.json.Decoder(_TradeEnvelope)
+    _any_decoder = msgspec.json.Decoder()
+
+
+def _select_backend(preference: List[str]) -> str:
+    """Pick the configured backend, falling back to the fastest one installed."""
+    modules = {'msgspec': msgspec, 'orjson': orjson, 'json': json}
+    available = [name for name in preference if modules[name] is not None]
+    if JSON_BACKEND in available:
+        return JSON_BACKEND
+    if JSON_BACKEND:
+        logging.warning(f"JSON backend {JSON_BACKEND} is not installed. Using {available[0]}.")
+    return available[0]
+
+
+# msgspec's typed decoder skips unused fields, so it is preferred for trades; see bench_json.py
+BACKEND = _select_backend(['orjson', 'msgspec', 'json'])
+TRADE_BACKEND = _select_backend(['msgspec', 'orjson', 'json'])
+
+
+def loads(data: Union[str, bytes], backend: Optional[str] = None) -> Any:
+    """Decode a complete JSON document with the active backend."""
+    backend = backend or BACKEND
+    if backend == 'orjson':
+        return orjson.loads(data)
+    if backend == 'msgspec':
+        return _any_decoder.decode(data)
+    return json.loads(data)
+
+
+def decode_trade(data: Union[str, bytes], backend: Optional[str] = None):
+    """Decode only the trade fields of a WebSocket frame.
+
+    Returns an object exposing s, p, pair, price and E (a msgspec struct or a TradeFrame),
+    or None for frames that are not trades. Raises one of DecodeError on malformed input.
+    """
+    backend = backend or TRADE_BACKEND
+    if backend == 'msgspec':
+        frame = _trade_decoder.decode(data)
+        if frame.stream is not None:
+            return frame.data
+        return frame
+    return TradeFrame.from_dict(loads(data, backend))
@@ -0,0 +1,58 @@
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyTracker:
+    """Rolling window of request latencies with cheap percentile lookups."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, refresh_every: int = 10):
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._samples = deque(maxlen=window)
+        self._sorted = []
+        self._since_refresh = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Add a latency sample in seconds."""
+        with self._lock:
+            self._samples.append(latency)
+            self._since_refresh += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-quantile (0..1) of recent samples, or None until enough samples exist."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            # Re-sorting on every call would dominate the hot path; a slightly stale view is fine
+            if self._since_refresh >= self.refresh_every or not self._sorted:
+                self._sorted = sorted(self._samples)
+                self._since_refresh = 0
+            index = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+            return self._sorted[index]
+
+    def mean(self) -> Optional[float]:
+        """Mean of recent samples, or None if there are none."""
+        with self._lock:
+            if not self._samples:
+                return None
+            return sum(self._samples) / len(self._samples)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+_trackers: Dict[tuple, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(exchange_name: str, kind: str = 'market_data') -> LatencyTracker:
+    """Return the process-wide latency tracker for an exchange and request kind."""
+    key = (exchange_name, kind)
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[key] = tracker
+        return tracker
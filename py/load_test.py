@@ -0,0 +1,162 @@
+"""End-to-end load test of the trading components against the local exchange simulator.
+
+Point EXCHANGE_URLS (and MARKET_DATA_SETTINGS['websocket_urls']) at simulator instances, e.g. the
+values printed by exchange_simulator.py, then run:
+
+    python load_test.py --iterations 200 [--start-simulators]
+
+With --start-simulators the simulators are started in a background thread (with its own event loop,
+so blocking clients cannot stall them) on the hosts/ports from EXCHANGE_URLS.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from decimal import Decimal, ROUND_CEILING
+from typing import Awaitable, Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+from config import EXCHANGE_URLS, TRADING_PAIRS
+
+
+def summarize(name: str, latencies: List[float], elapsed: float) -> None:
+    """Print throughput and latency percentiles for a benchmark."""
+    if not latencies:
+        print(f"{name:<28} no samples")
+        return
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    print(f"{name:<28}{len(latencies):>8} calls{len(latencies) / elapsed:>10.1f}/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+
+async def timed(calls: List[Callable[[], Awaitable]], concurrency: int) -> List[float]:
+    """Run the calls with bounded concurrency and return each call's latency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(call):
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(run(call) for call in calls))
+    return latencies
+
+
+async def bench_connector(pairs: List[str], iterations: int, concurrency: int) -> None:
+    from exchange_connector import ExchangeConnector
+    connectors = [ExchangeConnector(name) for name in EXCHANGE_URLS]
+    started = time.perf_counter()
+    latencies = await timed([lambda c=c: c.fetch_prices(pairs) for c in connectors for _ in range(iterations)], concurrency)
+    summarize('ExchangeConnector.snapshot', latencies, time.perf_counter() - started)
+    for connector in connectors:
+        await connector.close()
+
+
+async def resting_buy(exchange_name: str, pair: str) -> Optional[Tuple[float, float]]:
+    """(price, quantity) of the smallest BUY the exchange's filters accept, priced 10% under the ticker so it rests."""
+    from exchange_connector import ExchangeConnector
+    from exchange_filters import get_filters_async, check_order_async
+    from market_data import pair_to_symbol
+    connector = ExchangeConnector(exchange_name)
+    ticker = await connector.fetch_price(pair)
+    await connector.close()
+    if ticker is None:
+        return None
+    price = Decimal(str(ticker)) * Decimal('0.9')
+    quantity = Decimal('0.001')
+    symbol_filters = (await get_filters_async(exchange_name)).get(pair_to_symbol(pair))
+    if symbol_filters is not None:
+        quantity = max(symbol_filters.min_qty, symbol_filters.min_notional / price * Decimal('1.01'))
+        if symbol_filters.step_size > 0:
+            quantity = (quantity / symbol_filters.step_size).to_integral_value(ROUND_CEILING) * symbol_filters.step_size
+    check = await check_order_async(exchange_name, pair, 'BUY', price, quantity)
+    if not check.ok:
+        print(f"{exchange_name}: no valid test order for {pair} ({check.reason})")
+        return None
+    return float(check.price), float(check.quantity)
+
+
+async def bench_order_manager(pairs: List[str], iterations: int, concurrency: int) -> None:
+    from order_manager import OrderManager
+    manager = OrderManager()
+    orders = {name: await resting_buy(name, pairs[0]) for name in EXCHANGE_URLS}
+    placed = 0
+
+    async def round_trip(exchange_name: str):
+        nonlocal placed
+        price, quantity = orders[exchange_name]
+        order = await manager.place_order(exchange_name, pairs[0], quantity, price, 'BUY')
+        if order.get('orderId'):
+            placed += 1
+            await manager.exchanges[exchange_name].get_order_status(order['orderId'])
+            await manager.cancel_order(exchange_name, order['orderId'])
+
+    started = time.perf_counter()
+    latencies = await timed(
+        [lambda e=e: round_trip(e) for e in EXCHANGE_URLS if orders[e] for _ in range(iterations)], concurrency
+    )
+    summarize('OrderManager place/get/cancel', latencies, time.perf_counter() - started)
+    if placed < len(latencies):
+        print(f"{len(latencies) - placed} of {len(latencies)} orders were not accepted")
+    await manager.close()
+
+
+async def bench_trading_bot(iterations: int) -> None:
+    from trading_bot import TradingBot
+    bot = TradingBot()
+    started = time.perf_counter()
+    latencies = await timed([bot.fetch_prices for _ in range(iterations)], 1)
+    summarize('TradingBot.fetch_prices', latencies, time.perf_counter() - started)
+    await bot.close()
+
+
+async def bench_arbitrage(pairs: List[str], iterations: int) -> None:
+    import arbitrage
+    started = time.perf_counter()
+    latencies = await timed(
+        [lambda p=p: asyncio.to_thread(arbitrage.detect_arbitrage_opportunity, p) for p in pairs for _ in range(iterations)], 4
+    )
+    summarize('arbitrage.detect', latencies, time.perf_counter() - started)
+
+
+def start_simulators_in_thread() -> None:
+    """Serve a simulator for every configured exchange from a daemon thread."""
+    from exchange_simulator import SimulatedExchange
+    from aiohttp import web
+    ready = threading.Event()
+
+    async def serve():
+        for index, (name, url) in enumerate(EXCHANGE_URLS.items()):
+            parsed = urlparse(url)
+            runner = web.AppRunner(SimulatedExchange(name, price_skew=0.001 * index).make_app())
+            await runner.setup()
+            await web.TCPSite(runner, parsed.hostname, parsed.port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Load test against the exchange simulator')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--start-simulators', action='store_true')
+    args = parser.parse_args()
+
+    if args.start_simulators:
+        start_simulators_in_thread()
+
+    pairs = [pair['pair'] for pair in TRADING_PAIRS]
+    await bench_connector(pairs, args.iterations, args.concurrency)
+    await bench_order_manager(pairs, args.iterations, args.concurrency)
+    await bench_trading_bot(max(1, args.iterations // 10))
+    await bench_arbitrage(pairs, max(1, args.iterations // 10))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
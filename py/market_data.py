@@ -0,0 +1,87 @@
+import time
+from typing import Dict, Iterable, Optional
+from config import MARKET_DATA_SETTINGS
+
+# Exchanges that expose the all-symbols ticker endpoint; None means every exchange
+BULK_TICKER_EXCHANGES = MARKET_DATA_SETTINGS.get('bulk_ticker_exchanges')
+# Upper bound on concurrent per-symbol requests when the bulk endpoint is unavailable
+MAX_CONCURRENT_REQUESTS = MARKET_DATA_SETTINGS.get('max_concurrent_requests', 5)
+# Per-exchange WebSocket endpoints accepting SUBSCRIBE/UNSUBSCRIBE stream requests
+WEBSOCKET_URLS = MARKET_DATA_SETTINGS.get('websocket_urls', {})
+# Seconds a quote stays usable after it was received, per exchange; quiet feeds can be given longer
+MAX_QUOTE_AGE = MARKET_DATA_SETTINGS.get('max_quote_age', {})
+DEFAULT_MAX_QUOTE_AGE = MARKET_DATA_SETTINGS.get('default_max_quote_age', 5.0)
+
+
+class Tick:
+    """A single trade price update received from an exchange stream."""
+
+    __slots__ = ('exchange_name', 'pair', 'price', 'event_time', 'received_at')
+
+    def __init__(self, exchange_name: str, pair: str, price: float,
+                 event_time: Optional[float] = None, received_at: Optional[float] = None):
+        self.exchange_name = exchange_name
+        self.pair = pair
+        self.price = price
+        self.event_time = event_time  # Exchange timestamp in seconds, when the message carries one
+        self.received_at = time.time() if received_at is None else received_at
+
+    def __repr__(self) -> str:
+        return f"Tick({self.exchange_name!r}, {self.pair!r}, {self.price})"
+
+
+class PriceSnapshot:
+    """Timestamped map of pair prices taken from a single exchange."""
+
+    def __init__(self, exchange_name: str, prices: Dict[str, float], timestamp: Optional[float] = None):
+        self.exchange_name = exchange_name
+        self.prices = prices
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def get(self, pair: str) -> Optional[float]:
+        """Return the price of a pair, or None if the exchange did not quote it."""
+        return self.prices.get(pair)
+
+    def age(self) -> float:
+        """Seconds elapsed since the snapshot was taken."""
+        return time.time() - self.timestamp
+
+    def __contains__(self, pair: str) -> bool:
+        return pair in self.prices
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __repr__(self) -> str:
+        return f"PriceSnapshot({self.exchange_name!r}, {len(self.prices)} prices, timestamp={self.timestamp:.3f})"
+
+
+def supports_bulk_ticker(exchange_name: str) -> bool:
+    """Whether the exchange can return every symbol's price in one request."""
+    return BULK_TICKER_EXCHANGES is None or exchange_name in BULK_TICKER_EXCHANGES
+
+
+def max_quote_age(exchange_name: str) -> float:
+    """How long a quote from the exchange may be acted on after it arrived."""
+    return MAX_QUOTE_AGE.get(exchange_name, DEFAULT_MAX_QUOTE_AGE)
+
+
+def websocket_url(exchange_name: str) -> str:
+    """Return the multiplexed market-data WebSocket endpoint of an exchange."""
+    return WEBSOCKET_URLS.get(exchange_name, f"wss://{exchange_name}.com/ws")
+
+
+def pair_to_symbol(pair: str) -> str:
+    """Convert trading pair to symbol used by the exchange."""
+    return pair.replace('/', '').upper()
+
+
+def parse_bulk_ticker(data: Iterable[Dict[str, str]], pairs: Iterable[str]) -> Dict[str, float]:
+    """Pick the requested pairs out of an all-symbols ticker response."""
+    wanted = {pair_to_symbol(pair): pair for pair in pairs}
+    prices = {}
+    for ticker in data:
+        pair = wanted.get(ticker.get('symbol'))
+        if pair is not None:
+            prices[pair] = float(ticker['price'])
+    return prices
@@ -0,0 +1,231 @@
+import aiohttp
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+from config import MARKET_DATA_SETTINGS
+from market_data import Tick, pair_to_symbol, websocket_url
+from json_codec import decode_trade, DecodeError
+
+# Setup logging
+logging.basicConfig(
+    filename='market_data_hub.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+RECONNECT_DELAY = MARKET_DATA_SETTINGS.get('reconnect_delay', 1)
+MAX_RECONNECT_DELAY = MARKET_DATA_SETTINGS.get('max_reconnect_delay', 60)
+HEARTBEAT_INTERVAL = MARKET_DATA_SETTINGS.get('heartbeat_interval', 30)
+CONSUMER_QUEUE_SIZE = MARKET_DATA_SETTINGS.get('consumer_queue_size', 1000)
+
+TickConsumer = Callable[[Tick], None]
+
+
+class ExchangeStream:
+    """One multiplexed WebSocket connection to an exchange carrying many trade streams."""
+
+    def __init__(self, exchange_name: str, session: aiohttp.ClientSession):
+        self.exchange_name = exchange_name
+        self.url = websocket_url(exchange_name)
+        self.session = session
+        self.consumers: Dict[str, List[TickConsumer]] = {}
+        self.symbols: Dict[str, str] = {}  # Exchange symbol -> trading pair
+        self.messages_received = 0
+        self.reconnects = 0
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._request_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the connection loop if it is not already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the connection loop and close the socket."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def add_consumer(self, pairs: Iterable[str], consumer: TickConsumer) -> None:
+        """Route updates for the pairs to the consumer, subscribing to any new streams."""
+        new_streams = []
+        for pair in pairs:
+            if pair not in self.consumers:
+                self.consumers[pair] = []
+                self.symbols[pair_to_symbol(pair)] = pair
+                new_streams.append(self._stream_name(pair))
+            self.consumers[pair].append(consumer)
+        if new_streams:
+            await self._send_subscription('SUBSCRIBE', new_streams)
+
+    async def remove_consumer(self, consumer: TickConsumer) -> None:
+        """Stop routing updates to the consumer, unsubscribing streams nobody listens to."""
+        idle_streams = []
+        for pair in list(self.consumers):
+            consumers = self.consumers[pair]
+            if consumer in consumers:
+                consumers.remove(consumer)
+            if not consumers:
+                del self.consumers[pair]
+                self.symbols.pop(pair_to_symbol(pair), None)
+                idle_streams.append(self._stream_name(pair))
+        if idle_streams:
+            await self._send_subscription('UNSUBSCRIBE', idle_streams)
+
+    async def _run(self) -> None:
+        """Keep the connection open forever, resubscribing to every stream after a reconnect."""
+        attempt = 0
+        while True:
+            try:
+                async with self.session.ws_connect(self.url, heartbeat=HEARTBEAT_INTERVAL) as ws:
+                    self._ws = ws
+                    attempt = 0  # Reset backoff after a successful connection
+                    logging.info(f"Connected market-data stream for {self.exchange_name} at {self.url}")
+                    if self.consumers:
+                        await self._send_subscription('SUBSCRIBE', [self._stream_name(pair) for pair in self.consumers])
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self._dispatch(msg.data)
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            logging.error(f"WebSocket error for {self.exchange_name}: {ws.exception()}")
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"WebSocket communication error for {self.exchange_name}: {e}")
+            finally:
+                self._ws = None
+            attempt += 1
+            self.reconnects += 1
+            await asyncio.sleep(min(RECONNECT_DELAY * 2 ** (attempt - 1), MAX_RECONNECT_DELAY))
+
+    async def _send_subscription(self, method: str, streams: List[str]) -> None:
+        """Send a (un)subscribe request if the socket is connected; otherwise it is sent on connect."""
+        if self._ws is None or self._ws.closed:
+            return
+        self._request_id += 1
+        try:
+            await self._ws.send_str(json.dumps({'method': method, 'params': streams, 'id': self._request_id}))
+        except Exception as e:
+            logging.error(f"Error sending {method} to {self.exchange_name}: {e}")
+
+    def _dispatch(self, message: str) -> None:
+        """Decode a frame once and fan the resulting tick out to every consumer of its pair."""
+        self.messages_received += 1
+        try:
+            frame = decode_trade(message)
+        except DecodeError as e:
+            logging.error(f"Error decoding WebSocket message from {self.exchange_name}: {e}")
+            return
+        if frame is None:
+            return
+        tick = self._to_tick(frame)
+        if tick is None:
+            return
+        for consumer in self.consumers.get(tick.pair, ()):
+            try:
+                consumer(tick)
+            except Exception as e:
+                logging.error(f"Market-data consumer failed for {tick.pair} on {self.exchange_name}: {e}")
+
+    def _to_tick(self, frame) -> Optional[Tick]:
+        """Build a tick from a decoded trade frame; subscription acks and unknown messages yield None."""
+        pair = frame.pair or self.symbols.get(frame.s)
+        price = frame.price or frame.p
+        if not pair or not price or pair not in self.consumers:
+            return None
+        event_time = frame.E
+        try:
+            return Tick(
+                self.exchange_name,
+                pair,
+                float(price),
+                event_time / 1000 if event_time else None,
+                time.time()
+            )
+        except (TypeError, ValueError):
+            # One malformed frame must not end the stream that every consumer of this exchange shares
+            logging.warning(f"Skipping {pair} frame with bad price {price!r} or time {event_time!r} from {self.exchange_name}")
+            return None
+
+    @staticmethod
+    def _stream_name(pair: str) -> str:
+        return f"{pair_to_symbol(pair).lower()}@trade"
+
+
+class MarketDataHub:
+    """Process-wide market-data hub: one connection per exchange, any number of in-process consumers."""
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.streams: Dict[str, ExchangeStream] = {}
+
+    async def subscribe(self, exchange_name: str, pairs: Iterable[str], consumer: TickConsumer) -> None:
+        """Deliver every trade tick for the pairs on the exchange to the consumer callback."""
+        stream = self._get_stream(exchange_name)
+        await stream.add_consumer(pairs, consumer)
+        stream.start()
+
+    async def unsubscribe(self, exchange_name: str, consumer: TickConsumer) -> None:
+        """Detach a consumer previously registered with subscribe."""
+        stream = self.streams.get(exchange_name)
+        if stream is not None:
+            await stream.remove_consumer(consumer)
+
+    async def stream(self, exchange_name: str, pairs: Iterable[str],
+                     maxsize: int = CONSUMER_QUEUE_SIZE) -> AsyncIterator[Tick]:
+        """Iterate over ticks through a bounded queue; the oldest tick is dropped when a reader falls behind."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+        def enqueue(tick: Tick) -> None:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(tick)
+
+        await self.subscribe(exchange_name, pairs, enqueue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            await self.unsubscribe(exchange_name, enqueue)
+
+    def subscribed_pairs(self, exchange_name: str) -> Set[str]:
+        """Pairs currently streamed from an exchange."""
+        stream = self.streams.get(exchange_name)
+        return set(stream.consumers) if stream else set()
+
+    async def close(self) -> None:
+        """Close every exchange connection and the shared session."""
+        for stream in self.streams.values():
+            await stream.stop()
+        self.streams.clear()
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def _get_stream(self, exchange_name: str) -> ExchangeStream:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        stream = self.streams.get(exchange_name)
+        if stream is None:
+            stream = ExchangeStream(exchange_name, self.session)
+            self.streams[exchange_name] = stream
+        return stream
+
+
+_hub: Optional[MarketDataHub] = None
+
+
+def get_market_data_hub() -> MarketDataHub:
+    """Return the market-data hub shared by every component in the process."""
+    global _hub
+    if _hub is None:
+        _hub = MarketDataHub()
+    return _hub
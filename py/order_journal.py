@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from config import ORDER_SETTINGS
+from order_store import OrderRecord, OrderKey, TERMINAL_STATUSES
+
+# Setup logging
+logging.basicConfig(
+    filename='order_journal.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# One JSON object per line; records appended within this window share a single fsync
+JOURNAL_PATH = ORDER_SETTINGS.get('journal_path', 'order_journal.jsonl')
+GROUP_COMMIT_MS = ORDER_SETTINGS.get('journal_group_commit_ms', 2)
+
+
+class OrderJournal:
+    """Append-only write-ahead journal of order events with group fsync.
+
+    Events: 'placed' (intent, written before the order is sent), 'acked' (exchange order id known)
+    and one event per status change ('partially_filled', 'filled', 'canceled', ...).
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH, group_commit_ms: float = GROUP_COMMIT_MS):
+        self.path = path
+        self.group_commit = group_commit_ms / 1000
+        self.records_written = 0
+        self.syncs = 0
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending_sync: Optional[asyncio.Future] = None
+        self._recovered = False
+
+    def placed(self, exchange: str, client_order_id: str, pair: str, amount: float, price: float, order_type: str) -> None:
+        """Record the intent to place an order before it is sent."""
+        self._append({'ev': 'placed', 'x': exchange, 'c': client_order_id, 'p': pair, 'a': amount, 'pr': price, 's': order_type})
+
+    def acked(self, record: OrderRecord, client_order_id: Optional[str] = None) -> None:
+        """Record an order the exchange accepted, with everything needed to rebuild it."""
+        self._append({
+            'ev': 'acked', 'x': record.exchange, 'id': record.order_id, 'c': client_order_id, 'p': record.pair,
+            'a': record.amount, 'pr': record.price, 's': record.order_type, 'st': record.status, 'q': record.executed_qty,
+        })
+
+    def status(self, record: OrderRecord) -> None:
+        """Record a status change of a known order."""
+        self._append({'ev': record.status, 'x': record.exchange, 'id': record.order_id, 'q': record.executed_qty})
+
+    def abandoned(self, exchange: str, client_order_id: str) -> None:
+        """Record that a placed intent never reached the exchange."""
+        self._append({'ev': 'abandoned', 'x': exchange, 'c': client_order_id})
+
+    async def commit(self) -> None:
+        """Wait until everything appended so far is on disk; concurrent callers share one fsync."""
+        await asyncio.shield(self._schedule_sync())
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        entry['t'] = round(time.time(), 3)
+        if self._file.closed:
+            self._file = open(self.path, 'a', encoding='utf-8')  # Another user of the journal closed it
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.records_written += 1
+        try:
+            self._schedule_sync()
+        except RuntimeError:
+            self._file.flush()  # No running loop (e.g. recovery at start-up): flush now, fsync on close
+
+    def _schedule_sync(self) -> asyncio.Future:
+        if self._pending_sync is None:
+            loop = asyncio.get_running_loop()
+            self._pending_sync = loop.create_future()
+            loop.call_later(self.group_commit, self._sync)
+        return self._pending_sync
+
+    def _sync(self) -> None:
+        future, self._pending_sync = self._pending_sync, None
+        if self._file.closed:
+            self._finish_sync(future, None)  # close() already flushed and synced everything
+            return
+        try:
+            self._file.flush()
+        except (OSError, ValueError) as e:
+            self._finish_sync(future, e)
+            return
+        # fsync can take milliseconds, so it runs off the event loop
+        done = asyncio.get_running_loop().run_in_executor(None, os.fsync, self._file.fileno())
+        done.add_done_callback(lambda task: self._finish_sync(future, task.exception()))
+
+    def _finish_sync(self, future: asyncio.Future, error: Optional[BaseException]) -> None:
+        self.syncs += 1
+        if future.done():
+            return
+        if error is not None:
+            logging.error(f"Error syncing order journal {self.path}: {error}")
+            future.set_exception(error)
+            future.exception()  # Fire-and-forget appends never retrieve it
+        else:
+            future.set_result(None)
+
+    def replay(self) -> Tuple[Dict[OrderKey, OrderRecord], List[Dict[str, Any]]]:
+        """Rebuild open orders from the journal; also returns placed intents that were never acknowledged."""
+        self._file.flush()
+        orders: Dict[OrderKey, OrderRecord] = {}
+        intents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        started = time.perf_counter()
+        lines = 0
+        with open(self.path, encoding='utf-8') as journal:
+            for line in journal:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Only the last line can be torn, by a crash in the middle of a write
+                    logging.warning(f"Skipping unreadable journal line {lines} in {self.path}")
+                    continue
+                event, exchange = entry['ev'], entry['x']
+                if event == 'placed':
+                    intents[(exchange, entry['c'])] = entry
+                elif event == 'abandoned':
+                    intents.pop((exchange, entry['c']), None)
+                elif event == 'acked':
+                    intents.pop((exchange, entry.get('c')), None)
+                    record = OrderRecord(exchange, entry['id'], entry['p'], entry['a'], entry['pr'], entry['s'],
+                                         entry['st'], entry['q'], entry['t'], entry['t'])
+                    if record.is_open:
+                        orders[record.key] = record
+                else:
+                    record = orders.get((exchange, entry['id']))
+                    if record is None:
+                        continue
+                    record.status = event
+                    record.executed_qty = entry['q']
+                    record.updated_at = entry['t']
+                    if event in TERMINAL_STATUSES:
+                        del orders[record.key]
+        logging.info(f"Replayed {lines} journal records in {(time.perf_counter() - started) * 1000:.1f} ms: "
+                     f"{len(orders)} open orders, {len(intents)} unacknowledged")
+        return orders, list(intents.values())
+
+    def recover(self) -> Tuple[Dict[OrderKey, OrderRecord], List[Dict[str, Any]]]:
+        """replay() and compact the journal, once per journal: later calls return nothing to recover."""
+        if self._recovered:
+            return {}, []
+        self._recovered = True
+        open_orders, intents = self.replay()
+        self.compact(list(open_orders.values()), intents)
+        return open_orders, intents
+
+    def compact(self, open_orders: List[OrderRecord], intents: List[Dict[str, Any]]) -> None:
+        """Rewrite the journal so it holds only the given open orders and intents."""
+        self._file.close()
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as journal:
+            for record in open_orders:
+                journal.write(json.dumps({
+                    'ev': 'acked', 'x': record.exchange, 'id': record.order_id, 'c': None, 'p': record.pair,
+                    'a': record.amount, 'pr': record.price, 's': record.order_type, 'st': record.status,
+                    'q': record.executed_qty, 't': record.updated_at,
+                }, separators=(',', ':')) + '\n')
+            for intent in intents:
+                journal.write(json.dumps(intent, separators=(',', ':')) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        """Flush and fsync outstanding records and close the journal; a later append reopens it."""
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+_journals: Dict[str, OrderJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_order_journal(path: str = JOURNAL_PATH) -> OrderJournal:
+    """Return the process-wide journal for a path, shared by every OrderManager."""
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = OrderJournal(path)
+        return journal
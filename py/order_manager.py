@@ -1,10 +1,19 @@
+import aiohttp
 import asyncio
 import logging
-import requests
-import websockets
-import json
-from typing import Dict, Any
-from config import EXCHANGE_API_KEYS, EXCHANGE_URLS, TIMING_SETTINGS
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from config import EXCHANGE_API_KEYS, EXCHANGE_URLS, TRADING_PAIRS, TIMING_SETTINGS, ORDER_SETTINGS
+from rate_limiter import get_rate_limiter
+from json_codec import loads, DecodeError
+from market_data import Tick, websocket_url
+from market_data_hub import get_market_data_hub
+from exchange_filters import check_order_async
+from latency_tracker import get_latency_tracker
+from order_journal import get_order_journal
+from order_store import OrderRecord, OrderKey
+from order_tracker import OrderTracker, UserDataStream
 
 # Setup logging
 logging.basicConfig(
@@ -13,40 +22,111 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Per-call timeout for order requests and size of the connection pool kept per exchange
+REQUEST_TIMEOUT = TIMING_SETTINGS.get('request_timeout', 10)
+CONNECTIONS_PER_EXCHANGE = TIMING_SETTINGS.get('connections_per_exchange', 20)
+
+# Exchanges offering DELETE /api/v3/openOrders, and how many single cancels may be in flight per exchange
+BATCH_CANCEL_EXCHANGES = set(ORDER_SETTINGS.get('batch_cancel_exchanges', ['binance']))
+CANCEL_CONCURRENCY = ORDER_SETTINGS.get('cancel_concurrency', 10)
+
+CancelCallback = Callable[[str, str, bool], None]
+
 class OrderManager:
     """Manages orders across multiple exchanges."""
 
     def __init__(self):
-        self.orders = {}
         self.exchanges = {name: ExchangeAPI(name) for name in EXCHANGE_URLS.keys()}
+        self.journal = get_order_journal()  # Shared, so only the first manager replays and compacts it
+        self.tracker = OrderTracker(journal=self.journal)
+        self.orders = self.tracker.store  # Open orders indexed by exchange, pair and status
+        self._monitor_task = None
+        self._cancel_semaphores: Dict[str, asyncio.Semaphore] = {}  # Bound single cancels across concurrent calls
+        self._unacknowledged = self._recover()
+
+    def _recover(self) -> List[Dict[str, Any]]:
+        """Rebuild open orders from the journal; they are reconciled with the exchanges once monitoring starts."""
+        open_orders, intents = self.journal.recover()
+        for record in open_orders.values():
+            if record.exchange in self.exchanges:
+                self.tracker.track(record)  # Polled immediately, which reconciles it with the exchange
+        return intents
 
-    async def place_order(self, exchange_name: str, pair: str, amount: float, price: float, order_type: str) -> Dict[str, Any]:
+    async def _reconcile_unacknowledged(self) -> None:
+        """Look up orders whose placement was journaled but never acknowledged before a restart."""
+        intents, self._unacknowledged = self._unacknowledged, []
+        for intent in intents:
+            exchange = self.exchanges.get(intent['x'])
+            if exchange is None:
+                continue
+            response = await exchange.get_order_by_client_id(intent['c'])
+            if not response.get('orderId'):
+                logging.warning(f"Journaled order {intent['c']} on {intent['x']} is unknown to the exchange; dropping it")
+                self.journal.abandoned(intent['x'], intent['c'])
+                continue
+            record = OrderRecord(intent['x'], response['orderId'], intent['p'], intent['a'], intent['pr'], intent['s'])
+            self.tracker.track(record)
+            self.journal.acked(record, intent['c'])
+            self.tracker.update(intent['x'], record.order_id, response.get('status', ''), response.get('executedQty'))
+
+    async def place_order(self, exchange_name: str, pair: str, amount: float, price: float, order_type: str,
+                          timeout: Optional[float] = None) -> Dict[str, Any]:
         """Place an order on a specified exchange."""
         exchange = self.exchanges[exchange_name]
         logging.info(f"Placing {order_type} order on {exchange_name} for {pair} at {price} with amount {amount}")
-        
+
+        # Round to the exchange's tick/lot sizes and reject locally what the exchange would reject remotely
+        check = await check_order_async(exchange_name, pair, order_type, price, amount)
+        if not check.ok:
+            logging.error(f"Rejected {order_type} order on {exchange_name} for {pair} before sending: {check.reason}")
+            return {}
+        price, amount = float(check.price), float(check.quantity)
+
+        # The intent is durable before the order is sent, so a crash cannot leave an unknown order behind.
+        # Every attempt reuses the client order id, so the exchange accepts the order at most once.
+        client_order_id = uuid.uuid4().hex
+        self.journal.placed(exchange_name, client_order_id, pair, amount, price, order_type)
+        await self.journal.commit()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
         retry_count = 0
         max_retries = 5
         while retry_count < max_retries:
             try:
-                order_response = await exchange.place_order(pair, amount, price, order_type)
-                order_id = order_response.get('orderId')
-                if order_id:
-                    self.orders[order_id] = {
-                        'exchange': exchange_name,
-                        'pair': pair,
-                        'amount': amount,
-                        'price': price,
-                        'order_type': order_type,
-                        'status': 'pending'
-                    }
-                return order_response
+                started = time.monotonic()
+                order_response = await exchange.place_order(pair, check.quantity, check.price, order_type,
+                                                            timeout=timeout, client_order_id=client_order_id)
+                if order_response.get('orderId'):
+                    get_latency_tracker(exchange_name, 'orders').record(time.monotonic() - started)
+                else:
+                    # A timeout or error does not mean the order was not placed: ask the exchange
+                    order_response = await exchange.get_order_by_client_id(client_order_id, timeout=timeout)
+                if order_response.get('orderId'):
+                    self._track_placed(exchange_name, pair, amount, price, order_type, client_order_id, order_response)
+                    return order_response
             except Exception as e:
                 logging.error(f"Error placing {order_type} order on {exchange_name} for pair {pair}: {e}")
-                retry_count += 1
-                await asyncio.sleep(2 ** retry_count)  # Exponential backoff
+            retry_count += 1
+            backoff = 2 ** retry_count  # Exponential backoff
+            if retry_count >= max_retries or (deadline is not None and time.monotonic() + backoff > deadline):
+                break
+            await asyncio.sleep(backoff)
+
+        logging.error(f"{order_type} order {client_order_id} on {exchange_name} for {pair} was not placed")
+        self.journal.abandoned(exchange_name, client_order_id)
         return {}
 
+    def _track_placed(self, exchange_name: str, pair: str, amount: float, price: float, order_type: str,
+                      client_order_id: str, order_response: Dict[str, Any]) -> None:
+        """Track an order the exchange acknowledged and journal the acknowledgement."""
+        order_id = order_response['orderId']
+        record = OrderRecord(exchange_name, order_id, pair, amount, price, order_type)
+        self.tracker.track(record)
+        self.journal.acked(record, client_order_id)
+        if order_response.get('status'):
+            self.tracker.update(exchange_name, order_id, order_response['status'], order_response.get('executedQty'))
+        self.start_monitoring()
+
     async def cancel_order(self, exchange_name: str, order_id: str) -> bool:
         """Cancel a specific order on an exchange."""
         exchange = self.exchanges[exchange_name]
@@ -58,8 +138,7 @@ class OrderManager:
             try:
                 cancel_response = await exchange.cancel_order(order_id)
                 if cancel_response.get('status') == 'CANCELED':
-                    if order_id in self.orders:
-                        self.orders[order_id]['status'] = 'canceled'
+                    self.tracker.update(exchange_name, order_id, 'CANCELED', cancel_response.get('executedQty'))
                     return True
                 return False
             except Exception as e:
@@ -68,125 +147,233 @@ class OrderManager:
                 await asyncio.sleep(2 ** retry_count)  # Exponential backoff
         return False
 
+    async def cancel_many(self, orders: Iterable[Tuple[str, str]],
+                          on_result: Optional[CancelCallback] = None) -> Dict[OrderKey, bool]:
+        """Cancel (exchange, order id) pairs concurrently within each exchange's rate budget.
+
+        on_result(exchange, order_id, cancelled) is called as each cancel completes.
+        """
+        results = {}
+
+        async def cancel(exchange_name: str, order_id: str) -> None:
+            semaphore = self._cancel_semaphores.setdefault(exchange_name, asyncio.Semaphore(CANCEL_CONCURRENCY))
+            async with semaphore:
+                response = await self.exchanges[exchange_name].cancel_order(order_id)
+            self._record_cancel(exchange_name, order_id, response, results, on_result)
+
+        await asyncio.gather(*(cancel(exchange_name, str(order_id)) for exchange_name, order_id in orders))
+        return results
+
+    async def cancel_all(self, exchange: Optional[str] = None, pair: Optional[str] = None,
+                         on_result: Optional[CancelCallback] = None) -> Dict[OrderKey, bool]:
+        """Cancel every open order, optionally only on one exchange and/or pair.
+
+        Exchanges with a batch endpoint cancel each pair in one request when every open order the exchange
+        reports for it is tracked here; the rest fall back to cancel_many.
+        """
+        results = {}
+        batches: Dict[Tuple[str, str], List[OrderKey]] = {}
+        singles = []
+        for record in self.orders.open_orders(exchange, pair):
+            if record.exchange in BATCH_CANCEL_EXCHANGES:
+                batches.setdefault((record.exchange, record.pair), []).append(record.key)
+            else:
+                singles.append(record.key)
+        logging.warning(f"Cancelling {len(singles) + sum(map(len, batches.values()))} open orders "
+                        f"(exchange={exchange}, pair={pair})")
+
+        async def cancel_batch(exchange_name: str, batch_pair: str, keys: List[OrderKey]) -> None:
+            exchange = self.exchanges[exchange_name]
+            # The batch endpoint cancels every open order of the symbol, including ones this manager does not
+            # track, so it is only used when the exchange reports none of those
+            reported = await exchange.get_open_orders(batch_pair) if len(keys) > 1 else None
+            tracked = set(keys)
+            if isinstance(reported, list) and all((exchange_name, str(order.get('orderId'))) in tracked for order in reported):
+                response = await exchange.cancel_open_orders(batch_pair)
+                if isinstance(response, list):
+                    for order in response:
+                        self._record_cancel(exchange_name, str(order.get('orderId')), order, results, on_result)
+            elif isinstance(reported, list):
+                logging.warning(f"{exchange_name} has untracked open orders for {batch_pair}; cancelling ours one by one")
+            # Orders the batch did not report (or all of them if the batch failed) are cancelled one by one
+            leftovers = [key for key in keys if key not in results]
+            if leftovers:
+                results.update(await self.cancel_many(leftovers, on_result))
+
+        async def cancel_singles() -> None:
+            results.update(await self.cancel_many(singles, on_result))
+
+        await asyncio.gather(cancel_singles(), *(cancel_batch(e, p, keys) for (e, p), keys in batches.items()))
+        return results
+
+    def _record_cancel(self, exchange_name: str, order_id: str, response: Dict[str, Any],
+                       results: Dict[OrderKey, bool], on_result: Optional[CancelCallback]) -> None:
+        """Apply a cancel response to the tracker and report it."""
+        status = response.get('status')
+        if status:
+            self.tracker.update(exchange_name, order_id, status, response.get('executedQty'))
+        cancelled = status == 'CANCELED'
+        if not cancelled:
+            logging.error(f"Could not cancel order {order_id} on {exchange_name}: {status or 'no response'}")
+        results[(exchange_name, order_id)] = cancelled
+        if on_result is not None:
+            try:
+                on_result(exchange_name, order_id, cancelled)
+            except Exception as e:
+                logging.error(f"Cancel result callback failed for order {order_id} on {exchange_name}: {e}")
+
     async def monitor_orders(self) -> None:
-        """Monitor the status of all active orders."""
-        while True:
-            tasks = [self._check_order_status(order_id, order_info) for order_id, order_info in self.orders.items()]
-            await asyncio.gather(*tasks)
-            await asyncio.sleep(10)  # Monitor every 10 seconds
-
-    async def _check_order_status(self, order_id: str, order_info: Dict[str, Any]) -> None:
-        """Check the status of a single order."""
-        exchange_name = order_info['exchange']
-        exchange = self.exchanges[exchange_name]
-        try:
-            order_status = await exchange.get_order_status(order_id)
-            if order_status:
-                status = order_status.get('status')
-                if status == 'FILLED':
-                    self.orders[order_id]['status'] = 'filled'
-                elif status == 'CANCELED':
-                    self.orders[order_id]['status'] = 'canceled'
-        except Exception as e:
-            logging.error(f"Error checking status of order {order_id} on {exchange_name}: {e}")
+        """Track order state from user-data streams, polling only the orders that are still open."""
+        await self._reconcile_unacknowledged()
+        streams = [UserDataStream(exchange, self.tracker) for exchange in self.exchanges.values()]
+        for exchange in self.exchanges.values():
+            await exchange.start()
+        await asyncio.gather(
+            self.tracker.poll_open_orders(self._fetch_order_status),
+            *(stream.run() for stream in streams)
+        )
+
+    def start_monitoring(self) -> None:
+        """Run monitor_orders in the background if it is not already running."""
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self.monitor_orders())
+
+    async def wait_for_fill(self, exchange_name: str, order_id: str, timeout: Optional[float] = None) -> bool:
+        """Wait for an order to reach a final state; True if it filled within the timeout."""
+        self.start_monitoring()
+        return await self.tracker.wait_for_fill(exchange_name, order_id, timeout)
+
+    async def _fetch_order_status(self, exchange_name: str, order_id: str) -> Dict[str, Any]:
+        """Fetch the status of a single order over REST."""
+        return await self.exchanges[exchange_name].get_order_status(order_id)
 
     async def handle_real_time_updates(self) -> None:
-        """Listen to WebSocket updates from exchanges."""
-        ws_tasks = [self._listen_to_websocket(exchange_name) for exchange_name in self.exchanges]
-        await asyncio.gather(*ws_tasks)
+        """Receive market updates for every exchange through the shared market-data hub."""
+        hub = get_market_data_hub()
+        pairs = [pair['pair'] for pair in TRADING_PAIRS]
+        for exchange_name in self.exchanges:
+            await hub.subscribe(exchange_name, pairs, self._process_tick)
 
-    async def _listen_to_websocket(self, exchange_name: str) -> None:
-        """Listen to WebSocket updates for a specific exchange."""
-        exchange = self.exchanges[exchange_name]
-        websocket_url = exchange.get_websocket_url()
-        
-        async with websockets.connect(websocket_url) as websocket:
-            while True:
-                try:
-                    message = await websocket.recv()
-                    self._process_websocket_message(exchange_name, message)
-                except Exception as e:
-                    logging.error(f"WebSocket error for {exchange_name}: {e}")
-                    await asyncio.sleep(5)  # Wait before reconnecting
-
-    def _process_websocket_message(self, exchange_name: str, message: str) -> None:
-        """Process a WebSocket message from an exchange."""
-        try:
-            data = json.loads(message)
-            # Example: Update order status or handle other real-time updates
-            logging.info(f"Received WebSocket message from {exchange_name}: {data}")
-        except json.JSONDecodeError as e:
-            logging.error(f"Error decoding WebSocket message from {exchange_name}: {e}")
+    def _process_tick(self, tick: Tick) -> None:
+        """Process a market update from an exchange."""
+        logging.debug(f"Received {tick.pair} update from {tick.exchange_name}: {tick.price}")
+
+    async def close(self) -> None:
+        """Stop order monitoring, archive final orders and close the connection pools of every exchange."""
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+        self.orders.close()
+        self.journal.close()
+        await asyncio.gather(*(exchange.close() for exchange in self.exchanges.values()))
 
 class ExchangeAPI:
-    """Handles interactions with a single exchange."""
+    """Handles interactions with a single exchange over a pooled, non-blocking aiohttp session."""
     
-    def __init__(self, exchange_name: str):
+    def __init__(self, exchange_name: str, timeout: float = REQUEST_TIMEOUT):
         self.exchange_name = exchange_name
         self.api_key = EXCHANGE_API_KEYS[exchange_name]['api_key']
         self.api_secret = EXCHANGE_API_KEYS[exchange_name]['api_secret']
         self.base_url = EXCHANGE_URLS[exchange_name]
-        self.session = requests.Session()
+        self.timeout = timeout
+        self.session = None
+        self.rate_limiter = get_rate_limiter(exchange_name)
 
-    async def place_order(self, pair: str, amount: float, price: float, order_type: str) -> Dict[str, Any]:
+    async def start(self) -> None:
+        """Create the pooled session on first use (it must be created inside the running loop)."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=CONNECTIONS_PER_EXCHANGE, keepalive_timeout=30),
+                headers={'X-MBX-APIKEY': self.api_key},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def _request(self, method: str, endpoint: str, params: Dict[str, Any], action: str,
+                       timeout: Optional[float] = None) -> Any:
+        """Send a request without blocking the event loop; returns the decoded body, or {} on failure."""
+        await self.start()
+        url = f"{self.base_url}{endpoint}"
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout is not None else None
+        try:
+            await self.rate_limiter.acquire(endpoint)
+            async with self.session.request(method, url, params=params, timeout=request_timeout) as response:
+                self.rate_limiter.update_from_headers(response.headers, response.status)
+                response.raise_for_status()
+                return await response.json(loads=loads)
+        except asyncio.TimeoutError:
+            logging.error(f"Timed out {action} on {self.exchange_name}")
+            return {}
+        except (aiohttp.ClientError, *DecodeError) as e:
+            logging.error(f"Error {action} on {self.exchange_name}: {e}")
+            return {}
+
+    async def place_order(self, pair: str, amount: float, price: float, order_type: str,
+                          timeout: Optional[float] = None, client_order_id: Optional[str] = None) -> Dict[str, Any]:
         """Place an order on the exchange."""
-        url = f"{self.base_url}/api/v3/order"
-        headers = {'X-MBX-APIKEY': self.api_key}
         params = {
             'symbol': pair.replace('/', ''),
             'side': order_type,
             'type': 'LIMIT',
-            'price': price,
-            'quantity': amount,
+            'price': str(price),
+            'quantity': str(amount),
             'timeInForce': 'GTC'
         }
-        
-        try:
-            response = self.session.post(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logging.error(f"Error placing {order_type} order on {self.exchange_name} for pair {pair}: {e}")
-            return {}
+        if client_order_id:
+            params['newClientOrderId'] = client_order_id
+        return await self._request('POST', '/api/v3/order', params, f"placing {order_type} order for pair {pair}", timeout)
 
-    async def cancel_order(self, order_id: str) -> Dict[str, Any]:
+    async def cancel_order(self, order_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """Cancel an existing order."""
-        url = f"{self.base_url}/api/v3/order"
-        headers = {'X-MBX-APIKEY': self.api_key}
-        params = {'orderId': order_id}
-        
-        try:
-            response = self.session.delete(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logging.error(f"Error cancelling order {order_id} on {self.exchange_name}: {e}")
-            return {}
+        params = {'orderId': str(order_id)}
+        return await self._request('DELETE', '/api/v3/order', params, f"cancelling order {order_id}", timeout)
+
+    async def get_open_orders(self, pair: str, timeout: Optional[float] = None) -> Any:
+        """List the open orders of a pair; returns a list, or {} on failure."""
+        params = {'symbol': pair.replace('/', '')}
+        return await self._request('GET', '/api/v3/openOrders', params, f"listing open orders for pair {pair}", timeout)
+
+    async def cancel_open_orders(self, pair: str, timeout: Optional[float] = None) -> Any:
+        """Cancel every open order for a pair in one request; returns the list of cancelled orders."""
+        params = {'symbol': pair.replace('/', '')}
+        return await self._request('DELETE', '/api/v3/openOrders', params, f"cancelling open orders for pair {pair}", timeout)
 
-    async def get_order_status(self, order_id: str) -> Dict[str, Any]:
+    async def get_order_status(self, order_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """Get the status of an existing order."""
-        url = f"{self.base_url}/api/v3/order"
-        headers = {'X-MBX-APIKEY': self.api_key}
-        params = {'orderId': order_id}
-        
-        try:
-            response = self.session.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logging.error(f"Error getting status of order {order_id} on {self.exchange_name}: {e}")
-            return {}
+        params = {'orderId': str(order_id)}
+        return await self._request('GET', '/api/v3/order', params, f"getting status of order {order_id}", timeout)
+
+    async def get_order_by_client_id(self, client_order_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Get an order by the client order id it was placed with."""
+        params = {'origClientOrderId': client_order_id}
+        return await self._request('GET', '/api/v3/order', params, f"getting order {client_order_id}", timeout)
+
+    async def start_user_data_stream(self) -> Optional[str]:
+        """Open a user-data stream and return its listen key, or None if the exchange offers none."""
+        response = await self._request('POST', '/api/v3/userDataStream', {}, "opening user-data stream")
+        return response.get('listenKey')
+
+    async def keepalive_user_data_stream(self, listen_key: str) -> None:
+        """Extend the validity of a user-data stream listen key."""
+        await self._request('PUT', '/api/v3/userDataStream', {'listenKey': listen_key}, "keeping user-data stream alive")
+
+    async def close(self) -> None:
+        """Close the pooled session."""
+        if self.session:
+            await self.session.close()
 
     def get_websocket_url(self) -> str:
         """Return the WebSocket URL for the exchange."""
-        return f"wss://{self.exchange
-def get_websocket_url(self) -> str:
-        """Return the WebSocket URL for the exchange."""
-        return f"wss://{self.exchange_name}.websocket.url"  # Replace with actual WebSocket URL
+        return websocket_url(self.exchange_name)
 
-if __name__ == "__main__":
+async def main():
     order_manager = OrderManager()
-    asyncio.run(asyncio.gather(
+    await asyncio.gather(
         order_manager.monitor_orders(),
         order_manager.handle_real_time_updates()
-    ))
\ No newline at end of file
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,198 @@
+import logging
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from config import ORDER_SETTINGS
+
+# Setup logging
+logging.basicConfig(
+    filename='order_store.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Final orders leave memory and are written to this SQLite file in batches
+ARCHIVE_PATH = ORDER_SETTINGS.get('archive_path', 'order_archive.db')
+ARCHIVE_BATCH_SIZE = ORDER_SETTINGS.get('archive_batch_size', 50)
+
+TERMINAL_STATUSES = {'filled', 'canceled', 'rejected', 'expired'}
+
+OrderKey = Tuple[str, str]
+
+
+class OrderRecord:
+    """Compact state of one order."""
+
+    __slots__ = ('exchange', 'order_id', 'pair', 'amount', 'price', 'order_type',
+                 'status', 'executed_qty', 'created_at', 'updated_at')
+
+    def __init__(self, exchange: str, order_id, pair: str, amount: float, price: float, order_type: str,
+                 status: str = 'pending', executed_qty: float = 0.0,
+                 created_at: Optional[float] = None, updated_at: Optional[float] = None):
+        self.exchange = exchange
+        self.order_id = str(order_id)
+        self.pair = pair
+        self.amount = amount
+        self.price = price
+        self.order_type = order_type
+        self.status = status
+        self.executed_qty = executed_qty
+        self.created_at = created_at if created_at is not None else time.time()
+        self.updated_at = updated_at if updated_at is not None else self.created_at
+
+    @property
+    def key(self) -> OrderKey:
+        return self.exchange, self.order_id
+
+    @property
+    def is_open(self) -> bool:
+        return self.status not in TERMINAL_STATUSES
+
+    def as_row(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (f"OrderRecord({self.exchange}, {self.order_id}, {self.pair}, {self.order_type} "
+                f"{self.amount}@{self.price}, {self.status}, executed={self.executed_qty})")
+
+
+class OrderStore:
+    """Live orders indexed by exchange, pair and status; final orders are archived to SQLite."""
+
+    def __init__(self, archive_path: Optional[str] = ARCHIVE_PATH, batch_size: int = ARCHIVE_BATCH_SIZE):
+        self._orders: Dict[OrderKey, OrderRecord] = {}
+        self._by_exchange: Dict[str, Set[OrderKey]] = {}
+        self._by_pair: Dict[str, Set[OrderKey]] = {}
+        self._by_status: Dict[str, Set[OrderKey]] = {}
+        self._open: Set[OrderKey] = set()
+        self._pending_archive: Dict[OrderKey, OrderRecord] = {}
+        self.batch_size = batch_size
+        self.archived = 0
+        self._db = None
+        if archive_path:
+            self._db = sqlite3.connect(archive_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS orders (exchange TEXT, order_id TEXT, pair TEXT, amount REAL, price REAL, "
+                "order_type TEXT, status TEXT, executed_qty REAL, created_at REAL, updated_at REAL, "
+                "PRIMARY KEY (exchange, order_id))"
+            )
+            self._db.commit()
+
+    def add(self, record: OrderRecord) -> OrderRecord:
+        """Insert a new order; an order that is already final goes straight to the archive."""
+        key = record.key
+        if key in self._orders:
+            self._unindex(self._orders[key])
+        self._orders[key] = record
+        self._index(record)
+        if not record.is_open:
+            self._archive(record)
+        return record
+
+    def get(self, exchange: str, order_id, include_archived: bool = True) -> Optional[OrderRecord]:
+        """Look an order up in memory, falling back to the archive for final orders."""
+        key = (exchange, str(order_id))
+        record = self._orders.get(key)
+        if record is not None or not include_archived:
+            return record
+        record = self._pending_archive.get(key)
+        if record is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT * FROM orders WHERE exchange = ? AND order_id = ?", key
+            ).fetchone()
+            if row is not None:
+                record = OrderRecord(*row)
+        return record
+
+    def update(self, record: OrderRecord, status: str, executed_qty: Optional[float] = None) -> None:
+        """Change an order's status, keeping the indexes in step and archiving it once final."""
+        if record.status != status:
+            self._by_status[record.status].discard(record.key)
+            record.status = status
+            self._by_status.setdefault(status, set()).add(record.key)
+        if executed_qty is not None:
+            record.executed_qty = executed_qty
+        record.updated_at = time.time()
+        if not record.is_open:
+            self._open.discard(record.key)
+            self._archive(record)
+
+    def open_orders(self, exchange: Optional[str] = None, pair: Optional[str] = None) -> Iterator[OrderRecord]:
+        """Iterate over open orders, optionally restricted to an exchange and/or pair."""
+        keys = self._open
+        if exchange is not None:
+            keys = keys & self._by_exchange.get(exchange, set())
+        if pair is not None:
+            keys = keys & self._by_pair.get(pair, set())
+        return (self._orders[key] for key in list(keys))
+
+    def with_status(self, status: str) -> List[OrderRecord]:
+        """Orders in memory with the given status."""
+        return [self._orders[key] for key in self._by_status.get(status, ())]
+
+    def for_exchange(self, exchange: str) -> List[OrderRecord]:
+        """Orders in memory placed on an exchange."""
+        return [self._orders[key] for key in self._by_exchange.get(exchange, ())]
+
+    def for_pair(self, pair: str) -> List[OrderRecord]:
+        """Orders in memory for a trading pair."""
+        return [self._orders[key] for key in self._by_pair.get(pair, ())]
+
+    def flush(self) -> None:
+        """Write archived orders still waiting for a batch to disk."""
+        if not self._pending_archive:
+            return
+        if self._db is not None:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [record.as_row() for record in self._pending_archive.values()]
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Error archiving {len(self._pending_archive)} orders: {e}")
+                return
+        self.archived += len(self._pending_archive)
+        self._pending_archive.clear()
+
+    def close(self) -> None:
+        """Flush pending archive writes and close the archive."""
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _archive(self, record: OrderRecord) -> None:
+        self._unindex(record)
+        del self._orders[record.key]
+        self._pending_archive[record.key] = record
+        if len(self._pending_archive) >= self.batch_size:
+            self.flush()
+
+    def _index(self, record: OrderRecord) -> None:
+        key = record.key
+        self._by_exchange.setdefault(record.exchange, set()).add(key)
+        self._by_pair.setdefault(record.pair, set()).add(key)
+        self._by_status.setdefault(record.status, set()).add(key)
+        if record.is_open:
+            self._open.add(key)
+
+    def _unindex(self, record: OrderRecord) -> None:
+        key = record.key
+        for index, value in ((self._by_exchange, record.exchange), (self._by_pair, record.pair),
+                             (self._by_status, record.status)):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+        self._open.discard(key)
+
+    def __contains__(self, key: OrderKey) -> bool:
+        return key in self._orders
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __iter__(self) -> Iterator[OrderRecord]:
+        return iter(list(self._orders.values()))
@@ -0,0 +1,240 @@
+import aiohttp
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config import TIMING_SETTINGS, MARKET_DATA_SETTINGS
+from json_codec import loads, DecodeError
+from market_data import websocket_url
+from order_store import OrderStore, OrderRecord, OrderKey, TERMINAL_STATUSES
+
+# Setup logging
+logging.basicConfig(
+    filename='order_tracker.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Open orders are polled quickly at first and back off while nothing changes; with a live
+# user-data stream polling is only a slow safety net
+MIN_POLL_INTERVAL = TIMING_SETTINGS.get('order_poll_min_interval', 0.5)
+MAX_POLL_INTERVAL = TIMING_SETTINGS.get('order_poll_max_interval', 10)
+STREAM_POLL_INTERVAL = TIMING_SETTINGS.get('order_poll_stream_interval', 60)
+LISTEN_KEY_KEEPALIVE = 30 * 60  # Listen keys expire after 60 minutes without a keepalive
+RECONNECT_DELAY = MARKET_DATA_SETTINGS.get('reconnect_delay', 1)
+MAX_RECONNECT_DELAY = MARKET_DATA_SETTINGS.get('max_reconnect_delay', 60)
+HEARTBEAT_INTERVAL = MARKET_DATA_SETTINGS.get('heartbeat_interval', 30)
+MAX_EARLY_UPDATES = 1000
+
+STATUS_MAP = {
+    'NEW': 'pending',
+    'PENDING_CANCEL': 'pending',
+    'PARTIALLY_FILLED': 'partially_filled',
+    'FILLED': 'filled',
+    'CANCELED': 'canceled',
+    'REJECTED': 'rejected',
+    'EXPIRED': 'expired',
+}
+
+StatusFetcher = Callable[[str, str], Awaitable[Dict[str, Any]]]
+
+
+def normalize_status(status: str) -> str:
+    """Map an exchange order status (e.g. 'PARTIALLY_FILLED') to the lower-case status used internally."""
+    return STATUS_MAP.get(status.upper(), status.lower())
+
+
+class OrderTracker:
+    """Order state kept current by user-data streams, with adaptive REST polling of open orders only."""
+
+    def __init__(self, store: Optional[OrderStore] = None, journal=None):
+        self.store = store if store is not None else OrderStore()
+        self.journal = journal  # Optional OrderJournal receiving every status change
+        self.streaming = set()  # Exchanges with a live user-data stream
+        self._polls: Dict[OrderKey, list] = {}  # Open order -> [interval, next poll time]
+        self._futures: Dict[OrderKey, asyncio.Future] = {}
+        self._early_updates: Dict[OrderKey, tuple] = {}  # Stream events that beat the order response
+        self._wakeup = asyncio.Event()
+
+    def track(self, record: OrderRecord) -> None:
+        """Start tracking a newly placed order."""
+        key = record.key
+        self.store.add(record)
+        if record.is_open:
+            self._polls[key] = [self._base_interval(record.exchange), 0.0]
+            self._reschedule(key)
+        early = self._early_updates.pop(key, None)
+        if early is not None:
+            self.update(record.exchange, record.order_id, *early)
+        self._wakeup.set()
+
+    def update(self, exchange_name: str, order_id, status: str, executed_qty=None) -> bool:
+        """Apply a status report from a stream, a poll or a cancel response; returns True if anything changed."""
+        key = (exchange_name, str(order_id))
+        record = self.store.get(exchange_name, order_id, include_archived=False)
+        if record is None:
+            if self.store.get(exchange_name, order_id) is not None:
+                return False  # Late or duplicate report for an order that is already final and archived
+            if len(self._early_updates) >= MAX_EARLY_UPDATES:
+                self._early_updates.pop(next(iter(self._early_updates)))
+            self._early_updates[key] = (status, executed_qty)
+            return False
+
+        status = normalize_status(status)
+        executed_qty = record.executed_qty if executed_qty is None else float(executed_qty)
+        if status == record.status and executed_qty == record.executed_qty:
+            return False
+        self.store.update(record, status, executed_qty)
+        if self.journal is not None:
+            self.journal.status(record)
+        logging.info(f"Order {order_id} on {exchange_name} is now {status} ({executed_qty} executed)")
+
+        if status in TERMINAL_STATUSES:
+            self._polls.pop(key, None)
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(record)
+        return True
+
+    def is_open(self, exchange_name: str, order_id) -> bool:
+        """Whether the order is tracked and not yet in a final state."""
+        return (exchange_name, str(order_id)) in self._polls
+
+    def order_future(self, exchange_name: str, order_id) -> asyncio.Future:
+        """Future resolved with the order record as soon as the order reaches a final state."""
+        key = (exchange_name, str(order_id))
+        if key not in self.store:
+            record = self.store.get(exchange_name, order_id)
+            if record is not None and not record.is_open:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(record)
+                return future
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+        return future
+
+    async def wait_for_fill(self, exchange_name: str, order_id, timeout: Optional[float] = None) -> bool:
+        """Wait until the order is final; True only if it filled within the timeout."""
+        try:
+            record = await asyncio.wait_for(asyncio.shield(self.order_future(exchange_name, order_id)), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return record.status == 'filled'
+
+    def set_streaming(self, exchange_name: str, streaming: bool) -> None:
+        """Record whether an exchange's user-data stream is live and resynchronise its open orders."""
+        if streaming:
+            self.streaming.add(exchange_name)
+        else:
+            self.streaming.discard(exchange_name)
+        # Reports may have been missed while the stream was down, so poll that exchange's open orders now
+        for record in self.store.open_orders(exchange_name):
+            poll = self._polls.get(record.key)
+            if poll is not None:
+                poll[0] = self._base_interval(exchange_name)
+                poll[1] = 0.0
+        self._wakeup.set()
+
+    async def poll_open_orders(self, fetch_status: StatusFetcher) -> None:
+        """Poll open orders as they come due; filled and cancelled orders are never polled again."""
+        while True:
+            now = time.monotonic()
+            due = [key for key, poll in self._polls.items() if poll[1] <= now]
+            if due:
+                await asyncio.gather(*(self._poll(key, fetch_status) for key in due))
+            next_due = min((poll[1] for poll in self._polls.values()), default=None)
+            self._wakeup.clear()
+            timeout = MAX_POLL_INTERVAL if next_due is None else max(0.0, next_due - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, key: OrderKey, fetch_status: StatusFetcher) -> None:
+        exchange_name, order_id = key
+        try:
+            response = await fetch_status(exchange_name, order_id)
+        except Exception as e:
+            logging.error(f"Error checking status of order {order_id} on {exchange_name}: {e}")
+            response = None
+        changed = bool(response) and self.update(exchange_name, order_id, response.get('status', ''), response.get('executedQty'))
+        poll = self._polls.get(key)
+        if poll is None:
+            return
+        # Poll again soon after a change, otherwise back off towards the cap
+        cap = STREAM_POLL_INTERVAL if exchange_name in self.streaming else MAX_POLL_INTERVAL
+        poll[0] = self._base_interval(exchange_name) if changed else min(poll[0] * 2, cap)
+        self._reschedule(key)
+
+    def _reschedule(self, key: OrderKey) -> None:
+        poll = self._polls[key]
+        poll[1] = time.monotonic() + poll[0]
+
+    def _base_interval(self, exchange_name: str) -> float:
+        return STREAM_POLL_INTERVAL if exchange_name in self.streaming else MIN_POLL_INTERVAL
+
+
+class UserDataStream:
+    """Execution-report stream of one exchange feeding an OrderTracker."""
+
+    def __init__(self, exchange_api, tracker: OrderTracker):
+        self.exchange_api = exchange_api
+        self.exchange_name = exchange_api.exchange_name
+        self.tracker = tracker
+        self.events_received = 0
+
+    async def run(self) -> None:
+        """Keep the stream open forever; while it is down the tracker falls back to fast polling."""
+        attempt = 0
+        while True:
+            listen_key = await self.exchange_api.start_user_data_stream()
+            if listen_key:
+                try:
+                    async with self.exchange_api.session.ws_connect(self.url(listen_key), heartbeat=HEARTBEAT_INTERVAL) as ws:
+                        attempt = 0
+                        self.tracker.set_streaming(self.exchange_name, True)
+                        logging.info(f"Connected user-data stream for {self.exchange_name}")
+                        keepalive = asyncio.create_task(self._keepalive(listen_key))
+                        try:
+                            async for msg in ws:
+                                if msg.type == aiohttp.WSMsgType.TEXT:
+                                    self._dispatch(msg.data)
+                                elif msg.type == aiohttp.WSMsgType.ERROR:
+                                    logging.error(f"User-data stream error for {self.exchange_name}: {ws.exception()}")
+                                    break
+                        finally:
+                            keepalive.cancel()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"User-data stream communication error for {self.exchange_name}: {e}")
+                finally:
+                    if self.exchange_name in self.tracker.streaming:
+                        self.tracker.set_streaming(self.exchange_name, False)
+            attempt += 1
+            await asyncio.sleep(min(RECONNECT_DELAY * 2 ** (attempt - 1), MAX_RECONNECT_DELAY))
+
+    def url(self, listen_key: str) -> str:
+        """User-data streams are served next to the market-data endpoint, one path per listen key."""
+        return f"{websocket_url(self.exchange_name).rstrip('/')}/{listen_key}"
+
+    async def _keepalive(self, listen_key: str) -> None:
+        while True:
+            await asyncio.sleep(LISTEN_KEY_KEEPALIVE)
+            await self.exchange_api.keepalive_user_data_stream(listen_key)
+
+    def _dispatch(self, message: str) -> None:
+        """Apply an executionReport event to the tracker; other account events are ignored."""
+        self.events_received += 1
+        try:
+            event = loads(message)
+        except DecodeError as e:
+            logging.error(f"Error decoding user-data message from {self.exchange_name}: {e}")
+            return
+        if isinstance(event, dict) and 'data' in event:
+            event = event['data']
+        if not isinstance(event, dict) or event.get('e') != 'executionReport':
+            return
+        self.tracker.update(self.exchange_name, event['i'], event['X'], event.get('z'))
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from config import MARKET_DATA_SETTINGS
+
+# Repeat reads of the same exchange/pair within this window are served from memory
+PRICE_FRESHNESS_MS = MARKET_DATA_SETTINGS.get('price_freshness_ms', 250)
+
+
+class SingleFlightCache:
+    """Merges identical in-flight lookups and serves recent results from memory."""
+
+    def __init__(self, freshness_ms: float = PRICE_FRESHNESS_MS):
+        self.freshness = freshness_ms / 1000
+        self.hits = 0        # Served from memory
+        self.misses = 0      # Went to the exchange
+        self.coalesced = 0   # Joined a request that was already in flight
+        self._values: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], max_age_ms: Optional[float] = None) -> Any:
+        """Return a fresh cached value, join an identical in-flight fetch, or start a new one."""
+        max_age = self.freshness if max_age_ms is None else max_age_ms / 1000
+        entry = self._values.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= max_age:
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The fetch runs detached, so a caller that is cancelled (the first one included) only stops
+            # waiting; everyone else who joined still gets the result
+            task = self._inflight[key] = asyncio.ensure_future(fetch())
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is None:  # Also marks the exception retrieved when nobody was left waiting
+            self.put(key, task.result())
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value obtained elsewhere (e.g. from a bulk snapshot); failed lookups (None) are not cached."""
+        if value is not None:
+            self._values[key] = (time.monotonic(), value)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and coalesce counters."""
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
+
+
+_price_cache: Optional[SingleFlightCache] = None
+
+
+def get_price_cache() -> SingleFlightCache:
+    """Return the price cache shared by every connector in the process."""
+    global _price_cache
+    if _price_cache is None:
+        _price_cache = SingleFlightCache()
+    return _price_cache
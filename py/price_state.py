@@ -0,0 +1,188 @@
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from market_data import max_quote_age
+from timer_wheel import TimerWheel
+
+INITIAL_EXCHANGE_CAPACITY = 8  # Columns preallocated before the first resize
+
+
+class PriceMatrix:
+    """Latest price per (pair, exchange) in preallocated pairs x exchanges arrays.
+
+    Pairs and exchanges are interned to row and column ids on first use, so an update is a couple of
+    array stores, and statistics across venues come out of one masked, vectorised pass. Quotes older
+    than their exchange's max_quote_age are never returned; expire() also drops them from the live
+    mask using a timer wheel, so only quotes that actually went quiet are looked at.
+    """
+
+    def __init__(self, pairs: Iterable[str], exchanges: Iterable[str] = ()):
+        self.pair_ids: Dict[str, int] = {}
+        self.exchange_ids: Dict[str, int] = {}
+        self.pairs: List[str] = []
+        self.exchanges: List[str] = []
+        for pair in pairs:
+            self._intern(self.pair_ids, self.pairs, pair)
+        exchanges = list(exchanges)
+        capacity = max(INITIAL_EXCHANGE_CAPACITY, len(exchanges))
+        self.price = np.full((len(self.pairs), capacity), np.nan)
+        self.updated_at = np.zeros((len(self.pairs), capacity))  # time.time() the last update was received
+        self.event_time = np.full((len(self.pairs), capacity), np.nan)  # Exchange timestamp of that update
+        self.mask = np.zeros((len(self.pairs), capacity), dtype=bool)  # Cell holds a live price
+        self.max_age = np.full(capacity, np.inf)  # Per exchange column
+        self.expired = 0
+        self._wheel = TimerWheel(clock=time.time)  # One timer per live cell
+        for exchange in exchanges:
+            self.exchange_id(exchange)
+
+    @staticmethod
+    def _intern(ids: Dict[str, int], names: List[str], name: str) -> int:
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(names)
+            names.append(name)
+        return index
+
+    def exchange_id(self, exchange: str) -> int:
+        """Column of an exchange, adding (and if needed growing the arrays for) a new one."""
+        column = self.exchange_ids.get(exchange)
+        if column is None:
+            column = self._intern(self.exchange_ids, self.exchanges, exchange)
+            if column >= self.price.shape[1]:
+                extra = self.price.shape[1]  # Double the capacity
+                self.price = np.hstack([self.price, np.full((len(self.pairs), extra), np.nan)])
+                self.updated_at = np.hstack([self.updated_at, np.zeros((len(self.pairs), extra))])
+                self.event_time = np.hstack([self.event_time, np.full((len(self.pairs), extra), np.nan)])
+                self.mask = np.hstack([self.mask, np.zeros((len(self.pairs), extra), dtype=bool)])
+                self.max_age = np.concatenate([self.max_age, np.full(extra, np.inf)])
+            self.max_age[column] = max_quote_age(exchange)
+        return column
+
+    def update(self, pair: str, exchange: str, price, timestamp: Optional[float] = None,
+               event_time: Optional[float] = None) -> Optional[float]:
+        """Store a price given as a number or numeric string; returns it as a float, or None if it was rejected.
+
+        timestamp is when the quote was received (default now); event_time is the exchange's own
+        timestamp, used to ignore updates that arrive out of order.
+        """
+        row = self.pair_ids.get(pair)
+        if row is None:
+            return None
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            return None
+        if not price > 0:
+            return None
+        column = self.exchange_id(exchange)
+        if event_time is not None and event_time < self.event_time[row, column]:
+            return None  # Older than the quote already held
+        received = time.time() if timestamp is None else timestamp
+        self.price[row, column] = price
+        self.updated_at[row, column] = received
+        self.event_time[row, column] = np.nan if event_time is None else event_time
+        if not self.mask[row, column]:
+            # Live cells keep one timer, moved forward lazily in expire() rather than on every update
+            self.mask[row, column] = True
+            self._wheel.schedule((row, column), received + self.max_age[column])
+        return price
+
+    def remove(self, pair: str, exchange: str) -> None:
+        """Mark a cell as having no live price."""
+        row, column = self.pair_ids.get(pair), self.exchange_ids.get(exchange)
+        if row is not None and column is not None:
+            self.mask[row, column] = False
+            self._wheel.cancel((row, column))
+
+    def expire(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Drop quotes that outlived their exchange's max age; returns the (pair, exchange) cells dropped."""
+        now = time.time() if now is None else now
+        dropped = []
+        for row, column in self._wheel.advance(now):
+            if not self.mask[row, column]:
+                continue
+            deadline = self.updated_at[row, column] + self.max_age[column]
+            if deadline > now:
+                self._wheel.schedule((row, column), deadline)  # Updated since the timer was set
+            else:
+                self.mask[row, column] = False
+                dropped.append((self.pairs[row], self.exchanges[column]))
+        self.expired += len(dropped)
+        return dropped
+
+    def is_fresh(self, pair: str, exchange: str, now: Optional[float] = None) -> bool:
+        """Whether a live quote exists for the cell and is young enough to act on."""
+        row, column = self.pair_ids.get(pair), self.exchange_ids.get(exchange)
+        if row is None or column is None or not self.mask[row, column]:
+            return False
+        return (time.time() if now is None else now) - self.updated_at[row, column] <= self.max_age[column]
+
+    def age(self, pair: str, exchange: str, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the cell's quote was received, or None if it has none."""
+        row, column = self.pair_ids.get(pair), self.exchange_ids.get(exchange)
+        if row is None or column is None or not self.mask[row, column]:
+            return None
+        return (time.time() if now is None else now) - float(self.updated_at[row, column])
+
+    def get(self, pair: str, exchange: str) -> Optional[float]:
+        """Latest fresh price of a pair on an exchange."""
+        if not self.is_fresh(pair, exchange):
+            return None
+        return float(self.price[self.pair_ids[pair], self.exchange_ids[exchange]])
+
+    def pair_prices(self, pair: str) -> Dict[str, float]:
+        """Fresh prices of one pair keyed by exchange."""
+        row = self.pair_ids.get(pair)
+        if row is None:
+            return {}
+        prices = self.live()[row]
+        return {self.exchanges[column]: float(prices[column]) for column in np.nonzero(~np.isnan(prices))[0]}
+
+    def fresh_prices(self) -> Dict[str, Dict[str, float]]:
+        """Fresh prices of every pair as {pair: {exchange: price}}."""
+        prices = self.live()
+        rows, columns = np.nonzero(~np.isnan(prices))
+        result = {pair: {} for pair in self.pairs}
+        for row, column in zip(rows, columns):
+            result[self.pairs[row]][self.exchanges[column]] = float(prices[row, column])
+        return result
+
+    def live(self, exchanges: Optional[Iterable[str]] = None, now: Optional[float] = None) -> np.ndarray:
+        """pairs x exchanges array of fresh prices with NaN elsewhere, optionally restricted to some exchanges."""
+        width = len(self.exchanges)
+        now = time.time() if now is None else now
+        mask = self.mask[:, :width] & (now - self.updated_at[:, :width] <= self.max_age[:width])
+        if exchanges is not None:
+            usable = np.zeros(width, dtype=bool)
+            usable[[self.exchange_ids[name] for name in exchanges if name in self.exchange_ids]] = True
+            mask = mask & usable
+        return np.where(mask, self.price[:, :width], np.nan)
+
+    def stats(self, exchanges: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """Per-pair venue count, mean, low, high, spread (high / low - 1) and dispersion (std / mean)."""
+        prices = self.live(exchanges)
+        count = np.sum(~np.isnan(prices), axis=1)
+        quoted = count > 0
+        rows = prices[quoted]
+        result = {name: np.full(len(self.pairs), np.nan) for name in ('mean', 'low', 'high', 'spread', 'dispersion')}
+        if len(rows):
+            result['mean'][quoted] = np.nanmean(rows, axis=1)
+            result['low'][quoted] = np.nanmin(rows, axis=1)
+            result['high'][quoted] = np.nanmax(rows, axis=1)
+            result['dispersion'][quoted] = np.nanstd(rows, axis=1) / result['mean'][quoted]
+            result['spread'] = result['high'] / result['low'] - 1
+        result['count'] = count
+        return result
+
+    def mean(self, exchanges: Optional[Iterable[str]] = None) -> float:
+        """Mean of every live price, NaN when there is none."""
+        prices = self.live(exchanges)
+        if not np.any(~np.isnan(prices)):
+            return float('nan')
+        return float(np.nanmean(prices))
+
+    def __contains__(self, pair: str) -> bool:
+        return pair in self.pair_ids
+
+    def __len__(self) -> int:
+        return int(self.mask.sum())
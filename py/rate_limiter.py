@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, Mapping
+from config import RATE_LIMIT_SETTINGS
+
+# Setup logging
+logging.basicConfig(
+    filename='rate_limiter.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Fallback limits used when an exchange has no entry in RATE_LIMIT_SETTINGS
+DEFAULT_RATE_LIMITS = {
+    'rate': 20.0,              # Weight units refilled per second
+    'burst': 40.0,             # Maximum weight that can be spent at once
+    'safety_margin': 0.9,      # Fraction of the server-reported budget we allow ourselves
+    'window_limit': 1200,      # Weight allowed per server window (used with X-*-USED-WEIGHT headers)
+    'default_weight': 1,
+    'weights': {
+        '/api/v3/ticker/price': 2,
+        '/api/v3/ticker/price:all': 4,  # ticker/price without a symbol
+        '/api/v3/depth': 5,
+        '/api/v3/exchangeInfo': 10,
+    },
+    'endpoints': {
+        '/api/v3/order': {'rate': 10.0, 'burst': 10.0},
+    },
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out weighted reservations."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accrued since the last update."""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, weight: float) -> float:
+        """Reserve tokens and return how long the caller must wait before using them."""
+        weight = min(float(weight), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= weight
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_acquire(self, weight: float) -> bool:
+        """Take tokens only if they are available right now."""
+        weight = min(float(weight), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens < weight:
+                return False
+            self.tokens -= weight
+            return True
+
+    def refund(self, weight: float) -> None:
+        """Return tokens taken for a request that was not sent."""
+        weight = min(float(weight), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + weight)
+
+    def cap(self, remaining: float) -> None:
+        """Never hold more tokens than the server says we have left."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(remaining))
+
+    def block_for(self, seconds: float) -> None:
+        """Drain the bucket so that nothing is granted for the given number of seconds."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """Per-exchange weighted rate limiter with an exchange-wide budget and per-endpoint buckets."""
+
+    def __init__(self, exchange_name: str, settings: Optional[Dict[str, Any]] = None):
+        self.exchange_name = exchange_name
+        self.settings = _merge_settings(settings or {})
+        self.safety_margin = self.settings['safety_margin']
+        self.window_limit = self.settings['window_limit']
+        self.weights = self.settings['weights']
+        self.default_weight = self.settings['default_weight']
+        self.bucket = TokenBucket(
+            self.settings['rate'] * self.safety_margin,
+            self.settings['burst'] * self.safety_margin
+        )
+        self.endpoint_buckets = {
+            endpoint: TokenBucket(limits['rate'] * self.safety_margin, limits['burst'] * self.safety_margin)
+            for endpoint, limits in self.settings['endpoints'].items()
+        }
+
+    def weight_for(self, endpoint: str) -> float:
+        """Return the request weight of an endpoint."""
+        return self.weights.get(endpoint, self.default_weight)
+
+    def _reserve(self, endpoint: str, weight: Optional[float]) -> float:
+        """Reserve capacity on the exchange bucket and the endpoint bucket, if any."""
+        weight = self.weight_for(endpoint) if weight is None else weight
+        wait = self.bucket.reserve(weight)
+        endpoint_bucket = self.endpoint_buckets.get(endpoint)
+        if endpoint_bucket is not None:
+            wait = max(wait, endpoint_bucket.reserve(1))
+        return wait
+
+    async def acquire(self, endpoint: str, weight: Optional[float] = None) -> None:
+        """Wait (without blocking the event loop) until a request to the endpoint is allowed."""
+        wait = self._reserve(endpoint, weight)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, endpoint: str, weight: Optional[float] = None) -> None:
+        """Blocking variant of acquire for the requests-based code paths."""
+        wait = self._reserve(endpoint, weight)
+        if wait > 0:
+            time.sleep(wait)
+
+    def try_acquire(self, endpoint: str, weight: Optional[float] = None) -> bool:
+        """Take capacity only if it is available immediately."""
+        weight = self.weight_for(endpoint) if weight is None else weight
+        endpoint_bucket = self.endpoint_buckets.get(endpoint)
+        if endpoint_bucket is not None and not endpoint_bucket.try_acquire(1):
+            return False
+        if not self.bucket.try_acquire(weight):
+            if endpoint_bucket is not None:
+                endpoint_bucket.refund(1)  # Nothing is sent, so the endpoint slot is not spent either
+            return False
+        return True
+
+    def update_from_headers(self, headers: Mapping[str, str], status: Optional[int] = None) -> None:
+        """Re-synchronise the budget with the rate-limit headers returned by the exchange."""
+        retry_after = headers.get('Retry-After')
+        if status in (418, 429) or retry_after:
+            seconds = _to_float(retry_after)
+            if seconds is None:
+                seconds = 1.0
+            logging.warning(f"Rate limit hit on {self.exchange_name} (status {status}). Pausing for {seconds}s.")
+            self.bucket.block_for(seconds)
+            return
+
+        used_weight = None
+        for key, value in headers.items():
+            if key.lower().startswith('x-mbx-used-weight'):
+                used_weight = _to_float(value)
+                break
+        if used_weight is not None:
+            self.bucket.cap(self.window_limit * self.safety_margin - used_weight)
+            return
+
+        remaining = _to_float(headers.get('X-RateLimit-Remaining'))
+        if remaining is not None:
+            limit = _to_float(headers.get('X-RateLimit-Limit'))
+            reserve = (1 - self.safety_margin) * limit if limit else 0
+            self.bucket.cap(remaining - reserve)
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    """Parse a header value, ignoring anything that is not a number."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _merge_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Overlay exchange-specific settings on top of the defaults."""
+    overrides = RATE_LIMIT_SETTINGS.get('default', {})
+    merged = {**DEFAULT_RATE_LIMITS, **overrides, **settings}
+    for key in ('weights', 'endpoints'):
+        merged[key] = {**DEFAULT_RATE_LIMITS[key], **overrides.get(key, {}), **settings.get(key, {})}
+    return merged
+
+
+class HedgeBudget:
+    """Allows duplicate (hedged) requests for at most a fixed fraction of primary requests."""
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """Credit the budget for one primary request."""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget if there is one left."""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(exchange_name: str) -> RateLimiter:
+    """Return the process-wide limiter shared by every client of an exchange."""
+    with _limiters_lock:
+        limiter = _limiters.get(exchange_name)
+        if limiter is None:
+            limiter = RateLimiter(exchange_name, RATE_LIMIT_SETTINGS.get(exchange_name, {}))
+            _limiters[exchange_name] = limiter
+        return limiter
+
+
+_hedge_budgets: Dict[str, HedgeBudget] = {}
+
+
+def get_hedge_budget(exchange_name: str, ratio: float, max_tokens: float) -> HedgeBudget:
+    """Return the process-wide hedge budget of an exchange."""
+    with _limiters_lock:
+        budget = _hedge_budgets.get(exchange_name)
+        if budget is None:
+            budget = HedgeBudget(ratio, max_tokens)
+            _hedge_budgets[exchange_name] = budget
+        return budget
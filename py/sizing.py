@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from config import TRADING_PAIRS, ARBITRAGE_PARAMS
+from api import get_depth
+from execution import trading_fee
+from price_cache import SingleFlightCache
+
+# Setup logging
+logging.basicConfig(
+    filename='sizing.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# The last unit bought and sold must still earn this much after both fees
+MIN_NET_SPREAD = ARBITRAGE_PARAMS.get('min_net_spread', 0.0005)
+DEPTH_MAX_AGE_MS = ARBITRAGE_PARAMS.get('depth_max_age_ms', 250)  # Reuse a fetched book for this long
+SIZING_CACHE_SIZE = 1024
+
+MIN_TRADE_AMOUNTS = {pair_info['pair']: pair_info.get('min_trade_amount', 0.0) for pair_info in TRADING_PAIRS}
+
+
+class OrderBook:
+    """One depth snapshot with cumulative size and notional per level, best level first."""
+
+    __slots__ = ('exchange', 'pair', 'update_id', 'bids', 'asks', 'bid_depth', 'ask_depth',
+                 'bid_notional', 'ask_notional')
+
+    def __init__(self, exchange: str, pair: str, update_id, bids: np.ndarray, asks: np.ndarray):
+        self.exchange = exchange
+        self.pair = pair
+        self.update_id = update_id
+        self.bids = bids  # (levels, 2) array of price, size; highest price first
+        self.asks = asks  # Lowest price first
+        self.bid_depth = np.cumsum(bids[:, 1])
+        self.ask_depth = np.cumsum(asks[:, 1])
+        self.bid_notional = np.cumsum(bids[:, 0] * bids[:, 1])
+        self.ask_notional = np.cumsum(asks[:, 0] * asks[:, 1])
+
+    @property
+    def version(self) -> Tuple[str, str, Any]:
+        return self.exchange, self.pair, self.update_id
+
+
+class Sizing:
+    """Largest executable quantity for a buy/sell pair of books and what trading it yields."""
+
+    __slots__ = ('quantity', 'buy_limit', 'sell_limit', 'buy_vwap', 'sell_vwap', 'net_spread', 'profit')
+
+    def __init__(self, quantity: float = 0.0, buy_limit: float = 0.0, sell_limit: float = 0.0,
+                 buy_vwap: float = 0.0, sell_vwap: float = 0.0, net_spread: float = 0.0, profit: float = 0.0):
+        self.quantity = quantity
+        self.buy_limit = buy_limit    # Worst ask the buy leg has to reach
+        self.sell_limit = sell_limit  # Worst bid the sell leg has to reach
+        self.buy_vwap = buy_vwap
+        self.sell_vwap = sell_vwap
+        self.net_spread = net_spread  # Average return after fees
+        self.profit = profit          # In quote currency, after fees
+
+    def __bool__(self) -> bool:
+        return self.quantity > 0
+
+    def __repr__(self) -> str:
+        return (f"Sizing(quantity={self.quantity}, buy<={self.buy_limit}, sell>={self.sell_limit}, "
+                f"net_spread={self.net_spread:.5f}, profit={self.profit:.4f})")
+
+
+def parse_depth(exchange: str, pair: str, depth: Dict[str, Any]) -> Optional[OrderBook]:
+    """Build an OrderBook from a depth response, or None if either side is empty."""
+    if not depth or not depth.get('bids') or not depth.get('asks'):
+        return None
+    bids = np.array(depth['bids'], dtype=float)[:, :2]
+    asks = np.array(depth['asks'], dtype=float)[:, :2]
+    return OrderBook(exchange, pair, depth.get('lastUpdateId'), bids, asks)
+
+
+def fetch_order_book(exchange: str, pair: str) -> Optional[OrderBook]:
+    """Fetch and parse the current book of a pair."""
+    book = parse_depth(exchange, pair, get_depth(exchange, pair))
+    if book is None:
+        logging.error(f"No order book for {pair} on {exchange}")
+    return book
+
+
+def _fill_cost(depth: np.ndarray, notional: np.ndarray, prices: np.ndarray, quantity: float) -> float:
+    """Notional of taking `quantity` from the top of one side of a book."""
+    level = int(np.searchsorted(depth, quantity, side='left'))
+    if level == 0:
+        return quantity * prices[0]
+    return notional[level - 1] + (quantity - depth[level - 1]) * prices[level]
+
+
+def size_opportunity(buy_book: OrderBook, sell_book: OrderBook, min_net_spread: float = MIN_NET_SPREAD,
+                     max_quantity: Optional[float] = None) -> Sizing:
+    """Largest quantity for which buying up buy_book's asks and selling into sell_book's bids stays profitable.
+
+    Walks both books at once: every cumulative-size breakpoint of either side starts a segment in which
+    the marginal ask and bid are constant. Segments are kept while the marginal spread, net of both
+    fees, exceeds min_net_spread; the book's ordering makes that spread non-increasing, so the first
+    failing segment ends the trade.
+    """
+    max_quantity = ARBITRAGE_PARAMS['trade_volume_limit'] if max_quantity is None else max_quantity
+    buy_fee, sell_fee = trading_fee(buy_book.exchange), trading_fee(sell_book.exchange)
+    breakpoints = np.union1d(buy_book.ask_depth, sell_book.bid_depth)
+    breakpoints = breakpoints[breakpoints <= min(buy_book.ask_depth[-1], sell_book.bid_depth[-1])]
+    # Marginal level in force just below each breakpoint
+    ask_levels = np.searchsorted(buy_book.ask_depth, breakpoints, side='left')
+    bid_levels = np.searchsorted(sell_book.bid_depth, breakpoints, side='left')
+    marginal = (sell_book.bids[bid_levels, 0] * (1 - sell_fee)) / (buy_book.asks[ask_levels, 0] * (1 + buy_fee)) - 1
+    failing = np.nonzero(marginal <= min_net_spread)[0]
+    if len(failing) == 0:
+        quantity = breakpoints[-1] if len(breakpoints) else 0.0
+    elif failing[0] == 0:
+        return Sizing()
+    else:
+        # The trade extends up to where the first unprofitable segment begins
+        quantity = breakpoints[failing[0] - 1]
+    quantity = float(min(quantity, max_quantity))
+    if quantity <= 0 or quantity < MIN_TRADE_AMOUNTS.get(buy_book.pair, 0.0):
+        return Sizing()
+
+    cost = _fill_cost(buy_book.ask_depth, buy_book.ask_notional, buy_book.asks[:, 0], quantity) * (1 + buy_fee)
+    revenue = _fill_cost(sell_book.bid_depth, sell_book.bid_notional, sell_book.bids[:, 0], quantity) * (1 - sell_fee)
+    return Sizing(
+        quantity=quantity,
+        buy_limit=float(buy_book.asks[np.searchsorted(buy_book.ask_depth, quantity, side='left'), 0]),
+        sell_limit=float(sell_book.bids[np.searchsorted(sell_book.bid_depth, quantity, side='left'), 0]),
+        buy_vwap=cost / (1 + buy_fee) / quantity,
+        sell_vwap=revenue / (1 - sell_fee) / quantity,
+        net_spread=revenue / cost - 1,
+        profit=revenue - cost,
+    )
+
+
+_sizings: 'OrderedDict[tuple, Sizing]' = OrderedDict()  # (buy book version, sell book version, spread, cap) -> result
+_books = SingleFlightCache(freshness_ms=DEPTH_MAX_AGE_MS)
+
+
+def cached_sizing(buy_book: OrderBook, sell_book: OrderBook, min_net_spread: float = MIN_NET_SPREAD,
+                  max_quantity: Optional[float] = None) -> Sizing:
+    """size_opportunity, computed once per pair of book versions."""
+    key = (buy_book.version, sell_book.version, min_net_spread, max_quantity)
+    sizing = _sizings.get(key)
+    if sizing is not None and None not in (buy_book.update_id, sell_book.update_id):
+        _sizings.move_to_end(key)
+        return sizing
+    sizing = size_opportunity(buy_book, sell_book, min_net_spread, max_quantity)
+    _sizings[key] = sizing
+    if len(_sizings) > SIZING_CACHE_SIZE:
+        _sizings.popitem(last=False)
+    return sizing
+
+
+def size_trade(buy_exchange: str, sell_exchange: str, pair: str, min_net_spread: float = MIN_NET_SPREAD,
+               max_quantity: Optional[float] = None) -> Sizing:
+    """Fetch both books and size a trade buying on buy_exchange and selling on sell_exchange."""
+    buy_book = fetch_order_book(buy_exchange, pair)
+    sell_book = fetch_order_book(sell_exchange, pair)
+    if buy_book is None or sell_book is None:
+        return Sizing()
+    return cached_sizing(buy_book, sell_book, min_net_spread, max_quantity)
+
+
+async def size_trade_async(buy_exchange: str, sell_exchange: str, pair: str, min_net_spread: float = MIN_NET_SPREAD,
+                           max_quantity: Optional[float] = None) -> Sizing:
+    """size_trade for coroutines; books fetched within DEPTH_MAX_AGE_MS are reused."""
+    buy_book, sell_book = await asyncio.gather(*(
+        _books.get((exchange, pair), lambda exchange=exchange: asyncio.to_thread(fetch_order_book, exchange, pair))
+        for exchange in (buy_exchange, sell_exchange)
+    ))
+    if buy_book is None or sell_book is None:
+        return Sizing()
+    return cached_sizing(buy_book, sell_book, min_net_spread, max_quantity)
@@ -5,7 +5,9 @@ import logging
 from typing import List, Dict, Any, Tuple, Optional
 from exchange_connector import ExchangeConnector
 from order_manager import OrderManager
+from circuit_breaker import is_available, is_healthy
 from config import TRADING_PAIRS, ARBITRAGE_PARAMS
+from sizing import Sizing, size_trade_async
 
 # Setup logging
 logging.basicConfig(
@@ -20,7 +22,7 @@ class TradingStrategy:
     def __init__(self, exchanges: List[str]):
         self.exchanges = exchanges
         self.connectors = {exchange: ExchangeConnector(exchange) for exchange in exchanges}
-        self.order_managers = {exchange: OrderManager(exchange) for exchange in exchanges}
+        self.order_manager = OrderManager()
     
     async def detect_arbitrage_opportunity(self) -> Optional[Tuple[str, str, float, float]]:
         """Detect arbitrage opportunities between exchanges."""
@@ -35,37 +37,40 @@ class TradingStrategy:
     async def execute_arbitrage(self, opportunity: Tuple[str, str, float, float]) -> None:
         """Execute trades based on detected arbitrage opportunities."""
         buy_exchange, sell_exchange, buy_price, sell_price = opportunity
-        amount = self._calculate_trade_amount(buy_price, sell_price)
+        sizing = await self._calculate_trade_amount(buy_exchange, sell_exchange, 'ETH/USD')
+        if not sizing:
+            logging.info(f"Not enough profitable depth to buy on {buy_exchange} and sell on {sell_exchange}")
+            return
+        # Limit prices reach as deep into each book as the sized quantity needs
+        amount, buy_price, sell_price = sizing.quantity, sizing.buy_limit, sizing.sell_limit
 
         logging.info(f"Executing arbitrage: Buy on {buy_exchange} at {buy_price}, Sell on {sell_exchange} at {sell_price}")
         
         # Place buy order on the buy exchange
-        buy_order = await self.order_managers[buy_exchange].place_order('ETH/USD', amount, buy_price, 'BUY')
+        buy_order = await self.order_manager.place_order(buy_exchange, 'ETH/USD', amount, buy_price, 'BUY')
         if not buy_order:
             logging.error(f"Failed to place buy order on {buy_exchange}")
             return
 
         # Place sell order on the sell exchange
-        sell_order = await self.order_managers[sell_exchange].place_order('ETH/USD', amount, sell_price, 'SELL')
+        sell_order = await self.order_manager.place_order(sell_exchange, 'ETH/USD', amount, sell_price, 'SELL')
         if not sell_order:
             logging.error(f"Failed to place sell order on {sell_exchange}. Attempting to cancel buy order.")
             # Attempt to cancel the buy order if the sell order fails
-            await self.order_managers[buy_exchange].cancel_order(buy_order.get('orderId'))
+            await self.order_manager.cancel_order(buy_exchange, buy_order.get('orderId'))
             return
 
-        # Monitor orders to ensure they are filled
+        # Wait for both fills; the order tracker resolves these as soon as the exchanges report them
         await asyncio.gather(
-            self.order_managers[buy_exchange].monitor_orders([buy_order.get('orderId')], 'ETH/USD'),
-            self.order_managers[sell_exchange].monitor_orders([sell_order.get('orderId')], 'ETH/USD')
+            self.order_manager.wait_for_fill(buy_exchange, buy_order.get('orderId')),
+            self.order_manager.wait_for_fill(sell_exchange, sell_order.get('orderId'))
         )
         logging.info(f"Arbitrage execution complete: Buy order {buy_order['orderId']}, Sell order {sell_order['orderId']}")
 
     async def _fetch_all_prices(self) -> Dict[str, Dict[str, float]]:
         """Fetch prices from all connected exchanges with error handling."""
-        tasks = []
-        for exchange in self.connectors:
-            for pair in TRADING_PAIRS:
-                tasks.append(self._safe_fetch_price(exchange, pair['pair']))
+        pairs = [pair['pair'] for pair in TRADING_PAIRS]
+        tasks = [self._safe_fetch_prices(exchange, pairs) for exchange in self.connectors if is_available(exchange)]
 
         results = await asyncio.gather(*tasks)
         prices = {}
@@ -74,19 +79,21 @@ class TradingStrategy:
                 prices[exchange] = price_data
         return prices
 
-    async def _safe_fetch_price(self, exchange: str, pair: str) -> Tuple[str, Optional[Dict[str, float]]]:
-        """Fetch price with error handling for individual exchange connectors."""
+    async def _safe_fetch_prices(self, exchange: str, pairs: List[str]) -> Tuple[str, Optional[Dict[str, float]]]:
+        """Fetch a price snapshot with error handling for individual exchange connectors."""
         try:
-            price = await self.connectors[exchange].fetch_price(pair)
-            return exchange, price
+            snapshot = await self.connectors[exchange].fetch_prices(pairs)
+            return exchange, snapshot.prices
         except Exception as e:
-            logging.error(f"Error fetching price from {exchange} for {pair}: {e}")
+            logging.error(f"Error fetching prices from {exchange}: {e}")
             return exchange, None
 
     def _find_arbitrage_opportunities(self, prices: Dict[str, Dict[str, float]]) -> Optional[Tuple[str, str, float, float]]:
         """Find the best arbitrage opportunity from the fetched prices."""
         best_opportunity = None
         highest_profit = 0
+        # Slow or error-prone venues are left out of opportunity detection
+        prices = {exchange: exchange_prices for exchange, exchange_prices in prices.items() if is_healthy(exchange)}
 
         for buy_exchange, buy_prices in prices.items():
             for sell_exchange, sell_prices in prices.items():
@@ -106,13 +113,10 @@ class TradingStrategy:
 
         return best_opportunity
 
-    def _calculate_trade_amount(self, buy_price: float, sell_price: float) -> float:
-        """Calculate the trade amount based on risk management and the price."""
-        volume_limit = ARBITRAGE_PARAMS['trade_volume_limit']
-        profit_margin = sell_price - buy_price
-        # Example: trade smaller amounts if profit margin is low
-        trade_amount = volume_limit * (profit_margin / sell_price)  
-        return max(trade_amount, ARBITRAGE_PARAMS['min_trade_volume'])
+    async def _calculate_trade_amount(self, buy_exchange: str, sell_exchange: str, pair: str) -> Sizing:
+        """Size the trade from both order books: the most that stays profitable after fees, up to the volume limit."""
+        return await size_trade_async(buy_exchange, sell_exchange, pair,
+                                      max_quantity=ARBITRAGE_PARAMS['trade_volume_limit'])
 
     async def run(self) -> None:
         """Continuously run the trading strategy with configurable update intervals."""
@@ -0,0 +1,60 @@
+import math
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) schedule and cancel, and advancing costs only the slots that came due.
+
+    Each timer sits in the slot of the tick at or after its deadline; timers more than one revolution
+    ahead share a slot with nearer ones and are left in place until their own revolution comes round.
+    Rescheduling or cancelling leaves the old entry behind, to be discarded when its slot is visited.
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self._slots: List[Dict[Hashable, float]] = [{} for _ in range(slots)]
+        self._deadlines: Dict[Hashable, float] = {}
+        self._processed = int(clock() / tick)  # Last tick whose slot has been visited
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Arm (or re-arm) the timer for key to fire at deadline, in the clock's time base."""
+        self._deadlines[key] = deadline
+        index = max(math.ceil(deadline / self.tick), self._processed + 1)
+        self._slots[index % len(self._slots)][key] = deadline
+
+    def cancel(self, key: Hashable) -> None:
+        """Disarm the timer for key, if any."""
+        self._deadlines.pop(key, None)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """When the timer for key fires, or None if it is not armed."""
+        return self._deadlines.get(key)
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Visit every slot up to now and return the keys whose timers fired."""
+        now = self.clock() if now is None else now
+        target = int(now / self.tick)
+        # After a long pause one full revolution visits every slot once
+        start = max(self._processed + 1, target - len(self._slots) + 1)
+        fired = []
+        for index in range(start, target + 1):
+            slot = self._slots[index % len(self._slots)]
+            if not slot:
+                continue
+            for key, deadline in list(slot.items()):
+                if self._deadlines.get(key) != deadline:
+                    del slot[key]  # Cancelled or rescheduled since
+                elif deadline <= now:
+                    del slot[key]
+                    del self._deadlines[key]
+                    fired.append(key)
+        self._processed = max(self._processed, target)
+        return fired
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
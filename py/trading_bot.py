@@ -1,13 +1,21 @@
 # trading_bot.py
 
+import aiohttp
 import asyncio
 import logging
-import requests
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from config import (
     EXCHANGE_API_KEYS, EXCHANGE_URLS, TRADING_PAIRS, ARBITRAGE_PARAMS, 
     LOGGING_SETTINGS, TIMING_SETTINGS
 )
+from rate_limiter import get_rate_limiter
+from json_codec import loads, DecodeError
+from market_data import PriceSnapshot, MAX_CONCURRENT_REQUESTS, supports_bulk_ticker, parse_bulk_ticker
+from circuit_breaker import get_circuit_breaker, is_available, is_healthy
+from order_manager import OrderManager
+from execution import TwoLegExecutor
+from price_state import PriceMatrix
 
 # Setup logging
 logging.basicConfig(
@@ -16,77 +24,216 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+REQUEST_TIMEOUT = TIMING_SETTINGS.get('request_timeout', 10)
+CONNECTIONS_PER_EXCHANGE = TIMING_SETTINGS.get('connections_per_exchange', 20)
+# A price cycle keeps whatever arrived by this deadline; later cells are reported as timed out
+PRICE_CYCLE_DEADLINE = TIMING_SETTINGS.get('price_cycle_deadline', 2.0)
+
 class ExchangeAPI:
-    """Handles interactions with a single exchange."""
+    """Handles interactions with a single exchange over a pooled, non-blocking aiohttp session."""
     
-    def __init__(self, exchange_name: str):
+    def __init__(self, exchange_name: str, timeout: float = REQUEST_TIMEOUT):
         self.exchange_name = exchange_name
         self.api_key = EXCHANGE_API_KEYS[exchange_name]['api_key']
         self.api_secret = EXCHANGE_API_KEYS[exchange_name]['api_secret']
         self.base_url = EXCHANGE_URLS[exchange_name]
-        self.session = requests.Session()
+        self.timeout = timeout
+        self.session = None
+        self.rate_limiter = get_rate_limiter(exchange_name)
+        self.market_breaker = get_circuit_breaker(exchange_name, 'market_data')
+
+    async def start(self) -> None:
+        """Create the pooled session on first use (it must be created inside the running loop)."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=CONNECTIONS_PER_EXCHANGE, keepalive_timeout=30),
+                headers={'X-MBX-APIKEY': self.api_key},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def _get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, weight: Optional[float] = None) -> Any:
+        """GET a market-data endpoint and return the decoded body; failures are recorded and raised."""
+        await self.start()
+        await self.rate_limiter.acquire(endpoint, weight)
+        started = time.monotonic()
+        try:
+            async with self.session.get(f"{self.base_url}{endpoint}", params=params) as response:
+                self.rate_limiter.update_from_headers(response.headers, response.status)
+                response.raise_for_status()
+                data = await response.json(loads=loads, content_type=None)
+        except (asyncio.TimeoutError, aiohttp.ClientError, *DecodeError):
+            self.market_breaker.record_failure(time.monotonic() - started)
+            raise
+        self.market_breaker.record_success(time.monotonic() - started)
+        return data
 
-    async def fetch_price(self, pair: str) -> float:
+    async def get_price(self, pair: str) -> float:
+        """Current price of a trading pair; raises if it cannot be fetched."""
+        data = await self._get("/api/v3/ticker/price", {'symbol': pair.replace('/', '')})
+        return float(data['price'])
+
+    async def get_bulk_prices(self, pairs: List[str]) -> Dict[str, float]:
+        """Prices of the requested pairs from the all-symbols ticker; raises if it cannot be fetched."""
+        endpoint = "/api/v3/ticker/price"
+        return parse_bulk_ticker(await self._get(endpoint, weight=self.rate_limiter.weight_for(f"{endpoint}:all")), pairs)
+
+    async def fetch_price(self, pair: str) -> Optional[float]:
         """Fetch current price of a trading pair."""
-        url = f"{self.base_url}/api/v3/ticker/price"
-        params = {'symbol': pair.replace('/', '')}
-        
+        if not self.market_breaker.allow_request():
+            return None
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            return float(data['price'])
-        except requests.RequestException as e:
+            return await self.get_price(pair)
+        except (asyncio.TimeoutError, aiohttp.ClientError, KeyError, TypeError, ValueError, *DecodeError) as e:
             logging.error(f"Error fetching price from {self.exchange_name} for pair {pair}: {e}")
             return None
 
+    async def fetch_prices(self, pairs: List[str]) -> PriceSnapshot:
+        """Fetch a snapshot of many pairs, using the all-symbols ticker where the exchange offers it."""
+        if supports_bulk_ticker(self.exchange_name) and self.market_breaker.allow_request():
+            try:
+                return PriceSnapshot(self.exchange_name, await self.get_bulk_prices(pairs))
+            except (asyncio.TimeoutError, aiohttp.ClientError, KeyError, TypeError, ValueError, *DecodeError) as e:
+                logging.error(f"Error fetching bulk ticker from {self.exchange_name}: {e}")
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def fetch_one(pair: str):
+            async with semaphore:
+                return pair, await self.fetch_price(pair)
+
+        results = await asyncio.gather(*(fetch_one(pair) for pair in pairs))
+        return PriceSnapshot(self.exchange_name, {pair: price for pair, price in results if price is not None})
+
     async def place_order(self, pair: str, amount: float, price: float, order_type: str) -> Dict[str, Any]:
         """Place an order on the exchange."""
-        url = f"{self.base_url}/api/v3/order"
-        headers = {
-            'X-MBX-APIKEY': self.api_key
-        }
+        endpoint = "/api/v3/order"
         params = {
             'symbol': pair.replace('/', ''),
             'side': order_type,
             'type': 'LIMIT',
-            'price': price,
-            'quantity': amount,
+            'price': str(price),
+            'quantity': str(amount),
             'timeInForce': 'GTC'
         }
         
+        await self.start()
         try:
-            response = self.session.post(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            await self.rate_limiter.acquire(endpoint)
+            async with self.session.post(f"{self.base_url}{endpoint}", params=params) as response:
+                self.rate_limiter.update_from_headers(response.headers, response.status)
+                response.raise_for_status()
+                return await response.json(loads=loads, content_type=None)
+        except (asyncio.TimeoutError, aiohttp.ClientError, *DecodeError) as e:
             logging.error(f"Error placing {order_type} order on {self.exchange_name} for pair {pair}: {e}")
             return {}
 
+    async def close(self) -> None:
+        """Close the pooled session."""
+        if self.session:
+            await self.session.close()
+
+class PriceCell:
+    """Outcome of fetching one pair from one exchange in a price cycle: the price, or why there is none."""
+
+    __slots__ = ('pair', 'exchange', 'price', 'latency', 'error')
+
+    def __init__(self, pair: str, exchange: str, price: Optional[float] = None,
+                 latency: Optional[float] = None, error: Optional[str] = None):
+        self.pair = pair
+        self.exchange = exchange
+        self.price = price
+        self.latency = latency  # Seconds from the start of the cycle to the answer, or to the deadline
+        self.error = error
+
+    def __repr__(self) -> str:
+        outcome = self.price if self.error is None else self.error
+        return f"PriceCell({self.pair}, {self.exchange}, {outcome}, latency={self.latency})"
+
 class TradingBot:
     def __init__(self):
         self.exchanges = {name: ExchangeAPI(name) for name in EXCHANGE_URLS.keys()}
-        self.pair_prices = {}
+        # Latest quote per pair and exchange with its receive time; stale quotes are never returned
+        self.pair_prices = PriceMatrix([pair['pair'] for pair in TRADING_PAIRS], self.exchanges.keys())
+        self.order_manager = OrderManager()
+        self.executor = TwoLegExecutor(self.order_manager)
+        # Bounds the requests in flight to each exchange across a whole price cycle
+        self.semaphores = {name: asyncio.Semaphore(MAX_CONCURRENT_REQUESTS) for name in self.exchanges}
+        self.last_cells: Dict[Tuple[str, str], PriceCell] = {}  # (pair, exchange) -> outcome in the latest cycle
 
-    async def fetch_prices(self) -> Dict[str, Dict[str, float]]:
-        """Fetch prices for all trading pairs from all exchanges."""
-        prices = {pair['pair']: {} for pair in TRADING_PAIRS}
-        
-        async def fetch_from_exchange(exchange: ExchangeAPI):
-            for pair in prices.keys():
-                price = await exchange.fetch_price(pair)
-                if price is not None:
-                    prices[pair][exchange.exchange_name] = price
-        
-        tasks = [fetch_from_exchange(exchange) for exchange in self.exchanges.values()]
-        await asyncio.gather(*tasks)
-        return prices
+    async def fetch_prices(self, deadline: float = PRICE_CYCLE_DEADLINE) -> Dict[str, Dict[str, float]]:
+        """Fetch prices for all trading pairs from all exchanges; quotes past their max age are left out."""
+        self.last_cells = await self.fetch_price_cells(self.pair_prices.pairs, deadline)
+        for cell in self.last_cells.values():
+            if cell.price is not None:
+                self.pair_prices.update(cell.pair, cell.exchange, cell.price)
+        self.pair_prices.expire()
+        return self.pair_prices.fresh_prices()
+
+    async def fetch_price_cells(self, pairs: List[str], deadline: float = PRICE_CYCLE_DEADLINE) -> Dict[Tuple[str, str], PriceCell]:
+        """Fetch every (pair, exchange) price concurrently and return the cells as they stand after deadline seconds.
+
+        Exchanges with the all-symbols ticker answer every pair in one request; the others get one request
+        per pair, at most MAX_CONCURRENT_REQUESTS at a time per exchange. Requests still outstanding at the
+        deadline are cancelled and their cells marked 'timeout', so one slow venue cannot stall the cycle.
+        """
+        started = time.monotonic()
+        cells = {(pair, name): PriceCell(pair, name) for name in self.exchanges for pair in pairs}
+        tasks = {}
+        for name, exchange in self.exchanges.items():
+            if not is_available(name):
+                # Venues with an open circuit are skipped; their breaker lets a probe through once it times out
+                for pair in pairs:
+                    cells[(pair, name)].error = 'circuit open'
+            elif supports_bulk_ticker(name):
+                task = asyncio.ensure_future(self._fetch_bulk_cells(exchange, [cells[(pair, name)] for pair in pairs], started))
+                tasks[task] = [(pair, name) for pair in pairs]
+            else:
+                for pair in pairs:
+                    tasks[asyncio.ensure_future(self._fetch_cell(exchange, cells[(pair, name)], started))] = [(pair, name)]
+
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            for task in pending:
+                task.cancel()
+                for key in tasks[task]:
+                    cells[key].error, cells[key].latency = 'timeout', deadline
+        missing = sum(cell.price is None for cell in cells.values())
+        if missing:
+            logging.warning(f"Price cycle ended after {(time.monotonic() - started) * 1000:.0f} ms "
+                            f"with {missing} of {len(cells)} cells missing")
+        return cells
+
+    async def _fetch_cell(self, exchange: ExchangeAPI, cell: PriceCell, started: float) -> None:
+        async with self.semaphores[exchange.exchange_name]:
+            try:
+                cell.price = await exchange.get_price(cell.pair)
+            except (asyncio.TimeoutError, aiohttp.ClientError, KeyError, TypeError, ValueError, *DecodeError) as e:
+                cell.error = str(e) or type(e).__name__
+            cell.latency = time.monotonic() - started
+
+    async def _fetch_bulk_cells(self, exchange: ExchangeAPI, cells: List[PriceCell], started: float) -> None:
+        async with self.semaphores[exchange.exchange_name]:
+            try:
+                prices, error = await exchange.get_bulk_prices([cell.pair for cell in cells]), 'not quoted'
+            except (asyncio.TimeoutError, aiohttp.ClientError, KeyError, TypeError, ValueError, *DecodeError) as e:
+                prices, error = {}, str(e) or type(e).__name__
+        latency = time.monotonic() - started
+        for cell in cells:
+            cell.price, cell.latency = prices.get(cell.pair), latency
+            if cell.price is None:
+                cell.error = error
+
+    async def close(self) -> None:
+        """Close the market-data sessions and the order manager."""
+        await asyncio.gather(*(exchange.close() for exchange in self.exchanges.values()))
+        await self.order_manager.close()
 
     def detect_arbitrage_opportunity(self, prices: Dict[str, Dict[str, float]]) -> List[Dict[str, Any]]:
         """Detect arbitrage opportunities based on price discrepancies."""
         opportunities = []
 
         for pair, exchange_prices in prices.items():
+            exchange_prices = {exchange: price for exchange, price in exchange_prices.items() if is_healthy(exchange)}
             if len(exchange_prices) < 2:
                 continue
 
@@ -110,18 +257,20 @@ class TradingBot:
 
     async def execute_trade(self, opportunity: Dict[str, Any]) -> None:
         """Execute the trade based on the detected arbitrage opportunity."""
-        buy_exchange = self.exchanges[opportunity['buy_exchange']]
-        sell_exchange = self.exchanges[opportunity['sell_exchange']]
         pair = opportunity['pair']
         trade_amount = opportunity['trade_amount']
 
         logging.info(f"Executing trade: Buy {pair} on {opportunity['buy_exchange']} at {opportunity['buy_price']} and sell on {opportunity['sell_exchange']} at {opportunity['sell_price']}")
 
         try:
-            buy_order = await buy_exchange.place_order(pair, trade_amount, opportunity['buy_price'], 'BUY')
-            sell_order = await sell_exchange.place_order(pair, trade_amount, opportunity['sell_price'], 'SELL')
-            logging.info(f"Buy order response: {buy_order}")
-            logging.info(f"Sell order response: {sell_order}")
+            # Both legs go out together under one deadline; a one-sided fill is unwound
+            result = await self.executor.execute(
+                pair, opportunity['buy_exchange'], opportunity['sell_exchange'], trade_amount,
+                opportunity['buy_price'], opportunity['sell_price']
+            )
+            logging.info(f"Buy order response: {result['buy_order']}")
+            logging.info(f"Sell order response: {result['sell_order']}")
+            logging.info(f"Trade for {pair} {result['status']} in {result['elapsed'] * 1000:.1f} ms")
         except Exception as e:
             logging.error(f"Error executing trade for {pair}: {e}")
 
@@ -140,6 +289,12 @@ class TradingBot:
             
             await asyncio.sleep(TIMING_SETTINGS['update_interval'])
 
-if __name__ == "__main__":
+async def main():
     bot = TradingBot()
-    asyncio.run(bot.run())
\ No newline at end of file
+    try:
+        await bot.run()
+    finally:
+        await bot.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
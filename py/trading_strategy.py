@@ -2,12 +2,17 @@
 
 import asyncio
 import logging
-import json
-import numpy as np
-from typing import List, Dict, Any, Optional
-import websockets
+import time
+from typing import List, Dict, Any, Optional, Set
 from config import TRADING_PAIRS, ARBITRAGE_PARAMS
 from order_manager import OrderManager
+from exchange_connector import ExchangeConnector
+from market_data import Tick, max_quote_age
+from best_price import BestPrice
+from price_state import PriceMatrix
+from market_data_hub import get_market_data_hub
+from circuit_breaker import is_healthy
+from latency_tracker import LatencyTracker
 
 # Setup logging
 logging.basicConfig(
@@ -16,120 +21,198 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+QUOTE_EXPIRY_INTERVAL = 0.1  # Seconds between passes over the quote timer wheel
+# A tick schedules a check of its pair this long after it arrives; further ticks for the pair in the
+# meantime ride along with that check instead of scheduling their own (0 checks on every tick)
+DETECTION_DEBOUNCE = ARBITRAGE_PARAMS.get('detection_debounce_ms', 2) / 1000
+# Prices are re-confirmed before trading: stale venues are re-read over REST, all within this budget, and
+# the orders only go out if at least MIN_EXECUTION_BUDGET of it is left
+PRICE_CONFIRM_BUDGET = ARBITRAGE_PARAMS.get('price_confirm_budget_ms', 200) / 1000
+MIN_EXECUTION_BUDGET = ARBITRAGE_PARAMS.get('min_execution_budget_ms', 50) / 1000
+PRICE_CONFIRM_MAX_AGE_MS = ARBITRAGE_PARAMS.get('price_confirm_max_age_ms', 100)  # Reuse REST prices this recent
+PRICE_TOLERANCE = ARBITRAGE_PARAMS.get('price_tolerance', 0.0005)  # Relative drift accepted from the detected price
+
 class TradingStrategy:
     """Implements advanced trading strategies including real-time arbitrage detection."""
 
     def __init__(self):
         self.order_manager = OrderManager()
-        self.prices = {pair['pair']: {} for pair in TRADING_PAIRS}
+        self.connectors = {name: ExchangeConnector(name) for name in self.order_manager.exchanges}
+        self.price_state = PriceMatrix([pair['pair'] for pair in TRADING_PAIRS], self.order_manager.exchanges)
+        self.best_prices = {pair['pair']: BestPrice() for pair in TRADING_PAIRS}  # Cheapest and dearest venue per pair
+        self.min_trade_amounts = {pair['pair']: pair['min_trade_amount'] for pair in TRADING_PAIRS}
         self.active_trades = {}
+        self._trade_tasks: Set[asyncio.Task] = set()  # The loop keeps only weak references to running tasks
+        self.debounce = DETECTION_DEBOUNCE
+        self._pending_checks: Dict[str, float] = {}  # Pair -> receive time of the first tick awaiting a check
+        self.detection_latency = LatencyTracker(window=1000)  # Tick received -> decision, seconds
+        self.ticks = 0
+        self.checks = 0
+        self._healthy = frozenset()
 
     async def run(self) -> None:
-        """Main loop to run the trading strategy."""
-        tasks = [
-            self.detect_arbitrage_opportunities(),
-            self.handle_real_time_updates()
-        ]
-        await asyncio.gather(*tasks)
-
-    async def detect_arbitrage_opportunities(self) -> None:
-        """Detect arbitrage opportunities across trading pairs."""
-        while True:
-            try:
-                for pair in TRADING_PAIRS:
-                    await self._check_arbitrage_for_pair(pair['pair'], pair['min_trade_amount'])
-            except Exception as e:
-                logging.error(f"Error in arbitrage detection: {e}")
-            await asyncio.sleep(ARBITRAGE_PARAMS['update_interval'])
-
-    async def _check_arbitrage_for_pair(self, pair: str, min_trade_amount: float) -> None:
-        """Check for arbitrage opportunities for a single trading pair."""
-        if pair not in self.prices:
+        """Main loop to run the trading strategy; each tick schedules a check of its own pair."""
+        await self.handle_real_time_updates()
+        await self._expire_quotes()
+
+    def detect_arbitrage_opportunities(self) -> None:
+        """Schedule a check of every trading pair, e.g. after exchanges recovered without sending new ticks."""
+        now = time.time()
+        for pair in self.best_prices:
+            self._schedule_check(pair, now)
+
+    def _schedule_check(self, pair: str, received_at: float) -> None:
+        if pair in self._pending_checks:
+            return  # Coalesced into the check already scheduled
+        self._pending_checks[pair] = received_at
+        if self.debounce > 0:
+            asyncio.get_running_loop().call_later(self.debounce, self._run_check, pair)
+        else:
+            self._run_check(pair)
+
+    def _run_check(self, pair: str) -> None:
+        received_at = self._pending_checks.pop(pair, None)
+        if received_at is None:
             return
-        
-        prices = self.prices[pair]
-        if len(prices) < 2:
-            # Not enough price data to detect arbitrage
+        self.checks += 1
+        try:
+            self._check_arbitrage_for_pair(pair)
+        except Exception as e:
+            logging.error(f"Error in arbitrage detection for {pair}: {e}")
+        self.detection_latency.record(time.time() - received_at)
+
+    def detection_stats(self) -> Dict[str, Any]:
+        """Ticks seen, pair checks run and tick-to-decision latency percentiles in milliseconds."""
+        percentiles = {q: self.detection_latency.percentile(q) for q in (0.5, 0.99)}
+        return {
+            'ticks': self.ticks,
+            'checks': self.checks,
+            'p50_ms': None if percentiles[0.5] is None else percentiles[0.5] * 1000,
+            'p99_ms': None if percentiles[0.99] is None else percentiles[0.99] * 1000,
+        }
+
+    def _check_arbitrage_for_pair(self, pair: str) -> None:
+        """Compare the cheapest and dearest healthy venue of a pair and start a trade if the gap is wide enough."""
+        best = self.best_prices.get(pair)
+        if best is None or len(best) < 2 or pair in self.active_trades:
             return
+        # Venues whose last quote is too old to act on are passed over like unhealthy ones
+        def usable(exchange_name: str) -> bool:
+            return is_healthy(exchange_name) and self.price_state.is_fresh(pair, exchange_name)
 
-        sorted_prices = sorted(prices.values())
-        best_buy_price = sorted_prices[0]
-        best_sell_price = sorted_prices[-1]
+        lowest, highest = best.lowest(usable), best.highest(usable)
+        if lowest is None or highest is None or lowest[1] == highest[1]:
+            # Not enough price data to detect arbitrage
+            return
 
+        best_buy_price, best_sell_price = lowest[0], highest[0]
         price_diff = best_sell_price - best_buy_price
         if price_diff / best_buy_price >= ARBITRAGE_PARAMS['price_difference_threshold']:
-            logging.info(f"Arbitrage opportunity detected for {pair}: Buy at {best_buy_price}, Sell at {best_sell_price}")
-            await self._execute_trades(pair, best_buy_price, best_sell_price, min_trade_amount)
-
-    async def _execute_trades(self, pair: str, buy_price: float, sell_price: float, amount: float) -> None:
-        """Execute buy and sell trades for a detected arbitrage opportunity."""
-        if pair in self.active_trades:
-            logging.info(f"Skipping trade execution for {pair} as an active trade is ongoing.")
-            return
-
-        self.active_trades[pair] = True
+            logging.info(f"Arbitrage opportunity detected for {pair}: Buy at {best_buy_price} on {lowest[1]}, "
+                         f"Sell at {best_sell_price} on {highest[1]}")
+            self.active_trades[pair] = True  # Claimed now so later ticks do not start a second trade
+            task = asyncio.get_running_loop().create_task(self._execute_trades(
+                pair, lowest[1], highest[1], best_buy_price, best_sell_price, self.min_trade_amounts[pair]))
+            self._trade_tasks.add(task)
+            task.add_done_callback(self._trade_tasks.discard)
+
+    async def _fetch_prices_for_pair(self, pair: str, exchanges: List[str], deadline: float) -> Dict[str, float]:
+        """Current price of a pair on each exchange, by time.monotonic() deadline.
+
+        Fresh WebSocket quotes are used as they are; the other exchanges are read over REST concurrently
+        through the shared single-flight price cache. Exchanges that do not answer in time are left out.
+        """
+        prices = {}
+        missing = []
+        for exchange_name in exchanges:
+            price = self.price_state.get(pair, exchange_name)
+            if price is not None:
+                prices[exchange_name] = price
+            else:
+                missing.append(exchange_name)
+        remaining = deadline - time.monotonic()
+        if not missing or remaining <= 0:
+            return prices
+
+        tasks = {
+            asyncio.ensure_future(self.connectors[name].fetch_price(pair, PRICE_CONFIRM_MAX_AGE_MS)): name
+            for name in missing
+        }
+        done, pending = await asyncio.wait(tasks, timeout=remaining)
+        for task in pending:
+            task.cancel()
+            logging.warning(f"No REST price for {pair} from {tasks[task]} within the confirmation budget")
+        for task in done:
+            price = None if task.exception() else task.result()
+            if price is not None:
+                prices[tasks[task]] = self.price_state.update(pair, tasks[task], price)
+        return prices
+
+    async def _execute_trades(self, pair: str, buy_exchange: str, sell_exchange: str,
+                              buy_price: float, sell_price: float, amount: float) -> None:
+        """Execute buy and sell trades for a detected arbitrage opportunity; the caller has claimed the pair."""
         try:
-            # Fetch updated prices before placing orders
-            latest_prices = await self._fetch_prices_for_pair(pair)
-            buy_orders = [
-                self.order_manager.place_order(exchange, pair, amount, buy_price, 'BUY')
-                for exchange in self.order_manager.exchanges
-                if buy_price in latest_prices.get(exchange, [])
-            ]
-            sell_orders = [
-                self.order_manager.place_order(exchange, pair, amount, sell_price, 'SELL')
-                for exchange in self.order_manager.exchanges
-                if sell_price in latest_prices.get(exchange, [])
-            ]
-
-            # Execute all buy orders
-            buy_results = await asyncio.gather(*buy_orders)
-            for result in buy_results:
-                if result.get('orderId'):
-                    logging.info(f"Buy order placed successfully: {result}")
-
-            # Execute all sell orders
-            sell_results = await asyncio.gather(*sell_orders)
-            for result in sell_results:
-                if result.get('orderId'):
-                    logging.info(f"Sell order placed successfully: {result}")
+            # Confirm both prices before placing orders, all within one budget
+            deadline = time.monotonic() + PRICE_CONFIRM_BUDGET
+            latest_prices = await self._fetch_prices_for_pair(pair, [buy_exchange, sell_exchange], deadline)
+            confirmed_buy, confirmed_sell = latest_prices.get(buy_exchange), latest_prices.get(sell_exchange)
+            if confirmed_buy is None or confirmed_sell is None:
+                logging.info(f"Could not confirm {pair} prices on {buy_exchange} and {sell_exchange}; skipping")
+                return
+            if (confirmed_buy > buy_price * (1 + PRICE_TOLERANCE) or confirmed_sell < sell_price * (1 - PRICE_TOLERANCE)
+                    or (confirmed_sell - confirmed_buy) / confirmed_buy < ARBITRAGE_PARAMS['price_difference_threshold']):
+                logging.info(f"{pair} spread moved before execution: buy {buy_price} -> {confirmed_buy}, "
+                             f"sell {sell_price} -> {confirmed_sell}; skipping")
+                return
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_EXECUTION_BUDGET:
+                logging.info(f"Only {remaining * 1000:.0f} ms of the {pair} confirmation budget left; skipping")
+                return
+
+            buy_result, sell_result = await asyncio.gather(
+                self.order_manager.place_order(buy_exchange, pair, amount, confirmed_buy, 'BUY'),
+                self.order_manager.place_order(sell_exchange, pair, amount, confirmed_sell, 'SELL')
+            )
+            if buy_result.get('orderId'):
+                logging.info(f"Buy order placed successfully: {buy_result}")
+            if sell_result.get('orderId'):
+                logging.info(f"Sell order placed successfully: {sell_result}")
         except Exception as e:
             logging.error(f"Error executing trades for {pair}: {e}")
         finally:
-            del self.active_trades[pair]
+            self.active_trades.pop(pair, None)
 
     async def handle_real_time_updates(self) -> None:
-        """Handle real-time updates from exchanges via WebSockets."""
-        ws_tasks = [self._listen_to_websocket(exchange_name) for exchange_name in self.order_manager.exchanges]
-        await asyncio.gather(*ws_tasks)
-
-    async def _listen_to_websocket(self, exchange_name: str) -> None:
-        """Listen to WebSocket updates for a specific exchange."""
-        exchange = self.order_manager.exchanges[exchange_name]
-        websocket_url = exchange.get_websocket_url()
-
-        async with websockets.connect(websocket_url) as websocket:
-            while True:
-                try:
-                    message = await websocket.recv()
-                    await self._process_websocket_message(exchange_name, message)
-                except Exception as e:
-                    logging.error(f"WebSocket error for {exchange_name}: {e}")
-                    await asyncio.sleep(5)  # Wait before reconnecting
-
-    async def _process_websocket_message(self, exchange_name: str, message: str) -> None:
-        """Process a WebSocket message from an exchange."""
-        try:
-            data = json.loads(message)
-            pair = data.get('pair')
-            price = data.get('price')
-
-            if pair and price:
-                if pair in self.prices:
-                    self.prices[pair][exchange_name] = price
-                    logging.info(f"Updated price for {pair} from {exchange_name}: {price}")
-        except json.JSONDecodeError as e:
-            logging.error(f"Error decoding WebSocket message from {exchange_name}: {e}")
+        """Handle real-time updates from exchanges via the shared market-data hub."""
+        hub = get_market_data_hub()
+        for exchange_name in self.order_manager.exchanges:
+            await hub.subscribe(exchange_name, self.price_state.pairs, self._process_tick)
+
+    def _process_tick(self, tick: Tick) -> None:
+        """Record a trade price decoded by the market-data hub and schedule a check of that pair."""
+        price = self.price_state.update(tick.pair, tick.exchange_name, tick.price, tick.received_at, tick.event_time)
+        if price is not None:
+            self.ticks += 1
+            self.best_prices[tick.pair].update(tick.exchange_name, price)
+            logging.debug(f"Updated price for {tick.pair} from {tick.exchange_name}: {price}")
+            self._schedule_check(tick.pair, tick.received_at)
+
+    async def _expire_quotes(self) -> None:
+        """Drop quotes from venues whose feed has gone quiet for longer than their max age.
+
+        Also re-checks every pair when a venue turns healthy again, since its quotes may already
+        show a spread that no new tick will announce.
+        """
+        while True:
+            for pair, exchange_name in self.price_state.expire():
+                self.best_prices[pair].remove(exchange_name)
+                logging.warning(f"No price for {pair} from {exchange_name} within {max_quote_age(exchange_name)}s; "
+                                f"ignoring it until it updates")
+            healthy = frozenset(name for name in self.order_manager.exchanges if is_healthy(name))
+            if healthy - self._healthy:
+                self.detect_arbitrage_opportunities()
+            self._healthy = healthy
+            await asyncio.sleep(QUOTE_EXPIRY_INTERVAL)
 
     def calculate_slippage(self, executed_price: float, expected_price: float) -> float:
         """Calculate slippage percentage."""
@@ -137,7 +220,7 @@ class TradingStrategy:
 
     def handle_risk_management(self, price_diff: float) -> None:
         """Advanced risk management strategy."""
-        avg_price = np.mean([price for prices in self.prices.values() for price in prices.values()])
+        avg_price = self.price_state.mean()
         price_diff_ratio = price_diff / avg_price
         if price_diff_ratio > ARBITRAGE_PARAMS['price_difference_threshold']:
             logging.warning(f"High risk detected: Price difference ratio is {price_diff_ratio:.2%}")
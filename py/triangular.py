@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config import TRADING_PAIRS, ARBITRAGE_PARAMS, EXCHANGE_API_KEYS
+from execution import trading_fee
+from market_data import Tick, PriceSnapshot
+from market_data_hub import get_market_data_hub
+
+# Setup logging
+logging.basicConfig(
+    filename='triangular.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Longest cycle searched (3 = triangles) and the net return a cycle must beat after fees
+MAX_CYCLE_LENGTH = ARBITRAGE_PARAMS.get('max_cycle_length', 4)
+CYCLE_PROFIT_THRESHOLD = ARBITRAGE_PARAMS.get('cycle_profit_threshold', 0.001)
+
+PAD_EDGE = 0  # Zero-weight edge padding shorter cycles to MAX_CYCLE_LENGTH columns
+
+
+def split_pair(pair: str) -> Tuple[str, str]:
+    """'ETH/BTC' -> ('ETH', 'BTC')."""
+    base, quote = pair.split('/')
+    return base, quote
+
+
+class CurrencyGraph:
+    """Currency graph of one exchange with -log(rate) edge weights and every simple cycle indexed by edge.
+
+    Each pair contributes two edges: base -> quote (sell at price, less the fee) and quote -> base
+    (buy at price, less the fee). A cycle is profitable when its weights sum below -log(1 + threshold).
+    The cycles are enumerated once when the graph is built, so a price update only re-sums the cycles
+    that run through that pair's two edges instead of searching the whole graph again.
+    """
+
+    def __init__(self, exchange_name: str, pairs: Iterable[str], fee: Optional[float] = None,
+                 max_length: int = MAX_CYCLE_LENGTH):
+        self.exchange_name = exchange_name
+        self.fee_weight = -math.log(1 - (trading_fee(exchange_name) if fee is None else fee))
+        self.pairs: List[str] = []
+        self.currencies: List[str] = []
+        self.edges: List[Tuple[int, int, str, str]] = [(-1, -1, '', '')]  # (from, to, pair, side); 0 is PAD_EDGE
+        self._currency_ids: Dict[str, int] = {}
+        self._pair_edges: Dict[str, Tuple[int, int]] = {}
+        for pair in pairs:
+            if pair in self._pair_edges or '/' not in pair:
+                continue
+            base, quote = (self._currency_id(currency) for currency in split_pair(pair))
+            self.pairs.append(pair)
+            self._pair_edges[pair] = (len(self.edges), len(self.edges) + 1)
+            self.edges.append((base, quote, pair, 'SELL'))
+            self.edges.append((quote, base, pair, 'BUY'))
+        # Unpriced edges are infinitely expensive, so cycles through them never qualify
+        self.weights = np.full(len(self.edges), np.inf)
+        self.weights[PAD_EDGE] = 0.0
+        self.cycles = self._enumerate_cycles(max_length)
+        self._pair_cycles = self._index_cycles()
+
+    def _currency_id(self, currency: str) -> int:
+        currency_id = self._currency_ids.get(currency)
+        if currency_id is None:
+            currency_id = self._currency_ids[currency] = len(self.currencies)
+            self.currencies.append(currency)
+        return currency_id
+
+    def _enumerate_cycles(self, max_length: int) -> np.ndarray:
+        """All simple cycles of 3..max_length edges as rows of edge ids, each listed once from its lowest currency."""
+        outgoing: List[List[int]] = [[] for _ in self.currencies]
+        for edge_id, (source, _, _, _) in enumerate(self.edges[1:], start=1):
+            outgoing[source].append(edge_id)
+        cycles = []
+        for start in range(len(self.currencies)):
+            stack = [(start, [], {start})]
+            while stack:
+                node, path, visited = stack.pop()
+                for edge_id in outgoing[node]:
+                    target = self.edges[edge_id][1]
+                    if target == start and len(path) >= 2:
+                        cycles.append(path + [edge_id] + [PAD_EDGE] * (max_length - len(path) - 1))
+                    elif target > start and target not in visited and len(path) + 1 < max_length:
+                        stack.append((target, path + [edge_id], visited | {target}))
+        return np.array(cycles, dtype=np.intp).reshape(-1, max_length)
+
+    def _index_cycles(self) -> Dict[str, np.ndarray]:
+        index = {}
+        for pair, (sell_edge, buy_edge) in self._pair_edges.items():
+            touches = np.isin(self.cycles, (sell_edge, buy_edge)).any(axis=1)
+            index[pair] = np.nonzero(touches)[0]
+        return index
+
+    def update(self, pair: str, price: float, threshold: float = CYCLE_PROFIT_THRESHOLD) -> np.ndarray:
+        """Set a pair's price and return the ids of cycles through it that are now profitable."""
+        edges = self._pair_edges.get(pair)
+        if edges is None or not price or price <= 0:
+            return np.empty(0, dtype=np.intp)
+        log_price = math.log(price)
+        self.weights[edges[0]] = self.fee_weight - log_price
+        self.weights[edges[1]] = self.fee_weight + log_price
+        return self.profitable(self._pair_cycles[pair], threshold)
+
+    def profitable(self, cycle_ids: Optional[np.ndarray] = None,
+                   threshold: float = CYCLE_PROFIT_THRESHOLD) -> np.ndarray:
+        """Ids among cycle_ids (default: every cycle) whose net return after fees beats the threshold."""
+        if cycle_ids is None:
+            cycle_ids = np.arange(len(self.cycles))
+        if not len(cycle_ids):
+            return cycle_ids
+        totals = self.weights[self.cycles[cycle_ids]].sum(axis=1)
+        return cycle_ids[totals < -math.log1p(threshold)]
+
+    def describe(self, cycle_id: int) -> Dict[str, Any]:
+        """Opportunity dict for a cycle: the currencies visited, the orders to send and the net return."""
+        edge_ids = [edge_id for edge_id in self.cycles[cycle_id] if edge_id != PAD_EDGE]
+        total = float(self.weights[edge_ids].sum())
+        return {
+            'exchange': self.exchange_name,
+            'path': [self.currencies[self.edges[edge_id][0]] for edge_id in edge_ids] + [self.currencies[self.edges[edge_ids[0]][0]]],
+            'legs': [(self.edges[edge_id][2], self.edges[edge_id][3]) for edge_id in edge_ids],
+            'profit': math.expm1(-total),
+        }
+
+
+class TriangularArbitrage:
+    """Multi-hop cycle detector over the TRADING_PAIRS of every exchange, updated tick by tick."""
+
+    def __init__(self, exchanges: Optional[Iterable[str]] = None, pairs: Optional[Iterable[str]] = None,
+                 max_length: int = MAX_CYCLE_LENGTH, threshold: float = CYCLE_PROFIT_THRESHOLD):
+        pairs = list(pairs or [pair_info['pair'] for pair_info in TRADING_PAIRS])
+        self.graphs = {name: CurrencyGraph(name, pairs, max_length=max_length)
+                       for name in (exchanges or EXCHANGE_API_KEYS.keys())}
+        self.threshold = threshold
+        self.updates = 0
+        self.opportunities: Deque[Dict[str, Any]] = deque(maxlen=1000)  # Most recent profitable cycles
+        for graph in self.graphs.values():
+            logging.info(f"{graph.exchange_name}: {len(graph.currencies)} currencies, {len(graph.pairs)} pairs, "
+                         f"{len(graph.cycles)} cycles of up to {max_length} hops")
+
+    def on_tick(self, tick: Tick) -> List[Dict[str, Any]]:
+        """Apply one price update and return the cycles through that pair that are now profitable."""
+        graph = self.graphs.get(tick.exchange_name)
+        if graph is None:
+            return []
+        self.updates += 1
+        found = [graph.describe(cycle_id) for cycle_id in graph.update(tick.pair, tick.price, self.threshold)]
+        for opportunity in found:
+            logging.info(f"Cycle {' -> '.join(opportunity['path'])} on {opportunity['exchange']}: "
+                         f"{opportunity['profit'] * 100:.3f}% after fees")
+        self.opportunities.extend(found)
+        return found
+
+    def seed(self, snapshot: PriceSnapshot) -> None:
+        """Load a full price snapshot without evaluating cycles; call detect() afterwards for a full scan."""
+        graph = self.graphs.get(snapshot.exchange_name)
+        if graph is None:
+            return
+        for pair, price in snapshot.prices.items():
+            graph.update(pair, price)
+
+    def detect(self) -> List[Dict[str, Any]]:
+        """Evaluate every cycle on every exchange, best first."""
+        found = [graph.describe(cycle_id) for graph in self.graphs.values()
+                 for cycle_id in graph.profitable(threshold=self.threshold)]
+        return sorted(found, key=lambda opportunity: opportunity['profit'], reverse=True)
+
+    async def run(self) -> None:
+        """Consume trade ticks for every pair from the shared market-data hub until cancelled."""
+        hub = get_market_data_hub()
+        for name, graph in self.graphs.items():
+            await hub.subscribe(name, graph.pairs, self.on_tick)
+        try:
+            while True:
+                await asyncio.sleep(60)
+                logging.info(f"Processed {self.updates} ticks, {len(self.opportunities)} recent profitable cycles")
+        finally:
+            for name in self.graphs:
+                await hub.unsubscribe(name, self.on_tick)
+
+
+if __name__ == "__main__":
+    asyncio.run(TriangularArbitrage().run())
@@ -4,8 +4,9 @@ import json
 import os
 import logging
 import time
-from typing import Any, Dict, Callable
+from typing import Any, Dict, Callable, List, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from exchange_filters import check_order, check_orders
 
 # Setup logging
 logging.basicConfig(filename='utils.log',
@@ -121,8 +122,8 @@ class DataValidator:
         return False
 
     @staticmethod
-    def validate_order(order: Dict[str, Any]) -> bool:
-        """Validate order structure and data."""
+    def validate_order(order: Dict[str, Any], exchange: Optional[str] = None) -> bool:
+        """Validate order structure and data, and the exchange's trading filters if an exchange is given."""
         required_keys = {'symbol', 'side', 'type', 'price', 'quantity'}
         if not required_keys.issubset(order.keys()):
             logging.error("Order missing required keys: %s", order)
@@ -130,8 +131,23 @@ class DataValidator:
         if not DataValidator.validate_price(order.get('price', 0)):
             logging.error("Invalid order price: %f", order.get('price', 0))
             return False
+        if exchange is not None:
+            check = check_order(exchange, order['symbol'], order['side'], order['price'], order['quantity'])
+            if not check.ok:
+                logging.error("Order rejected by %s filters: %s", exchange, check.reason)
+                return False
         return True
 
+    @staticmethod
+    def validate_orders(orders: List[Dict[str, Any]], exchange: str) -> List[bool]:
+        """Validate many orders for one exchange against its trading filters in a single pass."""
+        checks = check_orders(
+            {'exchange': exchange, 'pair': order['symbol'], 'side': order['side'],
+             'price': order['price'], 'quantity': order['quantity']}
+            for order in orders
+        )
+        return [DataValidator.validate_order(order) and check.ok for order, check in zip(orders, checks)]
+
 # Example usage of utility functions
 if __name__ == "__main__":
     # Load and save configuration example